@@ -10,10 +10,23 @@ from whctools import __title__
 logger = LoggerAddTag(get_extension_logger(__name__), __title__)
 
 
-def get_all_related_characters_from_character(character: EveCharacter):
-    """helper function for getting all the characters/alts of a particular character"""
-    user_obj = bc_get_user_from_eve_character(character)
-    return bc_get_all_characters_from_user(user_obj)
+def get_main_characters_from_evecharacters(characters) -> dict:
+    """
+    batch version of get_main_character_from_evecharacter for a queryset or list of characters
+
+    Returns {character_id: main EveCharacter} in a single query. Characters without an
+    owner or a main are left out, so a missing key means an orphaned character.
+    Only walks CharacterOwnership -> UserProfile, so it is safe on both 3.0 and 4.0.
+    """
+    ownerships = CharacterOwnership.objects.filter(
+        character__in=characters,
+        user__profile__main_character__isnull=False,
+    ).select_related("character", "user__profile__main_character")
+
+    return {
+        ownership.character.character_id: ownership.user.profile.main_character
+        for ownership in ownerships
+    }
 
 
 def bc_get_main_character_name_from_user(user: User):
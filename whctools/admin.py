@@ -8,3 +8,4 @@ admin.site.register(models.Applications)
 admin.site.register(models.ApplicationHistory)
 admin.site.register(models.Acl)
 admin.site.register(models.WelcomeMail)
+admin.site.register(models.AclSideEffect)
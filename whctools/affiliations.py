@@ -0,0 +1,258 @@
+"""Detection and batch processing of characters leaving the allowed alliances."""
+
+import datetime
+from collections import defaultdict
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from esi.clients import EsiClientProvider
+
+from allianceauth.eveonline.models import (
+    EveAllianceInfo,
+    EveCharacter,
+    EveCorporationInfo,
+)
+from allianceauth.eveonline.tasks import update_character
+from allianceauth.notifications import notify
+from allianceauth.services.hooks import get_extension_logger
+from app_utils.logging import LoggerAddTag
+
+from whctools import __title__
+from whctools.app_settings import (
+    ALLOWED_ALLIANCES,
+    ESI_AFFILIATION_CHUNK_SIZE,
+    TRANSIENT_REJECT,
+)
+from whctools.models import Acl, ACLHistory, ApplicationHistory, Applications
+
+from .utils import invalidate_open_applications_count, remove_characters_from_acl
+
+logger = LoggerAddTag(get_extension_logger(__name__), __title__)
+
+
+def process_characters_leaving_alliance(character_pks=None):
+    """
+    Remove characters that are no longer in an allowed alliance from every acl
+    and reject their open and accepted applications, in a fixed number of
+    set-based queries however many characters left at once. Without
+    character_pks, every acl member and applicant outside the allowed alliances
+    is processed.
+
+    Every owner gets a single notification listing those of their characters
+    that had an application rejected or an acl membership removed.
+    Returns the number of characters processed.
+    """
+    characters = EveCharacter.objects.exclude(alliance_id__in=ALLOWED_ALLIANCES)
+    if character_pks is not None:
+        characters = characters.filter(pk__in=character_pks)
+    else:
+        characters = characters.filter(
+            Q(acl__isnull=False)
+            | Q(
+                applications__member_state__in=[
+                    Applications.MembershipStates.APPLIED,
+                    Applications.MembershipStates.ACCEPTED,
+                ]
+            )
+        )
+    characters = {
+        char.pk: char
+        for char in characters.select_related(
+            "applications", "character_ownership__user"
+        ).distinct()
+    }
+    if not characters:
+        return 0
+
+    acl_names_by_character = defaultdict(list)
+    for acl_name, character_pk in Acl.characters.through.objects.filter(
+        evecharacter_id__in=characters
+    ).values_list("acl_id", "evecharacter_id"):
+        acl_names_by_character[character_pk].append(acl_name)
+
+    new_state = Applications.MembershipStates.REJECTED
+    reason = Applications.RejectionStates.LEFT_ALLIANCE
+    now = timezone.now()
+    reject_timeout = now + datetime.timedelta(days=int(TRANSIENT_REJECT))
+    applications = []
+    history = []
+    removals = defaultdict(list)
+    for char in characters.values():
+        application = getattr(char, "applications", None)
+        old_state = (
+            application.member_state
+            if application is not None
+            else Applications.MembershipStates.NOTAMEMBER
+        )
+        for acl_name in acl_names_by_character.get(char.pk, []):
+            removals[(acl_name, old_state, application is not None)].append(char)
+
+        if application is None or (
+            old_state
+            not in (
+                Applications.MembershipStates.APPLIED,
+                Applications.MembershipStates.ACCEPTED,
+            )
+            and char.pk not in acl_names_by_character
+        ):
+            continue
+        history.append(
+            ApplicationHistory(
+                application=application,
+                old_state=old_state,
+                new_state=new_state,
+                reject_reason=reason,
+            )
+        )
+        application.member_state = new_state
+        application.reject_reason = reason
+        application.reject_timeout = reject_timeout
+        application.last_updated = now
+        applications.append(application)
+    changed_pks = {application.eve_character_id for application in applications}
+
+    with transaction.atomic():
+        Applications.objects.bulk_update(
+            applications,
+            ["member_state", "reject_reason", "reject_timeout", "last_updated"],
+        )
+        ApplicationHistory.objects.bulk_create(history)
+        if any(
+            entry.old_state == Applications.MembershipStates.APPLIED
+            for entry in history
+        ):
+            invalidate_open_applications_count()
+
+        for (acl_name, old_state, has_application), chars in removals.items():
+            logger.debug(f"Removing {len(chars)} characters from {acl_name}")
+            removed = remove_characters_from_acl(
+                acl_name,
+                chars,
+                old_state,
+                (
+                    new_state
+                    if has_application
+                    else Applications.MembershipStates.NOTAMEMBER
+                ),
+                ACLHistory.ApplicationStateChangeReason.LEFT_UNI,
+            )
+            changed_pks.update(char.pk for char in removed)
+
+    names_by_user = defaultdict(list)
+    for char in characters.values():
+        if char.pk not in changed_pks:
+            continue
+        try:
+            user = char.character_ownership.user
+        except ObjectDoesNotExist:
+            continue
+        names_by_user[user].append(char.character_name)
+    for user, names in names_by_user.items():
+        notify.danger(
+            user,
+            "WHC Community Status",
+            f"Your characters {', '.join(names)} are no longer part of IVY or IVY-A, so their WHC applications and ACL memberships have been removed.",
+        )
+
+    logger.info(
+        f"Processed {len(characters)} characters that left the allowed alliances"
+    )
+    return len(characters)
+
+
+def check_alliance_affiliations(esi=None):
+    """
+    Look up the current alliance of every acl member and open applicant with
+    ESI, ESI_AFFILIATION_CHUNK_SIZE characters per call, instead of waiting for
+    Auth to refresh each character.
+
+    Characters that ESI places outside of ALLOWED_ALLIANCES get their new
+    corporation and alliance stored and are handed to
+    process_characters_leaving_alliance. Names and tickers are taken from the
+    corporations and alliances Auth already knows; for the rest Auth's character
+    refresh is queued, which fills them in. A chunk that ESI fails on is
+    skipped until the next run. Returns the number of departed characters.
+    """
+    if esi is None:
+        esi = EsiClientProvider()
+
+    characters = (
+        EveCharacter.objects.filter(
+            Q(acl__isnull=False)
+            | Q(
+                applications__member_state__in=[
+                    Applications.MembershipStates.APPLIED,
+                    Applications.MembershipStates.ACCEPTED,
+                ]
+            )
+        )
+        .filter(alliance_id__in=ALLOWED_ALLIANCES)
+        .distinct()
+        .order_by("character_id")
+        .values_list("character_id", "pk")
+    )
+    pks_by_character_id = dict(characters)
+    character_ids = list(pks_by_character_id)
+
+    departed_by_affiliation = defaultdict(list)
+    for i in range(0, len(character_ids), ESI_AFFILIATION_CHUNK_SIZE):
+        chunk = character_ids[i : i + ESI_AFFILIATION_CHUNK_SIZE]
+        try:
+            affiliations = esi.client.Character.post_characters_affiliation(
+                characters=chunk
+            ).result()
+        except Exception as e:
+            logger.warning(
+                f"Could not check the affiliation of {len(chunk)} characters: {e}"
+            )
+            continue
+
+        for affiliation in affiliations:
+            alliance_id = affiliation.get("alliance_id")
+            if alliance_id not in ALLOWED_ALLIANCES:
+                departed_by_affiliation[
+                    (affiliation["corporation_id"], alliance_id)
+                ].append(affiliation["character_id"])
+
+    corporations = EveCorporationInfo.objects.in_bulk(
+        {corporation_id for corporation_id, _ in departed_by_affiliation},
+        field_name="corporation_id",
+    )
+    alliances = EveAllianceInfo.objects.in_bulk(
+        {alliance_id for _, alliance_id in departed_by_affiliation if alliance_id},
+        field_name="alliance_id",
+    )
+    departed_pks = []
+    unknown_character_ids = []
+    for (corporation_id, alliance_id), ids in departed_by_affiliation.items():
+        fields = {"corporation_id": corporation_id, "alliance_id": alliance_id}
+        corporation = corporations.get(corporation_id)
+        if corporation is not None:
+            fields["corporation_name"] = corporation.corporation_name
+            fields["corporation_ticker"] = corporation.corporation_ticker
+        alliance = alliances.get(alliance_id)
+        if alliance is not None:
+            fields["alliance_name"] = alliance.alliance_name
+            fields["alliance_ticker"] = alliance.alliance_ticker
+        elif alliance_id is None:
+            fields["alliance_name"] = ""
+            fields["alliance_ticker"] = ""
+        if corporation is None or (alliance is None and alliance_id is not None):
+            unknown_character_ids += ids
+
+        pks = [pks_by_character_id[character_id] for character_id in ids]
+        EveCharacter.objects.filter(pk__in=pks).update(**fields)
+        departed_pks += pks
+
+    # Auth's refresh updates every field, even though the ids already match
+    for character_id in unknown_character_ids:
+        update_character.delay(character_id)
+    logger.info(
+        f"Checked the affiliation of {len(character_ids)} characters, {len(departed_pks)} left the allowed alliances"
+    )
+
+    if departed_pks:
+        process_characters_leaving_alliance(departed_pks)
+    return len(departed_pks)
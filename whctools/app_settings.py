@@ -18,7 +18,72 @@ ALLOWED_ALLIANCES = getattr(settings, "WHCTOOLS_ALLIANCES", [937872513, 99010193
 # task scheduled with Celery will run before admiting it failed.
 ESI_TASK_TIMEOUT_SECONDS = getattr(settings, "ESI_TASK_TIMEOUT_SECONDS", 3600)
 
+# Seconds the open application count on the officer menu badge is cached for.
+# The count is refreshed on every change, this only bounds how stale it can get.
+OPEN_APPLICATIONS_COUNT_TTL = getattr(
+    settings, "WHCTOOLS_OPEN_APPLICATIONS_COUNT_TTL", 300
+)
+
+# Entries per page of the ACL audit log, unless the officer asks for another
+# page size, which is capped at ACL_HISTORY_MAX_PAGE_SIZE
+ACL_HISTORY_PAGE_SIZE = getattr(settings, "WHCTOOLS_ACL_HISTORY_PAGE_SIZE", 100)
+ACL_HISTORY_MAX_PAGE_SIZE = 1000
+
+# Members per page of the ACL roster, which the page fetches as it is browsed
+ROSTER_PAGE_SIZE = getattr(settings, "WHCTOOLS_ROSTER_PAGE_SIZE", 100)
+ROSTER_MAX_PAGE_SIZE = 1000
+# Deepest row a roster page may start at. No acl comes close, it only keeps the
+# OFFSET of a made up page number within range of the database.
+ROSTER_MAX_OFFSET = 10_000_000
+
+# Applications per page of the rejected applications list
+REJECTED_APPS_PAGE_SIZE = getattr(settings, "WHCTOOLS_REJECTED_APPS_PAGE_SIZE", 100)
+
+# Longest an ACL change feed request may wait for new changes, in seconds, and
+# how often it looks for them meanwhile. Every waiting request holds a worker.
+CHANGE_FEED_MAX_WAIT = getattr(settings, "WHCTOOLS_CHANGE_FEED_MAX_WAIT", 25)
+CHANGE_FEED_POLL_INTERVAL = 1
+
+# Changes are only served once they are this many seconds old, so that entries
+# of transactions still committing are not passed over by a consumer's cursor
+CHANGE_FEED_SETTLE_SECONDS = getattr(
+    settings, "WHCTOOLS_CHANGE_FEED_SETTLE_SECONDS", 10
+)
+
+# Seconds the batch cleanup waits after a character left the allowed alliances,
+# so everyone leaving at about the same time is handled by a single run
+LEAVING_ALLIANCE_DEBOUNCE = getattr(settings, "WHCTOOLS_LEAVING_ALLIANCE_DEBOUNCE", 60)
+
+# Rows read from the database at a time while streaming an export or roster
+EXPORT_CHUNK_SIZE = 2000
+
+# ESI accepts at most this many recipients on a single mail
+ESI_MAIL_MAX_RECIPIENTS = 50
+
+# ESI resolves the affiliation of at most this many characters per call
+ESI_AFFILIATION_CHUNK_SIZE = 1000
+
 # Wanderer Tokens
 WANDERER_ACL_ID = getattr(settings, "WANDERER_ACL_ID", None)
 WANDERER_ACL_TOKEN = getattr(settings, "WANDERER_ACL_TOKEN", None)
 
+# ACL side effect outbox: rows handled per dispatcher pass, attempts before a
+# step is marked failed, and the delay in seconds before the first retry, which
+# doubles on every further attempt.
+OUTBOX_BATCH_SIZE = getattr(settings, "WHCTOOLS_OUTBOX_BATCH_SIZE", 100)
+OUTBOX_MAX_ATTEMPTS = getattr(settings, "WHCTOOLS_OUTBOX_MAX_ATTEMPTS", 5)
+OUTBOX_RETRY_DELAY = getattr(settings, "WHCTOOLS_OUTBOX_RETRY_DELAY", 60)
+
+# Outstanding steps listed on the open applications page, newest first
+OUTBOX_DISPLAY_LIMIT = 50
+
+# Wanderer API client
+WANDERER_API_URL = getattr(
+    settings, "WANDERER_API_URL", "https://wanderer.eveuniversity.org/api"
+)
+WANDERER_TIMEOUT_SECONDS = getattr(settings, "WANDERER_TIMEOUT_SECONDS", 10)
+WANDERER_MAX_RETRIES = getattr(settings, "WANDERER_MAX_RETRIES", 3)
+WANDERER_BACKOFF_FACTOR = getattr(settings, "WANDERER_BACKOFF_FACTOR", 0.5)
+WANDERER_BACKOFF_MAX = getattr(settings, "WANDERER_BACKOFF_MAX", 10)
+WANDERER_MAX_WORKERS = getattr(settings, "WANDERER_MAX_WORKERS", 8)
+
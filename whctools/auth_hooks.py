@@ -3,8 +3,8 @@ from django.utils.translation import gettext_lazy as _
 from allianceauth import hooks
 from allianceauth.services.hooks import MenuItemHook, UrlHook
 
-from whctools.models import Applications
 from . import urls
+from .utils import get_open_applications_count
 
 
 class WhctoolsMenuItem(MenuItemHook):
@@ -22,7 +22,7 @@ class WhctoolsMenuItem(MenuItemHook):
 
     def render(self, request):
         if request.user.has_perm("whctools.whc_officer"):
-            app_count = Applications.objects.filter(member_state=Applications.MembershipStates.APPLIED).count()
+            app_count = get_open_applications_count()
             self.count = app_count if app_count and app_count > 0 else None
             return MenuItemHook.render(self, request)
         elif request.user.has_perm("whctools.basic_access"):
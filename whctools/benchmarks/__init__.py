@@ -0,0 +1,4 @@
+"""Benchmarks for whctools against generated data.
+
+Run through the ``whctools_benchmark`` management command.
+"""
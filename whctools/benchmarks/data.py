@@ -0,0 +1,239 @@
+"""Synthetic WHC data for benchmarks."""
+
+import datetime
+import random
+
+from memberaudit.models import Character as MACharacter
+from memberaudit.models import SkillSet
+
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+from django.utils import timezone
+
+from allianceauth.authentication.models import (
+    CharacterOwnership,
+    UserProfile,
+    get_guest_state,
+)
+from allianceauth.eveonline.models import EveCharacter
+
+from whctools.app_settings import ALLOWED_ALLIANCES
+from whctools.models import (
+    Acl,
+    ACLHistory,
+    Applications,
+    CharacterSkillSetStatus,
+)
+
+# Everything generated carries this prefix, or an id from the range below,
+# so it can be told apart from real data and removed again.
+PREFIX = "whcbench_"
+CHARACTER_ID_START = 2_100_000_000
+CHARACTER_ID_END = 2_140_000_000
+BATCH_SIZE = 1000
+
+ACL_NAME = f"{PREFIX}acl"
+SKILL_SET_NAME = f"{PREFIX}skill_set"
+
+
+def bench_characters():
+    return EveCharacter.objects.filter(
+        character_id__gte=CHARACTER_ID_START, character_id__lt=CHARACTER_ID_END
+    )
+
+
+def bench_users():
+    return User.objects.filter(username__startswith=PREFIX)
+
+
+def generate(characters: int, alts_per_user: int = 3, seed: int = 0) -> dict:
+    """
+    Generate roughly the given number of characters, split over users with
+    alts_per_user alts each, with Member Audit characters, applications in every
+    state, acl members with their history and skill set checks for applicants.
+
+    The first user is a superuser, so the officer views can be run as them.
+    Returns the number of rows created per model.
+    """
+    rng = random.Random(seed)
+    per_user = alts_per_user + 1
+    user_count = max(1, characters // per_user)
+    now = timezone.now()
+
+    with transaction.atomic():
+        cleanup()
+
+        acl = Acl.objects.create(name=ACL_NAME, description="Benchmark data")
+        group = Group.objects.create(name=ACL_NAME)
+        acl.groups.add(group)
+        skill_set = SkillSet.objects.create(name=SKILL_SET_NAME)
+        acl.skill_sets.add(skill_set)
+
+        User.objects.bulk_create(
+            [
+                User(
+                    username=f"{PREFIX}{u}",
+                    is_superuser=u == 0,
+                    is_staff=u == 0,
+                )
+                for u in range(user_count)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        users = list(bench_users().order_by("id"))
+
+        EveCharacter.objects.bulk_create(
+            [
+                EveCharacter(
+                    character_id=CHARACTER_ID_START + u * per_user + i,
+                    character_name=f"{PREFIX}{u}_{i}",
+                    corporation_id=98000000 + u % 50,
+                    corporation_name=f"{PREFIX}corp_{u % 50}",
+                    corporation_ticker=f"WB{u % 50}",
+                    alliance_id=(
+                        ALLOWED_ALLIANCES[0] if rng.random() < 0.95 else 99000001
+                    ),
+                    alliance_name=f"{PREFIX}alliance",
+                )
+                for u in range(user_count)
+                for i in range(per_user)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        eve_characters = list(bench_characters().order_by("character_id"))
+
+        CharacterOwnership.objects.bulk_create(
+            [
+                CharacterOwnership(
+                    character=char,
+                    user=users[n // per_user],
+                    owner_hash=f"{PREFIX}{char.character_id}",
+                )
+                for n, char in enumerate(eve_characters)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        guest_state = get_guest_state()
+        UserProfile.objects.bulk_create(
+            [
+                UserProfile(
+                    user=user,
+                    main_character=eve_characters[u * per_user],
+                    state=guest_state,
+                )
+                for u, user in enumerate(users)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        MACharacter.objects.bulk_create(
+            [
+                MACharacter(eve_character=char, is_shared=True)
+                for char in eve_characters
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+        # Whole users share a state: 40% members, 10% applying, 10% rejected
+        states = {}
+        for u in range(user_count):
+            roll = rng.random()
+            if roll < 0.4:
+                states[u] = Applications.MembershipStates.ACCEPTED
+            elif roll < 0.5:
+                states[u] = Applications.MembershipStates.APPLIED
+            elif roll < 0.6:
+                states[u] = Applications.MembershipStates.REJECTED
+            else:
+                states[u] = Applications.MembershipStates.NOTAMEMBER
+        states[0] = Applications.MembershipStates.ACCEPTED
+
+        applications = []
+        members = []
+        applicants = []
+        for n, char in enumerate(eve_characters):
+            state = states[n // per_user]
+            applications.append(
+                Applications(
+                    eve_character=char,
+                    member_state=state,
+                    reject_reason=(
+                        Applications.RejectionStates.SKILLS
+                        if state == Applications.MembershipStates.REJECTED
+                        else Applications.RejectionStates.NONE
+                    ),
+                )
+            )
+            if state == Applications.MembershipStates.ACCEPTED:
+                members.append(char)
+            elif state == Applications.MembershipStates.APPLIED:
+                applicants.append(char)
+        Applications.objects.bulk_create(applications, batch_size=BATCH_SIZE)
+        # reject_timeout is auto_now_add, so it can only be set afterwards
+        Applications.objects.filter(
+            eve_character__in=bench_characters(),
+            member_state=Applications.MembershipStates.REJECTED,
+        ).update(reject_timeout=now + datetime.timedelta(days=30))
+
+        Acl.characters.through.objects.bulk_create(
+            [Acl.characters.through(acl=acl, evecharacter=char) for char in members],
+            batch_size=BATCH_SIZE,
+        )
+        # Leave the group slightly out of step with the acl, so a group sync
+        # has users to add and to remove
+        User.groups.through.objects.bulk_create(
+            [
+                User.groups.through(user=user, group=group)
+                for u, user in enumerate(users)
+                if (states[u] == Applications.MembershipStates.ACCEPTED)
+                != (u % 10 == 1)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        history = ACLHistory.objects.bulk_create(
+            [
+                ACLHistory(
+                    character=char,
+                    acl=acl,
+                    date_of_change=now - datetime.timedelta(days=rng.randint(1, 700)),
+                    old_state=Applications.MembershipStates.APPLIED,
+                    new_state=Applications.MembershipStates.ACCEPTED,
+                    reason_for_change=ACLHistory.ApplicationStateChangeReason.ACCEPTED,
+                    changed_by=PREFIX,
+                )
+                for char in members
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        statuses = CharacterSkillSetStatus.objects.bulk_create(
+            [
+                CharacterSkillSetStatus(
+                    eve_character=char,
+                    skill_set=skill_set,
+                    can_fly=rng.random() < 0.7,
+                    computed_at=now,
+                )
+                for char in applicants
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+    return {
+        "users": len(users),
+        "characters": len(eve_characters),
+        "acl_members": len(members),
+        "applicants": len(applicants),
+        "acl_history": len(history),
+        "skill_set_statuses": len(statuses),
+    }
+
+
+def cleanup():
+    """Remove all generated benchmark data"""
+    with transaction.atomic():
+        ACLHistory.objects.filter(acl_id=ACL_NAME).delete()
+        ACLHistory.objects.filter(character__in=bench_characters()).delete()
+        Acl.objects.filter(name=ACL_NAME).delete()
+        Group.objects.filter(name=ACL_NAME).delete()
+        SkillSet.objects.filter(name=SKILL_SET_NAME).delete()
+        bench_users().delete()
+        bench_characters().delete()
@@ -0,0 +1,138 @@
+"""Timed benchmark scenarios for the whctools views and helpers."""
+
+import statistics
+import time
+
+import django
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.contrib.sessions.backends.db import SessionStore
+from django.db import connection, reset_queries, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from whctools import __version__, views
+from whctools.app_settings import LARGE_REJECT
+from whctools.models import Acl, ACLHistory, Applications
+from whctools.utils import remove_all_alts, sync_groups_with_acl_helper
+
+from .data import ACL_NAME, PREFIX, bench_characters, bench_users
+
+
+def _request(user, path):
+    request = RequestFactory().get(path)
+    request.user = user
+    request.session = SessionStore()
+    request._messages = FallbackStorage(request)
+    return request
+
+
+def get_scenarios() -> dict:
+    """
+    Return {name: callable} for everything that is benchmarked, set up against
+    the generated data. The officer is the generated superuser, who also owns a
+    few characters themselves.
+    """
+    officer = bench_users().get(username=f"{PREFIX}0")
+    applicant = (
+        Applications.objects.filter(
+            eve_character__in=bench_characters(),
+            member_state=Applications.MembershipStates.APPLIED,
+        )
+        .select_related("eve_character")
+        .first()
+    )
+    member = (
+        Applications.objects.filter(
+            eve_character__in=bench_characters(),
+            member_state=Applications.MembershipStates.ACCEPTED,
+        )
+        .exclude(eve_character__character_ownership__user=officer)
+        .select_related("eve_character")
+        .first()
+    )
+
+    scenarios = {
+        "index": lambda: views.index(_request(officer, "/whctools/")),
+        "open_applications": lambda: views.open_applications(
+            _request(officer, "/whctools/staff/open")
+        ),
+        "rejected_applications": lambda: views.rejected_applications(
+            _request(officer, "/whctools/staff/rejected")
+        ),
+        "list_acl_members": lambda: views.list_acl_members(
+            _request(officer, f"/whctools/staff/action/{ACL_NAME}/view"),
+            acl_pk=ACL_NAME,
+        ),
+        "acl_roster_page": lambda: views.acl_roster_page(
+            _request(officer, f"/whctools/staff/action/{ACL_NAME}/roster?page=2"),
+            acl_pk=ACL_NAME,
+        ),
+        "sync_groups_with_acl_helper": lambda: sync_groups_with_acl_helper(ACL_NAME),
+    }
+    if applicant is not None:
+        char_id = applicant.eve_character.character_id
+        scenarios["get_skills"] = lambda: views.get_skills(
+            _request(officer, f"/whctools/staff/getSkills/{char_id}"), char_id=char_id
+        )
+    if member is not None:
+        scenarios["remove_all_alts"] = lambda: remove_all_alts(
+            ACL_NAME,
+            member,
+            Applications.MembershipStates.REJECTED,
+            Applications.RejectionStates.REMOVED,
+            LARGE_REJECT,
+        )
+    return scenarios
+
+
+def run_scenario(func, repeat: int) -> dict:
+    """
+    Run a scenario repeat times, each time in a transaction that is rolled back
+    so every run sees the same data, and return its timings and query count.
+    """
+    timings = []
+    queries = 0
+    for _ in range(repeat):
+        # The query log is capped, so start every run with an empty one
+        reset_queries()
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                func()
+                timings.append(time.perf_counter() - start)
+            queries = len(context.captured_queries)
+            transaction.set_rollback(True)
+
+    return {
+        "queries": queries,
+        "median_seconds": round(statistics.median(timings), 6),
+        "min_seconds": round(min(timings), 6),
+        "max_seconds": round(max(timings), 6),
+        "runs": repeat,
+    }
+
+
+def run(repeat: int = 3, only=None) -> dict:
+    """Run all (or only the named) scenarios, returning a JSON serializable report"""
+    scenarios = get_scenarios()
+    if only:
+        scenarios = {name: func for name, func in scenarios.items() if name in only}
+
+    return {
+        "whctools_version": __version__,
+        "django_version": django.get_version(),
+        "database": connection.vendor,
+        "timestamp": timezone.now().isoformat(),
+        "scale": {
+            "users": bench_users().count(),
+            "characters": bench_characters().count(),
+            "acl_members": Acl.characters.through.objects.filter(
+                acl_id=ACL_NAME
+            ).count(),
+            "acl_history": ACLHistory.objects.filter(acl_id=ACL_NAME).count(),
+        },
+        "results": {
+            name: run_scenario(func, repeat) for name, func in scenarios.items()
+        },
+    }
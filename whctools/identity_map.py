@@ -0,0 +1,150 @@
+"""
+Request and task scoped cache of the character -> user -> main lookups.
+
+Inside an identity_map() scope every relation is fetched at most once, however
+many helpers ask for it. Outside of a scope the lookups go straight through to
+Alliance Auth, so nothing is ever cached beyond a single unit of work.
+"""
+
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+
+from allianceauth.services.hooks import get_extension_logger
+from app_utils.logging import LoggerAddTag
+
+from whctools import __title__
+
+try:
+    # Alliance auth 4.0 only
+    from allianceauth.framework.api.evecharacter import (
+        get_main_character_from_evecharacter as _get_main_character_from_evecharacter,
+    )
+    from allianceauth.framework.api.evecharacter import (
+        get_user_from_evecharacter as _get_user_from_evecharacter,
+    )
+    from allianceauth.framework.api.user import (
+        get_all_characters_from_user as _get_all_characters_from_user,
+    )
+    from allianceauth.framework.api.user import (
+        get_main_character_name_from_user as _get_main_character_name_from_user,
+    )
+except Exception:
+    # Alliance 3.0 backwards compatibility
+    from .aa3compat import (
+        bc_get_all_characters_from_user as _get_all_characters_from_user,
+    )
+    from .aa3compat import (
+        bc_get_main_character_from_evecharacter as _get_main_character_from_evecharacter,
+    )
+    from .aa3compat import (
+        bc_get_main_character_name_from_user as _get_main_character_name_from_user,
+    )
+    from .aa3compat import bc_get_user_from_eve_character as _get_user_from_evecharacter
+
+logger = LoggerAddTag(get_extension_logger(__name__), __title__)
+
+
+class IdentityMap:
+    """Looked up relations by (kind, pk), counting how often they were reused"""
+
+    def __init__(self):
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, kind, pk, load):
+        key = (kind, pk)
+        if key in self.entries:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self.entries[key] = load()
+        return self.entries[key]
+
+
+_current = contextvars.ContextVar("whctools_identity_map", default=None)
+
+
+@contextmanager
+def identity_map():
+    """
+    Scope in which the lookups below are cached. A nested scope shares the map
+    of the outer one. Yields the IdentityMap, whose hits and misses can be read.
+    """
+    current = _current.get()
+    if current is not None:
+        yield current
+        return
+
+    token = _current.set(IdentityMap())
+    try:
+        yield _current.get()
+    finally:
+        current = _current.get()
+        logger.debug(
+            f"Identity map: {current.hits} hits, {current.misses} misses, {len(current.entries)} relations"
+        )
+        _current.reset(token)
+
+
+def with_identity_map(func):
+    """Run a view or task in its own identity_map() scope"""
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with identity_map():
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def identity_map_stats():
+    """Hits and misses of the current scope, or None outside of one"""
+    current = _current.get()
+    if current is None:
+        return None
+    return {"hits": current.hits, "misses": current.misses}
+
+
+def _lookup(kind, pk, load):
+    current = _current.get()
+    if current is None:
+        return load()
+    return current.get(kind, pk, load)
+
+
+def get_user_from_evecharacter(character):
+    return _lookup("user", character.pk, lambda: _get_user_from_evecharacter(character))
+
+
+def get_main_character_from_evecharacter(character):
+    return _lookup(
+        "main", character.pk, lambda: _get_main_character_from_evecharacter(character)
+    )
+
+
+def get_main_character_name_from_user(user):
+    if user is None:
+        return None
+    return _lookup(
+        "main_name", user.pk, lambda: _get_main_character_name_from_user(user)
+    )
+
+
+def get_all_characters_from_user(user):
+    if user is None:
+        return []
+    # Handed out as a fresh list, so callers cannot change the cached one
+    return list(
+        _lookup(
+            "characters",
+            user.pk,
+            lambda: tuple(_get_all_characters_from_user(user)),
+        )
+    )
+
+
+def get_all_related_characters_from_character(character):
+    """All the characters/alts of a particular character"""
+    return get_all_characters_from_user(get_user_from_evecharacter(character))
@@ -0,0 +1,41 @@
+"""Create the missing applications of existing characters."""
+
+from django.core.management.base import BaseCommand
+
+from allianceauth.eveonline.models import EveCharacter
+
+from whctools.models import Applications
+from whctools.utils import create_missing_applications
+
+
+class Command(BaseCommand):
+    help = (
+        "Create a NOTAMEMBER application for every character that has none. "
+        "Safe to run more than once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of applications created per insert",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        missing = EveCharacter.objects.filter(applications__isnull=True).only("pk")
+
+        # Counted in the database, the insert skips applications that exist
+        # already without telling how many
+        before = Applications.objects.count()
+        batch = []
+        for eve_character in missing.iterator(chunk_size=batch_size):
+            batch.append(eve_character)
+            if len(batch) >= batch_size:
+                create_missing_applications(batch)
+                batch = []
+        create_missing_applications(batch)
+        created = Applications.objects.count() - before
+
+        self.stdout.write(f"Created {created} missing applications")
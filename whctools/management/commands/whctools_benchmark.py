@@ -0,0 +1,68 @@
+"""Generate synthetic WHC data and benchmark whctools against it."""
+
+import json
+
+from django.core.management.base import BaseCommand
+
+from whctools.benchmarks import data, runner
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic WHC data, benchmark the whctools views and helpers "
+        "against it, or remove it again. Never run this against production data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=["generate", "run", "cleanup"])
+        parser.add_argument(
+            "--characters",
+            type=int,
+            default=1000,
+            help="Number of characters to generate",
+        )
+        parser.add_argument(
+            "--alts-per-user",
+            type=int,
+            default=3,
+            help="Number of alts each generated user has next to their main",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Seed for the generated data"
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=3, help="Runs per benchmarked scenario"
+        )
+        parser.add_argument(
+            "--only",
+            nargs="*",
+            help="Only run the named scenarios",
+        )
+        parser.add_argument(
+            "--output",
+            help="Write the JSON report to this file instead of stdout",
+        )
+
+    def handle(self, *args, **options):
+        if options["action"] == "generate":
+            counts = data.generate(
+                options["characters"], options["alts_per_user"], options["seed"]
+            )
+            self.stderr.write(f"Generated {json.dumps(counts)}")
+
+        elif options["action"] == "cleanup":
+            data.cleanup()
+            self.stderr.write("Removed benchmark data")
+
+        else:
+            if not data.bench_users().exists():
+                self.stderr.write("No benchmark data found, run generate first")
+                return
+            report = json.dumps(
+                runner.run(options["repeat"], options["only"]), indent=2
+            )
+            if options["output"]:
+                with open(options["output"], "w") as f:
+                    f.write(report)
+            else:
+                self.stdout.write(report)
@@ -0,0 +1,55 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("eveonline", "0017_alliance_and_corp_names_are_not_unique"),
+        ("memberaudit", "0011_add_standings_index"),
+        ("whctools", "0009_welcomemail"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CharacterSkillSetStatus",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("can_fly", models.BooleanField(default=False)),
+                ("computed_at", models.DateTimeField()),
+                (
+                    "eve_character",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="whc_skill_set_statuses",
+                        to="eveonline.evecharacter",
+                    ),
+                ),
+                (
+                    "skill_set",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="memberaudit.skillset",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Skill Set Status",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="characterskillsetstatus",
+            constraint=models.UniqueConstraint(
+                fields=("eve_character", "skill_set"),
+                name="whctools_unique_character_skill_set_status",
+            ),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("esi", "0013_squashed_0012_fix_token_type_choices"),
+        ("eveonline", "0017_alliance_and_corp_names_are_not_unique"),
+        ("whctools", "0010_characterskillsetstatus"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AclSideEffect",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "step",
+                    models.CharField(
+                        choices=[
+                            ("wanderer_add", "Add to Wanderer"),
+                            ("wanderer_remove", "Remove from Wanderer"),
+                            ("discord_welcome", "Discord welcome"),
+                            ("welcome_mail", "Welcome mail"),
+                        ],
+                        max_length=32,
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("done", "Done"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=16,
+                    ),
+                ),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                ("last_error", models.TextField(blank=True, default="")),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "acl",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="side_effects",
+                        to="whctools.acl",
+                    ),
+                ),
+                (
+                    "eve_character",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="whc_side_effects",
+                        to="eveonline.evecharacter",
+                    ),
+                ),
+                (
+                    "token",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="esi.token",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "ACL Side Effects",
+                "indexes": [
+                    models.Index(
+                        fields=["status", "created_at"],
+                        name="whctools_ac_status_9d100d_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("whctools", "0011_aclsideeffect"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="aclsideeffect",
+            name="whctools_ac_status_9d100d_idx",
+        ),
+        migrations.AddField(
+            model_name="aclsideeffect",
+            name="next_attempt_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name="aclsideeffect",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("done", "Done"),
+                    ("failed", "Failed"),
+                    ("superseded", "Superseded"),
+                ],
+                default="pending",
+                max_length=16,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="aclsideeffect",
+            index=models.Index(
+                fields=["status", "next_attempt_at"],
+                name="whctools_ac_status_ce06c0_idx",
+            ),
+        ),
+    ]
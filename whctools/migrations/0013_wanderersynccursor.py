@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("whctools", "0012_acl_side_effect_outbox"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="WandererSyncCursor",
+            fields=[
+                (
+                    "acl",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="wanderer_sync_cursor",
+                        serialize=False,
+                        to="whctools.acl",
+                    ),
+                ),
+                ("last_history_id", models.BigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("whctools", "0013_wanderersynccursor"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="aclhistory",
+            index=models.Index(
+                fields=["acl", "date_of_change", "id"],
+                name="whctools_ac_acl_id_c44cab_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="aclhistory",
+            index=models.Index(
+                fields=["character", "acl", "date_of_change", "id"],
+                name="whctools_ac_charact_0098fc_idx",
+            ),
+        ),
+    ]
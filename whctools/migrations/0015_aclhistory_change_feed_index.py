@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("whctools", "0014_aclhistory_audit_log_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="aclhistory",
+            index=models.Index(
+                fields=["acl", "id"], name="whctools_ac_acl_id_364f12_idx"
+            ),
+        ),
+    ]
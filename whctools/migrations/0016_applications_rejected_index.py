@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("whctools", "0015_aclhistory_change_feed_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="applications",
+            index=models.Index(
+                fields=["member_state", "last_updated"],
+                name="whctools_ap_member__48eaca_idx",
+            ),
+        ),
+    ]
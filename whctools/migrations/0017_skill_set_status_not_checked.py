@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("whctools", "0016_applications_rejected_index"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="characterskillsetstatus",
+            name="can_fly",
+            field=models.BooleanField(default=False, null=True),
+        ),
+    ]
@@ -5,19 +5,12 @@ from memberaudit.models import SkillSet
 from django import forms
 from django.contrib.auth.models import Group
 from django.db import models
+from django.utils import timezone
+from esi.models import Token
 
 from allianceauth.eveonline.models import EveCharacter
 
-try:
-    # Alliance auth 4.0 only
-    from allianceauth.framework.api.evecharacter import (
-        get_main_character_from_evecharacter,
-    )
-except Exception:
-    # Alliance 3.0 backwards compatibility
-    from .aa3compat import (
-        bc_get_main_character_from_evecharacter as get_main_character_from_evecharacter,
-    )
+from .identity_map import get_main_character_from_evecharacter
 
 
 class General(models.Model):
@@ -74,6 +67,10 @@ class Applications(models.Model):
     class Meta:
         ordering = ["eve_character__character_name"]
         verbose_name_plural = "Applications"
+        indexes = [
+            # Rejected applications page, newest first
+            models.Index(fields=["member_state", "last_updated"]),
+        ]
 
     def get_main_character(self):
         return get_main_character_from_evecharacter(self.eve_character)
@@ -156,14 +153,121 @@ class ACLHistory(models.Model):
     acl = models.ForeignKey(Acl, on_delete=models.CASCADE, related_name="changes")
     character = models.ForeignKey(EveCharacter, null=True, on_delete=models.SET_NULL)
 
+    class Meta:
+        # The audit log pages through one acl (and optionally one character)
+        # ordered by (date_of_change, id), the change feed by id
+        indexes = [
+            models.Index(fields=["acl", "date_of_change", "id"]),
+            models.Index(fields=["acl", "id"]),
+            models.Index(fields=["character", "acl", "date_of_change", "id"]),
+        ]
+
+
+class CharacterSkillSetStatus(models.Model):
+    """
+    Materialized skill set checks for a character against the skill sets used by our ACLs.
+
+    Refreshed by a task whenever Member Audit finishes a skills update, so officers can
+    read the whole skill matrix for a player without recomputing anything.
+    """
+
+    eve_character = models.ForeignKey(
+        EveCharacter, on_delete=models.CASCADE, related_name="whc_skill_set_statuses"
+    )
+    skill_set = models.ForeignKey(SkillSet, on_delete=models.CASCADE)
+    # None while Member Audit has no check of the skill set for the character yet
+    can_fly = models.BooleanField(null=True, default=False)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name_plural = "Skill Set Status"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["eve_character", "skill_set"],
+                name="whctools_unique_character_skill_set_status",
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.eve_character.character_name} - {self.skill_set.name}"
+
+
+class AclSideEffect(models.Model):
+    """
+    Outbox of external actions owed to a character after their ACL membership changed.
+
+    Rows are written in the same transaction as the ACLHistory entry, so an ACL change
+    can never be committed without its Wanderer, Discord and ESI mail steps. A
+    dispatcher task drains them in batches, retries failures with a backoff and
+    records the outcome, so officers can see what is still pending or has failed.
+    """
+
+    class Steps(models.TextChoices):
+        WANDERER_ADD = "wanderer_add", "Add to Wanderer"
+        WANDERER_REMOVE = "wanderer_remove", "Remove from Wanderer"
+        DISCORD_WELCOME = "discord_welcome", "Discord welcome"
+        WELCOME_MAIL = "welcome_mail", "Welcome mail"
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        DONE = "done", "Done"
+        FAILED = "failed", "Failed"
+        # A later Wanderer add/remove for the same character made this one moot
+        SUPERSEDED = "superseded", "Superseded"
+
+    acl = models.ForeignKey(Acl, on_delete=models.CASCADE, related_name="side_effects")
+    eve_character = models.ForeignKey(
+        EveCharacter, on_delete=models.CASCADE, related_name="whc_side_effects"
+    )
+    step = models.CharField(max_length=32, choices=Steps.choices)
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Mail token of the officer the welcome mail is sent from
+    token = models.ForeignKey(Token, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "ACL Side Effects"
+        indexes = [models.Index(fields=["status", "next_attempt_at"])]
+
+    def __str__(self) -> str:
+        return f"{self.eve_character.character_name} - {self.get_step_display()} ({self.get_status_display()})"
+
+
+class WandererSyncCursor(models.Model):
+    """
+    Last ACLHistory entry of an acl that has been replayed to Wanderer.
+
+    The incremental sync only looks at history after this entry; the full sync
+    moves it forward once Wanderer matches the acl again.
+    """
+
+    acl = models.OneToOneField(
+        Acl,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="wanderer_sync_cursor",
+    )
+    last_history_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.acl.name} - {self.last_history_id}"
+
 
 class DateTimeInput(forms.DateTimeInput):
     input_type = "datetime-local"
 
 
 class AclHistoryRequest(forms.ModelForm):
-    limit = forms.IntegerField(widget=forms.NumberInput())
+    limit = forms.IntegerField(min_value=0, widget=forms.NumberInput())
     character_name = forms.CharField(required=False, widget=forms.TextInput())
+    cursor = forms.CharField(required=False, widget=forms.HiddenInput())
 
     class Meta:
         model = ACLHistory
@@ -171,5 +275,23 @@ class AclHistoryRequest(forms.ModelForm):
         widgets = {"date_of_change": DateTimeInput()}
 
 
+class RejectedAppsFilter(forms.Form):
+    reason = forms.TypedChoiceField(
+        required=False,
+        coerce=int,
+        empty_value=None,
+        choices=[("", "Any reason")]
+        + [
+            choice
+            for choice in Applications.RejectionStates.choices
+            if choice[0] != Applications.RejectionStates.NONE
+        ],
+    )
+    expires_within = forms.IntegerField(
+        required=False, min_value=0, max_value=3650, label="Expires within (days)"
+    )
+    cursor = forms.CharField(required=False, widget=forms.HiddenInput())
+
+
 class WelcomeMail(models.Model):
     mail_content = models.TextField(null=True, blank=True)
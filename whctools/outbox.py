@@ -0,0 +1,221 @@
+"""Transactional outbox for the external side effects of ACL changes."""
+
+import datetime
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from allianceauth.services.hooks import get_extension_logger
+from app_utils.logging import LoggerAddTag
+
+from whctools import __title__, wanderer
+from whctools.app_settings import (
+    ESI_MAIL_MAX_RECIPIENTS,
+    OUTBOX_BATCH_SIZE,
+    OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_RETRY_DELAY,
+)
+from whctools.models import AclSideEffect
+
+logger = LoggerAddTag(get_extension_logger(__name__), __title__)
+
+
+def queue_acl_side_effects(acl_name, eve_characters, steps, token=None):
+    """
+    Write the external steps owed to each character to the outbox, and kick the
+    dispatcher once the surrounding transaction has committed.
+
+    Steps that cannot run in this install (no Wanderer settings, no discord bot,
+    no mail token) are skipped, as they were when these ran inline.
+    """
+    # imported here as utils depends on this module
+    from .utils import discord_bot_active
+
+    enabled_steps = []
+    for step in steps:
+        if step in (
+            AclSideEffect.Steps.WANDERER_ADD,
+            AclSideEffect.Steps.WANDERER_REMOVE,
+        ):
+            if not wanderer.is_configured():
+                continue
+        elif step == AclSideEffect.Steps.DISCORD_WELCOME:
+            if not discord_bot_active():
+                continue
+        elif step == AclSideEffect.Steps.WELCOME_MAIL:
+            if token is None:
+                continue
+        enabled_steps.append(step)
+
+    if not eve_characters or not enabled_steps:
+        return
+
+    AclSideEffect.objects.bulk_create(
+        [
+            AclSideEffect(
+                acl_id=acl_name,
+                eve_character=eve_character,
+                step=step,
+                token=token if step == AclSideEffect.Steps.WELCOME_MAIL else None,
+            )
+            for eve_character in eve_characters
+            for step in enabled_steps
+        ]
+    )
+
+    # imported here as tasks depends on this module
+    from .tasks import process_acl_side_effects
+
+    transaction.on_commit(process_acl_side_effects.delay)
+
+
+def _record_side_effects(effects, error=None):
+    """
+    Mark side effects as done, or on error schedule their next attempt with an
+    exponential backoff until OUTBOX_MAX_ATTEMPTS is reached.
+    """
+    now = timezone.now()
+    if error is None:
+        AclSideEffect.objects.filter(pk__in=[effect.pk for effect in effects]).update(
+            status=AclSideEffect.Status.DONE,
+            attempts=F("attempts") + 1,
+            last_error="",
+            updated_at=now,
+        )
+        return
+
+    for effect in effects:
+        attempts = effect.attempts + 1
+        if attempts >= OUTBOX_MAX_ATTEMPTS:
+            status = AclSideEffect.Status.FAILED
+        else:
+            status = AclSideEffect.Status.PENDING
+        AclSideEffect.objects.filter(pk=effect.pk).update(
+            status=status,
+            attempts=attempts,
+            last_error=error,
+            next_attempt_at=now
+            + datetime.timedelta(seconds=OUTBOX_RETRY_DELAY * 2 ** (attempts - 1)),
+            updated_at=now,
+        )
+
+
+def _coalesce_wanderer_side_effects(effects):
+    """
+    Only the latest pending Wanderer add/remove of a character matters, so mark
+    all earlier ones superseded. Returns the effects that are still to be run.
+    """
+    wanderer_steps = [
+        AclSideEffect.Steps.WANDERER_ADD,
+        AclSideEffect.Steps.WANDERER_REMOVE,
+    ]
+    character_pks = {
+        effect.eve_character_id for effect in effects if effect.step in wanderer_steps
+    }
+    if not character_pks:
+        return effects
+
+    pending = AclSideEffect.objects.filter(
+        status=AclSideEffect.Status.PENDING,
+        step__in=wanderer_steps,
+        eve_character_id__in=character_pks,
+    )
+    latest_pks = set(
+        pending.values("eve_character_id")
+        .annotate(latest_pk=Max("pk"))
+        .values_list("latest_pk", flat=True)
+    )
+    pending.exclude(pk__in=latest_pks).update(
+        status=AclSideEffect.Status.SUPERSEDED, updated_at=timezone.now()
+    )
+    return [
+        effect
+        for effect in effects
+        if effect.step not in wanderer_steps or effect.pk in latest_pks
+    ]
+
+
+def run_pending_acl_side_effects():
+    """
+    Deliver one batch of due side effects from the outbox, grouped the same way
+    as the bulk officer actions: one discord message and one mail per
+    ESI_MAIL_MAX_RECIPIENTS characters. Only pending rows are picked up, so
+    steps that are done are never repeated.
+
+    Returns the number of outbox rows taken from the queue.
+    """
+    # imported here as utils depends on this module
+    from .utils import send_ingame_mails, send_welcome_messages
+
+    batch = list(
+        AclSideEffect.objects.filter(
+            status=AclSideEffect.Status.PENDING, next_attempt_at__lte=timezone.now()
+        )
+        .select_related("eve_character", "token__user__profile__main_character")
+        .order_by("pk")[:OUTBOX_BATCH_SIZE]
+    )
+    effects = _coalesce_wanderer_side_effects(batch)
+
+    by_step = defaultdict(list)
+    for effect in effects:
+        by_step[effect.step].append(effect)
+
+    for effect in by_step[AclSideEffect.Steps.WANDERER_ADD]:
+        if wanderer.add_member(effect.eve_character.character_id):
+            _record_side_effects([effect])
+        else:
+            _record_side_effects([effect], "Wanderer rejected the request")
+
+    for effect in by_step[AclSideEffect.Steps.WANDERER_REMOVE]:
+        if wanderer.remove_member(effect.eve_character.character_id):
+            _record_side_effects([effect])
+        else:
+            _record_side_effects([effect], "Wanderer rejected the request")
+
+    welcomes = by_step[AclSideEffect.Steps.DISCORD_WELCOME]
+    if welcomes:
+        try:
+            send_welcome_messages([effect.eve_character for effect in welcomes])
+        except Exception as e:
+            logger.exception("Failed to send discord welcome message")
+            _record_side_effects(welcomes, str(e))
+        else:
+            _record_side_effects(welcomes)
+
+    mails_by_token = defaultdict(list)
+    for effect in by_step[AclSideEffect.Steps.WELCOME_MAIL]:
+        mails_by_token[effect.token].append(effect)
+    for token, mails in mails_by_token.items():
+        if token is None:
+            _record_side_effects(mails, "The sender's mail token was deleted")
+            continue
+        for i in range(0, len(mails), ESI_MAIL_MAX_RECIPIENTS):
+            chunk = mails[i : i + ESI_MAIL_MAX_RECIPIENTS]
+            try:
+                send_ingame_mails(
+                    [effect.eve_character for effect in chunk], token.user, token
+                )
+            except Exception as e:
+                logger.exception("Failed to send welcome mail")
+                _record_side_effects(chunk, str(e))
+            else:
+                _record_side_effects(chunk)
+
+    return len(batch)
+
+
+def retry_failed_acl_side_effects():
+    """Put all failed side effects back in the outbox, returns how many"""
+    count = AclSideEffect.objects.filter(status=AclSideEffect.Status.FAILED).update(
+        status=AclSideEffect.Status.PENDING,
+        attempts=0,
+        next_attempt_at=timezone.now(),
+        updated_at=timezone.now(),
+    )
+    if count:
+        from .tasks import process_acl_side_effects
+
+        transaction.on_commit(process_acl_side_effects.delay)
+    return count
@@ -1,36 +1,71 @@
 # TODO @@@ Need a Signal check on member state change to Alumni to remove from all ACLS
 # could add it to group assigner?
-from django.core.exceptions import ObjectDoesNotExist
-from django.db.models.signals import post_save
+from memberaudit.models import Character as MACharacter
+from memberaudit.models import CharacterUpdateStatus
+
+from django.db.models.signals import post_init, post_save
 from django.dispatch import receiver
 
 from allianceauth.authentication.models import EveCharacter
 from allianceauth.services.hooks import get_extension_logger
 
 from .app_settings import ALLOWED_ALLIANCES
-from .tasks import process_character_leaving_IVY
+from .models import Applications
+from .tasks import queue_character_leaving_alliance, queue_skill_set_refresh
 
 logger = get_extension_logger(__name__)
 
 
+@receiver(post_init, sender=EveCharacter)
+def remember_alliance(sender, instance, **kwargs):
+    """Remember the alliance a character was loaded with, so leaves_uni can tell it changed"""
+    # Read from __dict__, a deferred alliance_id must not cost a query per character
+    instance._whctools_loaded_alliance_id = instance.__dict__.get("alliance_id")
+
+
 @receiver(post_save, sender=EveCharacter)
 def leaves_uni(sender, instance, raw, using, update_fields, **kwargs):
+    """
+    Queue the batch cleanup when a character moved from an allowed alliance to
+    another one. Auth saves every character on its periodic refresh, so anything
+    else is ignored.
+    """
+    loaded_alliance_id = getattr(instance, "_whctools_loaded_alliance_id", None)
+    instance._whctools_loaded_alliance_id = instance.alliance_id
+    if raw or loaded_alliance_id not in ALLOWED_ALLIANCES:
+        return
+    if instance.alliance_id in ALLOWED_ALLIANCES:
+        return
+
     try:
-        if instance.pk:
+        logger.debug(
+            f"WHCTools Signal Character: {instance.character_name} has left IVY/IVY-A - scheduling cleanup of acls/applications"
+        )
+        queue_character_leaving_alliance(instance.pk)
+    except Exception as e:
+        logger.error(e)
 
-            if instance.alliance_id not in ALLOWED_ALLIANCES:
-                logger.debug(
-                    f"WHCTools Signal Character: {instance.character_name} has left IVY/IVY-A - spawning task to cleanup acl/applications"
-                )
-                process_character_leaving_IVY.delay(instance)
 
-        else:
-            logger.debug("WHCTools Signal - Character is None")
-            return
+@receiver(post_save, sender=EveCharacter)
+def create_application(sender, instance, created, raw, **kwargs):
+    """Give every new character its NOTAMEMBER application, so views never have to"""
+    if raw or not created:
+        return
 
-    except ObjectDoesNotExist as e:
-        logger.error(e)
-        pass
-    except Exception as e:
-        logger.error(e)
-        pass
+    Applications.objects.bulk_create(
+        [Applications(eve_character=instance)], ignore_conflicts=True
+    )
+
+
+@receiver(post_save, sender=CharacterUpdateStatus)
+def memberaudit_skills_updated(sender, instance, raw, **kwargs):
+    """
+    Keep the materialized skill set checks in step with memberaudit. memberaudit
+    recomputes its checks in the SKILL_SETS section, which runs after the skills
+    were updated, so a fresh copy of its results is all that is needed.
+    """
+    if raw or not instance.is_success:
+        return
+
+    if instance.section == MACharacter.UpdateSection.SKILL_SETS:
+        queue_skill_set_refresh(instance.character_id, recompute=False)
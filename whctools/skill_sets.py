@@ -0,0 +1,61 @@
+"""Materialized skill set checks of the characters on the ACLs."""
+
+from memberaudit.models import SkillSet
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from allianceauth.services.hooks import get_extension_logger
+from app_utils.logging import LoggerAddTag
+
+from whctools import __title__
+from whctools.models import CharacterSkillSetStatus
+
+logger = LoggerAddTag(get_extension_logger(__name__), __title__)
+
+
+def update_skill_set_statuses(ma_character, recompute=True):
+    """
+    Materialize the skill set checks of a memberaudit character for every skill set used by an ACL.
+
+    With recompute, memberaudit re-runs its skill set checks first. A character can fly
+    a skill set when none of the set's required skills failed. Skill sets memberaudit
+    has no check for yet get a status with can_fly None, so every skill set is covered.
+    """
+    if recompute:
+        ma_character.update_skill_sets()
+
+    acl_skill_set_ids = set(
+        SkillSet.objects.filter(acl__isnull=False).values_list("pk", flat=True)
+    )
+    num_failed_required = dict(
+        ma_character.skill_set_checks.filter(skill_set_id__in=acl_skill_set_ids)
+        .annotate(num_failed_required=Count("failed_required_skills"))
+        .values_list("skill_set_id", "num_failed_required")
+    )
+    now = timezone.now()
+    statuses = [
+        CharacterSkillSetStatus(
+            eve_character_id=ma_character.eve_character_id,
+            skill_set_id=skill_set_id,
+            can_fly=(
+                num_failed_required[skill_set_id] == 0
+                if skill_set_id in num_failed_required
+                else None
+            ),
+            computed_at=now,
+        )
+        for skill_set_id in acl_skill_set_ids
+    ]
+
+    with transaction.atomic():
+        CharacterSkillSetStatus.objects.filter(
+            eve_character_id=ma_character.eve_character_id
+        ).delete()
+        CharacterSkillSetStatus.objects.bulk_create(statuses)
+
+    logger.debug(
+        f"Refreshed {len(statuses)} skill set statuses for {ma_character.eve_character_id}"
+    )
+    return len(statuses)
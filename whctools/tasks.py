@@ -1,62 +1,174 @@
 """Tasks."""
 
 from celery import shared_task
+from django_redis import get_redis_connection
+from memberaudit.models import Character as MACharacter
+
+from django.core.cache import cache
+from django.db import transaction
 
-from allianceauth.authentication.models import EveCharacter
 from allianceauth.services.hooks import get_extension_logger
 
-try:
-    # Alliance auth 4.0 only
-    from allianceauth.framework.api.evecharacter import get_user_from_evecharacter
-except Exception:
-    # Alliance 3.0 backwards compatibility
-    from .aa3compat import bc_get_user_from_eve_character as get_user_from_evecharacter
-
-from .models import Acl, Applications
-from .utils import (
-    remove_in_process_application,
-    update_all_acls_for_character_leaving_alliance,
+from .affiliations import (
+    check_alliance_affiliations as check_alliance_affiliations_helper,
+)
+from .affiliations import process_characters_leaving_alliance
+from .app_settings import ESI_TASK_TIMEOUT_SECONDS, LEAVING_ALLIANCE_DEBOUNCE
+from .identity_map import with_identity_map
+from .outbox import run_pending_acl_side_effects
+from .skill_sets import update_skill_set_statuses
+from .utils import expire_rejections as expire_rejections_helper
+from .wanderer_sync import (
+    sync_wanderer_incremental_helper,
+    sync_wanderer_with_acl_helper,
 )
 
 logger = get_extension_logger(__name__)
 
 
 @shared_task
-def process_character_leaving_IVY(instance: EveCharacter):
+@with_identity_map
+def process_character_leaving_IVY(character_pk: int):
     """Processes a character that is no longer in EveUni"""
 
-    acls_character_is_on = Acl.objects.filter(characters=instance)
+    process_characters_leaving_alliance([character_pk])
 
-    if not acls_character_is_on or len(acls_character_is_on) == 0:
-        # if the character is on no acls, then skip
-        logger.debug("WHCTools Cleanup Task: Character has No Acls")
-        return
 
-    character_applications = (
-        EveCharacter.objects.filter(character_id=instance.character_id)
-        .select_related("applications")
-        .order_by("character_name")
-    )
+@shared_task
+@with_identity_map
+def process_characters_leaving_IVY(character_pks=None):
+    """
+    Processes all given characters that are no longer in EveUni in one batch, or
+    every acl member and applicant outside of EveUni when no characters are given
+    """
+
+    process_characters_leaving_alliance(character_pks)
+
+
+LEAVING_ALLIANCE_BATCH_KEY = "whctools-leaving-alliance-batch"
+LEAVING_ALLIANCE_CHARACTERS_KEY = "whctools-leaving-alliance-characters"
+
+
+def queue_character_leaving_alliance(character_pk: int):
+    """
+    Adds a character to the next departure batch once the current transaction
+    has committed. The batch runs LEAVING_ALLIANCE_DEBOUNCE seconds after the
+    first character was added, so a whole corp leaving is handled by one run.
+    """
+
+    def queue():
+        get_redis_connection("default").sadd(
+            cache.make_key(LEAVING_ALLIANCE_CHARACTERS_KEY), character_pk
+        )
+        # The key outlives the countdown, in case the workers are running behind
+        if cache.add(LEAVING_ALLIANCE_BATCH_KEY, True, LEAVING_ALLIANCE_DEBOUNCE * 2):
+            process_departed_characters.apply_async(countdown=LEAVING_ALLIANCE_DEBOUNCE)
+
+    transaction.on_commit(queue)
+
+
+@shared_task
+def process_departed_characters():
+    """Processes every character queued by queue_character_leaving_alliance"""
+
+    # Characters leaving from now on need another run
+    cache.delete(LEAVING_ALLIANCE_BATCH_KEY)
+    with get_redis_connection("default").pipeline() as pipe:
+        key = cache.make_key(LEAVING_ALLIANCE_CHARACTERS_KEY)
+        pipe.smembers(key)
+        pipe.delete(key)
+        character_pks, _ = pipe.execute()
+
+    if character_pks:
+        process_characters_leaving_IVY(sorted(int(pk) for pk in character_pks))
+
+
+SKILL_SET_REFRESH_KEY = "whctools-skill-set-refresh-{}"
+
+
+def queue_skill_set_refresh(character_pk: int, recompute: bool = True):
+    """
+    Queues refresh_skill_set_statuses once the current transaction has committed,
+    unless a refresh of the memberaudit character is queued already. A queued
+    recompute also covers a refresh without one.
+    """
+
+    def queue():
+        key = SKILL_SET_REFRESH_KEY.format(character_pk)
+        queued_recompute = cache.get(key)
+        if queued_recompute is not None and (queued_recompute or not recompute):
+            return
+        cache.set(key, recompute, ESI_TASK_TIMEOUT_SECONDS)
+        refresh_skill_set_statuses.delay(character_pk, recompute=recompute)
+
+    transaction.on_commit(queue)
+
 
-    if not character_applications:
-        logger.warn(
-            f"WHCTools Cleanup Task: {instance.character_name} is on acls {acls_character_is_on} but has no applications"
+@shared_task
+def refresh_skill_set_statuses(character_pk: int, recompute: bool = True):
+    """Refreshes the materialized skill set checks for a memberaudit character"""
+
+    # Updates from now on need another refresh
+    cache.delete(SKILL_SET_REFRESH_KEY.format(character_pk))
+    try:
+        ma_character = MACharacter.objects.get(pk=character_pk)
+    except MACharacter.DoesNotExist:
+        logger.debug(
+            f"WHCTools Skill Sets: memberaudit character {character_pk} no longer exists"
         )
-        # Potential desync state here - where character is on ACL lists but has no active/open Applications - this is a problem
-        # people should be notified of the desync
-        # discord notification?
-        # remove from ACLs anyways?
-        # dont care because Application is not the end all be all? its just the vehicle for getting onto ACLs?
         return
 
-    user = get_user_from_evecharacter(character=instance)
-    application_details = character_applications[0]
-    existing_acl_state = application_details.member_state
+    update_skill_set_statuses(ma_character, recompute=recompute)
+
+
+ACL_SIDE_EFFECTS_LOCK = "whctools-acl-side-effects-lock"
+
+
+@shared_task
+@with_identity_map
+def process_acl_side_effects():
+    """
+    Drains the outbox of Wanderer, Discord and mail steps of ACL changes in batches.
+    Kicked after every ACL change, and run periodically to pick up retries.
+    """
+
+    # A single runner at a time, so no step is sent twice. Rows queued while
+    # it runs are picked up by the next pass of the loop.
+    if not cache.add(ACL_SIDE_EFFECTS_LOCK, True, ESI_TASK_TIMEOUT_SECONDS):
+        logger.debug("WHCTools Side Effects: already running")
+        return
+
+    try:
+        while run_pending_acl_side_effects():
+            pass
+    finally:
+        cache.delete(ACL_SIDE_EFFECTS_LOCK)
+
+
+@shared_task
+def sync_wanderer_incremental(acl_name: str = "WHC"):
+    """Sends Wanderer the ACL changes made since the last sync"""
+
+    sync_wanderer_incremental_helper(acl_name)
+
+
+@shared_task
+def sync_wanderer_full(acl_name: str = "WHC"):
+    """Reconciles the whole Wanderer ACL against the ACL"""
+
+    sync_wanderer_with_acl_helper(acl_name)
 
-    if existing_acl_state == Applications.MembershipStates.APPLIED:
-        # If the character has applied to the community, remove their application
-        remove_in_process_application(user, application_details)
 
-    update_all_acls_for_character_leaving_alliance(
-        instance, acls_character_is_on, application_details, user, existing_acl_state
-    )
+@shared_task
+def expire_rejections():
+    """Resets all applications whose rejection timeout has passed"""
+
+    expire_rejections_helper()
+
+
+@shared_task
+@with_identity_map
+def check_alliance_affiliations():
+    """Checks with ESI that acl members and applicants are still in EveUni"""
+
+    check_alliance_affiliations_helper()
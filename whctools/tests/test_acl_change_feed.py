@@ -0,0 +1,140 @@
+import datetime
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from whctools.models import Acl, ACLHistory, Applications
+from whctools.tests.utils import create_character, create_user
+from whctools.views_staff import acl_change_feed
+from whctools.views_staff.acl_change_feed import (
+    decode_change_cursor,
+    encode_change_cursor,
+    get_changes,
+    wait_for_changes,
+)
+
+
+class FakeClock:
+    """Stand-in for the time module, where sleeping only moves the clock on"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = 0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps += 1
+        self.now += seconds
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+class TestAclChangeFeed(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.acl, _ = Acl.objects.get_or_create(name="WHC")
+        cls.character = create_character(3000, "member")
+        cls.officer = create_user("officer", [cls.character], superuser=True)
+        settled = timezone.now() - datetime.timedelta(minutes=5)
+        cls.entries = [cls.add_change(settled) for _ in range(5)]
+
+    @classmethod
+    def add_change(cls, date_of_change):
+        return ACLHistory.objects.create(
+            acl=cls.acl,
+            character=cls.character,
+            date_of_change=date_of_change,
+            old_state=Applications.MembershipStates.APPLIED,
+            new_state=Applications.MembershipStates.ACCEPTED,
+            reason_for_change=ACLHistory.ApplicationStateChangeReason.ACCEPTED,
+        )
+
+    def ids(self, changes):
+        return [change["id"] for change in changes]
+
+    def test_should_page_through_changes_by_cursor(self):
+        # when
+        first, first_has_more = get_changes("WHC", 0, 3)
+        rest, rest_has_more = get_changes("WHC", first[-1]["id"], 3)
+        # then
+        self.assertEqual(self.ids(first), [entry.pk for entry in self.entries[:3]])
+        self.assertTrue(first_has_more)
+        self.assertEqual(self.ids(rest), [entry.pk for entry in self.entries[3:]])
+        self.assertFalse(rest_has_more)
+
+    def test_should_hold_back_changes_that_have_not_settled(self):
+        # given
+        recent = self.add_change(timezone.now())
+        self.add_change(timezone.now() - datetime.timedelta(minutes=5))
+        # when
+        changes, has_more = get_changes("WHC", self.entries[-1].pk, 10)
+        # then
+        self.assertEqual(changes, [])
+        self.assertFalse(has_more)
+        with patch.object(acl_change_feed, "CHANGE_FEED_SETTLE_SECONDS", 0):
+            changes, _ = get_changes("WHC", self.entries[-1].pk, 10)
+        self.assertEqual(self.ids(changes)[0], recent.pk)
+
+    def test_should_round_trip_cursors(self):
+        self.assertEqual(decode_change_cursor(encode_change_cursor(42)), 42)
+        self.assertEqual(decode_change_cursor(""), 0)
+        with self.assertRaises(ValueError):
+            decode_change_cursor("not a cursor")
+
+    def test_should_wait_for_changes_up_to_the_maximum(self):
+        # given
+        clock = FakeClock()
+        with patch.object(acl_change_feed, "time", clock), patch.object(
+            acl_change_feed, "CHANGE_FEED_MAX_WAIT", 5
+        ):
+            # when
+            changes, _ = wait_for_changes("WHC", self.entries[-1].pk, 10, 3600)
+        # then
+        self.assertEqual(changes, [])
+        self.assertLessEqual(clock.now, 5)
+        self.assertGreater(clock.sleeps, 0)
+
+    def test_should_not_wait_when_there_are_changes(self):
+        # given
+        clock = FakeClock()
+        with patch.object(acl_change_feed, "time", clock):
+            # when
+            changes, _ = wait_for_changes("WHC", 0, 10, 10)
+        # then
+        self.assertEqual(len(changes), 5)
+        self.assertEqual(clock.sleeps, 0)
+
+    def test_view_should_limit_changes_and_return_the_cursor(self):
+        # given
+        self.client.force_login(self.officer)
+        # when
+        response = self.client.get("/whctools/staff/action/WHC/changes?limit=2")
+        # then
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(self.ids(body["changes"]), [e.pk for e in self.entries[:2]])
+        self.assertTrue(body["has_more"])
+        self.assertEqual(response["X-WHC-Cursor"], body["cursor"])
+        self.assertEqual(decode_change_cursor(body["cursor"]), self.entries[1].pk)
+
+    def test_view_should_reject_invalid_parameters(self):
+        # given
+        self.client.force_login(self.officer)
+        for query in ("wait=nan", "wait=inf", "wait=soon", "cursor=bad", "limit=x"):
+            # when
+            response = self.client.get(f"/whctools/staff/action/WHC/changes?{query}")
+            # then
+            self.assertEqual(response.status_code, 400, query)
+
+    def test_members_export_should_return_a_cursor_to_resync_from(self):
+        # given
+        self.client.force_login(self.officer)
+        # when
+        response = self.client.get("/whctools/staff/action/WHC/export/members/ndjson")
+        # then
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            decode_change_cursor(response["X-WHC-Cursor"]), self.entries[-1].pk
+        )
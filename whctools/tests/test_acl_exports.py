@@ -0,0 +1,63 @@
+import datetime
+
+from django.test import TestCase
+from django.utils import timezone
+
+from whctools.models import Acl, ACLHistory, Applications
+from whctools.tests.utils import create_character
+from whctools.views_staff.acl_exports import (
+    HISTORY_FIELDS,
+    history_rows,
+    streaming_export,
+)
+
+ACCEPTED = Applications.MembershipStates.ACCEPTED
+REJECTED = Applications.MembershipStates.REJECTED
+
+
+class TestHistoryExport(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.acl, _ = Acl.objects.get_or_create(name="WHC")
+        cls.character = create_character(7700, "member")
+        start = timezone.now() - datetime.timedelta(days=1)
+        for i, reason in enumerate(
+            (
+                ACLHistory.ApplicationStateChangeReason.REMOVED,
+                # A rejection reason, as older entries were logged with
+                Applications.RejectionStates.LEFT_COMMUNITY,
+            )
+        ):
+            ACLHistory.objects.create(
+                acl=cls.acl,
+                character=cls.character,
+                date_of_change=start + datetime.timedelta(minutes=i),
+                old_state=ACCEPTED,
+                new_state=REJECTED,
+                reason_for_change=reason,
+            )
+
+    def test_should_export_reasons_outside_the_choices_as_they_are(self):
+        # when
+        rows = list(history_rows("WHC"))
+        # then
+        self.assertEqual(
+            [(row["old_state"], row["new_state"], row["reason"]) for row in rows],
+            [
+                (
+                    "ACCEPTED",
+                    "REJECTED",
+                    "Character was removed from ACL by an Officer",
+                ),
+                ("ACCEPTED", "REJECTED", Applications.RejectionStates.LEFT_COMMUNITY),
+            ],
+        )
+
+    def test_should_stream_the_whole_history_as_csv(self):
+        # when
+        response = streaming_export(history_rows("WHC"), HISTORY_FIELDS, "csv", "WHC")
+        # then
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], ",".join(HISTORY_FIELDS))
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[2].endswith(",5,"))
@@ -0,0 +1,119 @@
+from django.test import TestCase, override_settings
+
+from whctools.app_settings import ALLOWED_ALLIANCES
+from whctools.models import Acl
+from whctools.tests.utils import create_character, create_characters, create_user
+from whctools.views_staff.acl_roster import (
+    DISALLOWED_ALLIANCE,
+    MAIN_IN_DISALLOWED_ALLIANCE,
+    ORPHANED,
+    acl_roster,
+    acl_roster_totals,
+)
+
+ALLOWED = {"alliance_id": ALLOWED_ALLIANCES[0]}
+DISALLOWED = {"alliance_id": 1}
+
+
+class TestAclRoster(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        acl, _ = Acl.objects.get_or_create(name="WHC")
+        alpha = create_character(9000, "alpha", **ALLOWED)
+        alpha_alt = create_character(9001, "alpha alt", **ALLOWED)
+        create_user("alpha", [alpha, alpha_alt])
+        beta = create_character(9002, "beta", **DISALLOWED)
+        beta_alt = create_character(9003, "beta alt", **ALLOWED)
+        create_user("beta", [beta, beta_alt])
+        gamma = create_character(9004, "gamma", **ALLOWED)
+        gamma_alt = create_character(9005, "gamma alt", **DISALLOWED)
+        create_user("gamma", [gamma, gamma_alt])
+        orphan = create_character(9006, "orphan", **ALLOWED)
+        # gamma's main is left off the acl
+        acl.characters.add(alpha, alpha_alt, beta, beta_alt, gamma_alt, orphan)
+
+    def roster(self):
+        return list(
+            acl_roster("WHC").values_list(
+                "character_name", "main_name", "is_main", "main_in_acl", "error"
+            )
+        )
+
+    def test_should_compute_and_order_the_roster(self):
+        self.assertEqual(
+            self.roster(),
+            [
+                ("orphan", None, False, False, ORPHANED),
+                ("beta", "beta", True, True, MAIN_IN_DISALLOWED_ALLIANCE),
+                ("beta alt", "beta", False, True, MAIN_IN_DISALLOWED_ALLIANCE),
+                ("gamma alt", "gamma", False, False, DISALLOWED_ALLIANCE),
+                ("alpha", "alpha", True, True, None),
+                ("alpha alt", "alpha", False, True, None),
+            ],
+        )
+
+    def test_should_flag_alliances_of_character_and_main(self):
+        # when
+        flags = {
+            row["character_name"]: (
+                row["in_allowed_alliance"],
+                row["main_in_allowed_alliance"],
+            )
+            for row in acl_roster("WHC").values(
+                "character_name", "in_allowed_alliance", "main_in_allowed_alliance"
+            )
+        }
+        # then
+        self.assertEqual(flags["beta alt"], (True, False))
+        self.assertEqual(flags["gamma alt"], (False, True))
+        self.assertEqual(flags["orphan"], (True, False))
+
+    def test_should_compute_the_roster_in_one_query(self):
+        with self.assertNumQueries(1):
+            self.roster()
+
+    def test_should_count_characters_players_and_mains(self):
+        self.assertEqual(
+            acl_roster_totals("WHC"),
+            {"total_chars": 6, "total_players": 3, "total_mains": 2},
+        )
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+class TestAclRosterPage(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        acl, _ = Acl.objects.get_or_create(name="WHC")
+        characters = create_characters(
+            3, 8000, name="member", alliance_id=ALLOWED_ALLIANCES[0]
+        )
+        cls.officer = create_user("officer", characters, superuser=True)
+        acl.characters.add(*characters)
+
+    def setUp(self):
+        self.client.force_login(self.officer)
+
+    def get_page(self, query):
+        response = self.client.get(f"/whctools/staff/action/WHC/roster?{query}")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_should_page_through_the_roster(self):
+        # when
+        first = self.get_page("page=1&page_size=2&sort=name")
+        last = self.get_page("page=2&page_size=2&sort=name")
+        # then
+        self.assertEqual(
+            [row["name"] for row in first["results"] + last["results"]],
+            ["member 0", "member 1", "member 2"],
+        )
+        self.assertTrue(first["has_next"])
+        self.assertFalse(last["has_next"])
+        self.assertNotIn("totals", first)
+
+    def test_should_return_an_empty_page_far_past_the_end(self):
+        # when
+        page = self.get_page(f"page={10**18}")
+        # then
+        self.assertEqual(page["results"], [])
+        self.assertFalse(page["has_next"])
@@ -0,0 +1,137 @@
+import datetime
+from unittest.mock import ANY, patch
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from whctools.app_settings import OUTBOX_MAX_ATTEMPTS, OUTBOX_RETRY_DELAY
+from whctools.models import Acl, AclSideEffect
+from whctools.outbox import retry_failed_acl_side_effects, run_pending_acl_side_effects
+from whctools.tests.utils import create_characters
+from whctools.views_staff.open_applications import outstanding_acl_side_effects
+
+ADD = AclSideEffect.Steps.WANDERER_ADD
+REMOVE = AclSideEffect.Steps.WANDERER_REMOVE
+
+
+@patch("whctools.wanderer.remove_member", return_value=True)
+@patch("whctools.wanderer.add_member", return_value=True)
+class TestAclSideEffects(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.acl, _ = Acl.objects.get_or_create(name="WHC")
+        cls.characters = create_characters(2, 4000)
+
+    def queue(self, character, step, **kwargs):
+        return AclSideEffect.objects.create(
+            acl=self.acl, eve_character=character, step=step, **kwargs
+        )
+
+    def test_should_only_run_the_latest_wanderer_step_per_character(
+        self, add_member, remove_member
+    ):
+        # given
+        first, second = self.characters
+        earlier = [self.queue(first, ADD), self.queue(first, REMOVE)]
+        latest = self.queue(first, ADD)
+        other = self.queue(second, REMOVE)
+        # when
+        run_pending_acl_side_effects()
+        # then
+        for effect in earlier:
+            effect.refresh_from_db()
+            self.assertEqual(effect.status, AclSideEffect.Status.SUPERSEDED)
+        latest.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(latest.status, AclSideEffect.Status.DONE)
+        self.assertEqual(other.status, AclSideEffect.Status.DONE)
+        add_member.assert_called_once_with(first.character_id)
+        remove_member.assert_called_once_with(second.character_id)
+
+    def test_should_back_off_after_a_failure(self, add_member, remove_member):
+        # given
+        add_member.return_value = False
+        effect = self.queue(self.characters[0], ADD)
+        before = timezone.now()
+        # when
+        run_pending_acl_side_effects()
+        # then
+        effect.refresh_from_db()
+        self.assertEqual(effect.status, AclSideEffect.Status.PENDING)
+        self.assertEqual(effect.attempts, 1)
+        self.assertEqual(effect.last_error, "Wanderer rejected the request")
+        self.assertGreaterEqual(
+            effect.next_attempt_at,
+            before + datetime.timedelta(seconds=OUTBOX_RETRY_DELAY),
+        )
+        # Not due yet, so the next pass leaves it alone
+        self.assertEqual(run_pending_acl_side_effects(), 0)
+
+    def test_should_fail_after_the_last_attempt(self, add_member, remove_member):
+        # given
+        add_member.return_value = False
+        effect = self.queue(self.characters[0], ADD, attempts=OUTBOX_MAX_ATTEMPTS - 1)
+        # when
+        run_pending_acl_side_effects()
+        # then
+        effect.refresh_from_db()
+        self.assertEqual(effect.status, AclSideEffect.Status.FAILED)
+        self.assertEqual(effect.attempts, OUTBOX_MAX_ATTEMPTS)
+
+    @override_settings(DISCORD_WELCOME_MAIL_CHANNEL=[1234])
+    @patch("whctools.utils.get_discord_user_id", create=True, return_value=5678)
+    @patch("whctools.utils.discord_bot_active", return_value=True)
+    def test_should_retry_a_welcome_discord_could_not_send(
+        self, discord_bot_active, get_discord_user_id, add_member, remove_member
+    ):
+        # given
+        effect = self.queue(self.characters[0], AclSideEffect.Steps.DISCORD_WELCOME)
+        with patch(
+            "whctools.utils.send_message",
+            create=True,
+            side_effect=RuntimeError("Discord is down"),
+        ) as send_message:
+            # when
+            run_pending_acl_side_effects()
+        # then
+        send_message.assert_called_once_with(channel_id=1234, message=ANY)
+        effect.refresh_from_db()
+        self.assertEqual(effect.status, AclSideEffect.Status.PENDING)
+        self.assertEqual(effect.attempts, 1)
+        self.assertEqual(effect.last_error, "Discord is down")
+
+    def test_should_requeue_failed_steps_on_retry(self, add_member, remove_member):
+        # given
+        failed = self.queue(
+            self.characters[0],
+            ADD,
+            status=AclSideEffect.Status.FAILED,
+            attempts=OUTBOX_MAX_ATTEMPTS,
+            next_attempt_at=timezone.now() + datetime.timedelta(days=1),
+        )
+        superseded = self.queue(
+            self.characters[1], ADD, status=AclSideEffect.Status.SUPERSEDED
+        )
+        # when
+        count = retry_failed_acl_side_effects()
+        # then
+        self.assertEqual(count, 1)
+        failed.refresh_from_db()
+        self.assertEqual(failed.status, AclSideEffect.Status.PENDING)
+        self.assertEqual(failed.attempts, 0)
+        self.assertLessEqual(failed.next_attempt_at, timezone.now())
+        superseded.refresh_from_db()
+        self.assertEqual(superseded.status, AclSideEffect.Status.SUPERSEDED)
+
+    def test_should_list_only_pending_and_failed_steps(self, add_member, remove_member):
+        # given
+        character = self.characters[0]
+        pending = [self.queue(character, ADD) for _ in range(3)]
+        failed = self.queue(character, REMOVE, status=AclSideEffect.Status.FAILED)
+        for status in (AclSideEffect.Status.DONE, AclSideEffect.Status.SUPERSEDED):
+            self.queue(character, ADD, status=status)
+        # when
+        side_effects, count = outstanding_acl_side_effects(limit=2)
+        # then
+        self.assertEqual(count, 4)
+        self.assertEqual(side_effects, [failed, pending[-1]])
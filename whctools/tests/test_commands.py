@@ -0,0 +1,36 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from whctools.models import Applications
+from whctools.tests.utils import create_characters
+
+
+class TestBackfillApplications(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.characters = create_characters(5, 7800)
+        Applications.objects.filter(eve_character__in=cls.characters[:3]).delete()
+
+    def backfill(self):
+        out = StringIO()
+        call_command("whctools_backfill_applications", "--batch-size=2", stdout=out)
+        return out.getvalue().strip()
+
+    def test_should_report_only_the_applications_it_created(self):
+        # when
+        message = self.backfill()
+        # then
+        self.assertEqual(message, "Created 3 missing applications")
+        self.assertEqual(
+            Applications.objects.filter(eve_character__in=self.characters).count(), 5
+        )
+
+    def test_should_create_nothing_when_run_again(self):
+        # given
+        self.backfill()
+        # when
+        message = self.backfill()
+        # then
+        self.assertEqual(message, "Created 0 missing applications")
@@ -0,0 +1,56 @@
+from django.test import TestCase
+
+from allianceauth.eveonline.models import EveCharacter
+
+from whctools.identity_map import (
+    get_all_related_characters_from_character,
+    get_main_character_from_evecharacter,
+    identity_map,
+    identity_map_stats,
+)
+from whctools.tests.utils import create_characters, create_user
+
+
+class TestIdentityMap(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.characters = create_characters(3, 2000)
+        cls.user = create_user("owner", cls.characters)
+
+    def test_should_look_up_each_relation_once_per_scope(self):
+        # given
+        character = EveCharacter.objects.get(pk=self.characters[1].pk)
+        with identity_map() as current:
+            get_main_character_from_evecharacter(character)
+            # when
+            with self.assertNumQueries(0):
+                main = get_main_character_from_evecharacter(character)
+            # then
+            self.assertEqual(main, self.characters[0])
+            self.assertEqual((current.hits, current.misses), (1, 1))
+
+    def test_should_share_the_map_with_nested_scopes(self):
+        # given
+        character = self.characters[1]
+        with identity_map():
+            related = get_all_related_characters_from_character(character)
+            # when
+            with identity_map():
+                related.clear()
+                get_all_related_characters_from_character(character)
+                stats = identity_map_stats()
+            # then
+            self.assertEqual(stats, {"hits": 2, "misses": 2})
+            self.assertCountEqual(
+                get_all_related_characters_from_character(character), self.characters
+            )
+
+    def test_should_not_cache_outside_of_a_scope(self):
+        # given
+        character = EveCharacter.objects.get(pk=self.characters[1].pk)
+        get_main_character_from_evecharacter(character)
+        # when
+        main = get_main_character_from_evecharacter(character)
+        # then
+        self.assertEqual(main, self.characters[0])
+        self.assertIsNone(identity_map_stats())
@@ -0,0 +1,56 @@
+import datetime
+
+from memberaudit.models import Character as MACharacter
+from memberaudit.models import CharacterUpdateStatus
+
+from django.test import TestCase
+
+from whctools.models import Applications
+from whctools.tests.utils import create_characters, create_user
+from whctools.views_staff.open_applications import (
+    all_characters_currently_with_open_apps,
+)
+
+
+class TestOpenApplications(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.main, cls.alt = create_characters(2, 7900, name="applicant")
+        create_user("applicant", [cls.main, cls.alt])
+        Applications.objects.filter(eve_character__in=[cls.main, cls.alt]).update(
+            member_state=Applications.MembershipStates.APPLIED
+        )
+        applied_at = Applications.objects.get(eve_character=cls.main).last_updated
+        for character, is_success in ((cls.main, True), (cls.alt, False)):
+            ma_character = MACharacter.objects.create(eve_character=character)
+            CharacterUpdateStatus.objects.bulk_create(
+                [
+                    CharacterUpdateStatus(
+                        character=ma_character,
+                        section=section,
+                        is_success=is_success,
+                        update_finished_at=applied_at - datetime.timedelta(seconds=10),
+                    )
+                    for section in MACharacter.UpdateSection.enabled_sections()
+                ]
+            )
+
+    def test_should_annotate_every_application_in_one_query(self):
+        # when
+        with self.assertNumQueries(1):
+            rows = all_characters_currently_with_open_apps()
+        # then
+        self.assertEqual(
+            {
+                row["application"].eve_character.character_name: (
+                    row["is_main_char"],
+                    row["main_character_name"],
+                    row["ma_is_valid"],
+                )
+                for row in rows
+            },
+            {
+                "applicant 0": (True, "applicant 0", True),
+                "applicant 1": (False, "applicant 0", False),
+            },
+        )
@@ -0,0 +1,71 @@
+import datetime
+from unittest.mock import patch
+
+from django.contrib.messages import get_messages
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from whctools.app_settings import ALLOWED_ALLIANCES
+from whctools.models import ApplicationHistory, Applications
+from whctools.tests.utils import create_character, create_user
+
+APPLIED = Applications.MembershipStates.APPLIED
+REJECTED = Applications.MembershipStates.REJECTED
+NOTAMEMBER = Applications.MembershipStates.NOTAMEMBER
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+@patch("whctools.views_actions.player_actions.notify")
+@patch("whctools.views_actions.player_actions.force_update_memberaudit")
+class TestSubmitApplication(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.character = create_character(
+            7500,
+            "applicant",
+            alliance_id=ALLOWED_ALLIANCES[0],
+            alliance_name="alliance",
+            alliance_ticker="ALLY",
+        )
+        cls.user = create_user("applicant", [cls.character], superuser=True)
+
+    def reject(self, timeout):
+        Applications.objects.filter(eve_character=self.character).update(
+            member_state=REJECTED,
+            reject_reason=Applications.RejectionStates.WITHDRAWN,
+            reject_timeout=timeout,
+        )
+
+    def apply(self):
+        self.client.force_login(self.user)
+        response = self.client.get(f"/whctools/apply/{self.character.character_id}")
+        self.assertEqual(response.status_code, 302)
+        return [str(message) for message in get_messages(response.wsgi_request)]
+
+    def application(self):
+        return Applications.objects.get(eve_character=self.character)
+
+    def test_should_apply_when_rejection_expired_before_the_sweep(self, *_):
+        # given
+        self.reject(timezone.now() - datetime.timedelta(minutes=1))
+        # when
+        messages = self.apply()
+        # then
+        self.assertEqual(messages, ["Application Submitted"])
+        application = self.application()
+        self.assertEqual(application.member_state, APPLIED)
+        self.assertEqual(application.reject_reason, Applications.RejectionStates.NONE)
+        self.assertEqual(
+            list(ApplicationHistory.objects.values_list("old_state", "new_state")),
+            [(REJECTED, NOTAMEMBER), (NOTAMEMBER, APPLIED)],
+        )
+
+    def test_should_refuse_while_rejection_is_cooling_down(self, *_):
+        # given
+        self.reject(timezone.now() + datetime.timedelta(days=1))
+        # when
+        messages = self.apply()
+        # then
+        self.assertIn("still under cooldown", messages[0])
+        self.assertEqual(self.application().member_state, REJECTED)
+        self.assertFalse(ApplicationHistory.objects.exists())
@@ -0,0 +1,148 @@
+"""Query budgets for the whctools views, tasks and sync helpers.
+
+Every scenario runs against generated data sets of growing size. The number of
+queries it issues may only grow by the scenario's budget, so an N+1 query shows
+up as a failing test with a diff of the queries that were added.
+"""
+
+import difflib
+import re
+from unittest.mock import patch
+
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from allianceauth.eveonline.models import EveCharacter
+
+from whctools import wanderer
+from whctools.benchmarks import data, runner
+from whctools.models import Acl, Applications, WandererSyncCursor
+from whctools.tasks import (
+    process_character_leaving_IVY,
+    process_characters_leaving_IVY,
+)
+from whctools.wanderer_sync import (
+    sync_wanderer_incremental_helper,
+    sync_wanderer_with_acl_helper,
+)
+
+# An alliance outside of ALLOWED_ALLIANCES
+LEFT_ALLIANCE_ID = 99000001
+
+# Characters generated per data set
+SCALES = (40, 160)
+
+# Queries a scenario may add between the smallest and the largest data set.
+# Scenarios not listed here must issue a constant number of queries.
+QUERY_GROWTH_BUDGETS = {
+    # The bulk add of a group is skipped on a data set with nobody to add
+    "sync_groups_with_acl_helper": 2,
+}
+
+_LITERALS = re.compile(r"'[^']*'|\"s\d+_x\d+\"|\b\d+\b")
+
+
+def _normalize(sql):
+    """Strip literal values, so the same query on other rows compares equal"""
+    return _LITERALS.sub("?", sql)
+
+
+def _extra_scenarios():
+    """The tasks and sync helpers that the benchmark runner does not cover"""
+    member = (
+        Applications.objects.filter(
+            eve_character__in=data.bench_characters(),
+            member_state=Applications.MembershipStates.ACCEPTED,
+        )
+        .exclude(eve_character__character_ownership__user__username=f"{data.PREFIX}0")
+        .select_related("eve_character")
+        .first()
+    )
+    members = [
+        {"eve_character_id": str(character_id), "name": name}
+        for character_id, name in Acl.characters.through.objects.filter(
+            acl_id=data.ACL_NAME
+        ).values_list("evecharacter__character_id", "evecharacter__character_name")
+    ]
+
+    def leave_alliance():
+        EveCharacter.objects.filter(pk=member.eve_character.pk).update(
+            alliance_id=LEFT_ALLIANCE_ID
+        )
+        process_character_leaving_IVY(member.eve_character.pk)
+
+    def corp_leaves_alliance():
+        # The same number of departures at every scale, as each owner is notified
+        departed = EveCharacter.objects.filter(
+            character_ownership__user__in=data.bench_users()
+            .exclude(username=f"{data.PREFIX}0")
+            .order_by("id")[:3]
+        )
+        character_pks = list(departed.values_list("pk", flat=True))
+        departed.update(alliance_id=LEFT_ALLIANCE_ID)
+        process_characters_leaving_IVY(character_pks)
+
+    def incremental_sync():
+        WandererSyncCursor.objects.create(acl_id=data.ACL_NAME, last_history_id=0)
+        sync_wanderer_incremental_helper(data.ACL_NAME)
+
+    return {
+        "process_character_leaving_IVY": leave_alliance,
+        "process_characters_leaving_IVY": corp_leaves_alliance,
+        "sync_wanderer_with_acl_helper": lambda: sync_wanderer_with_acl_helper(
+            data.ACL_NAME
+        ),
+        "sync_wanderer_incremental_helper": incremental_sync,
+    }, members
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+@patch.object(wanderer, "WANDERER_ACL_ID", "bench")
+@patch.object(wanderer, "WANDERER_ACL_TOKEN", "bench")
+@patch("whctools.wanderer.apply_changes", return_value=(0, []))
+class TestQueryBudgets(TestCase):
+    def capture_queries(self):
+        """Run every scenario once per scale, returning {name: [queries per scale]}"""
+        captured = {}
+        for scale in SCALES:
+            data.generate(scale)
+            scenarios = runner.get_scenarios()
+            extra, members = _extra_scenarios()
+            scenarios.update(extra)
+            for name, func in scenarios.items():
+                with patch(
+                    "whctools.wanderer.get_members", return_value=members
+                ), transaction.atomic():
+                    with CaptureQueriesContext(connection) as context:
+                        func()
+                    transaction.set_rollback(True)
+                captured.setdefault(name, []).append(
+                    [_normalize(query["sql"]) for query in context.captured_queries]
+                )
+        return captured
+
+    def test_query_counts_stay_within_budget(self, apply_changes):
+        captured = self.capture_queries()
+        self.assertIn("remove_all_alts", captured)
+        self.assertIn("get_skills", captured)
+
+        failures = []
+        for name, runs in captured.items():
+            smallest, largest = runs[0], runs[-1]
+            budget = QUERY_GROWTH_BUDGETS.get(name, 0)
+            if len(largest) - len(smallest) > budget:
+                diff = "\n".join(
+                    difflib.unified_diff(
+                        smallest,
+                        largest,
+                        f"{name} @ {SCALES[0]} characters",
+                        f"{name} @ {SCALES[-1]} characters",
+                        lineterm="",
+                    )
+                )
+                failures.append(
+                    f"{name}: {len(smallest)} -> {len(largest)} queries, budget +{budget}\n{diff}"
+                )
+
+        self.assertFalse(failures, "\n\n".join(failures))
@@ -0,0 +1,73 @@
+import datetime
+
+from django.test import TestCase
+from django.utils import timezone
+
+from whctools.models import Applications, RejectedAppsFilter
+from whctools.tests.utils import create_character
+from whctools.views_staff.rejected_applications import get_rejected_apps
+
+REJECTED = Applications.MembershipStates.REJECTED
+SKILLS = Applications.RejectionStates.SKILLS
+OTHER = Applications.RejectionStates.OTHER
+
+
+class TestRejectedApplications(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.applications = []
+        for i in range(5):
+            character = create_character(5000 + i, f"rejected {i}")
+            Applications.objects.filter(eve_character=character).update(
+                member_state=REJECTED,
+                reject_reason=OTHER if i == 0 else SKILLS,
+                reject_timeout=now + datetime.timedelta(days=2 if i == 0 else 30),
+                # Two share a timestamp, so the cursor has to break the tie
+                last_updated=now - datetime.timedelta(hours=min(i, 3)),
+            )
+            cls.applications.append(Applications.objects.get(eve_character=character))
+
+    def page_through(self, page_size, **filters):
+        pks, cursor = [], None
+        while True:
+            rows, cursor = get_rejected_apps(
+                cursor=cursor, page_size=page_size, **filters
+            )
+            pks += [row["application"].pk for row in rows]
+            if cursor is None:
+                return pks
+
+    def test_should_page_through_all_rejections_newest_first(self):
+        # when
+        pks = self.page_through(2)
+        # then
+        self.assertEqual(len(pks), len(set(pks)))
+        self.assertEqual(
+            pks,
+            [
+                application.pk
+                for application in sorted(
+                    self.applications,
+                    key=lambda a: (a.last_updated, a.pk),
+                    reverse=True,
+                )
+            ],
+        )
+
+    def test_should_filter_by_reason_and_expiry(self):
+        self.assertEqual(
+            set(self.page_through(2, reason=SKILLS)),
+            {application.pk for application in self.applications[1:]},
+        )
+        self.assertEqual(
+            self.page_through(2, expires_within_days=3), [self.applications[0].pk]
+        )
+
+    def test_should_raise_on_an_invalid_cursor(self):
+        with self.assertRaises(ValueError):
+            get_rejected_apps(cursor="not a cursor")
+
+    def test_filter_should_reject_out_of_range_expiry(self):
+        self.assertFalse(RejectedAppsFilter({"expires_within": "5000000"}).is_valid())
+        self.assertTrue(RejectedAppsFilter({"expires_within": "3650"}).is_valid())
@@ -0,0 +1,133 @@
+from unittest.mock import patch
+
+from django.contrib.messages import get_messages
+from django.test import TestCase, override_settings
+
+from whctools import wanderer
+from whctools.models import Acl, ApplicationHistory, Applications
+from whctools.tests.utils import create_character, create_user
+from whctools.views_actions.staff_actions import (
+    accept_applications,
+    reject_applications,
+)
+
+APPLIED = Applications.MembershipStates.APPLIED
+ACCEPTED = Applications.MembershipStates.ACCEPTED
+REJECTED = Applications.MembershipStates.REJECTED
+NOTAMEMBER = Applications.MembershipStates.NOTAMEMBER
+
+
+@patch.object(wanderer, "WANDERER_ACL_ID", None)
+@patch("whctools.views_actions.staff_actions.notify")
+class TestAcceptApplications(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.acl, _ = Acl.objects.get_or_create(name="WHC")
+        cls.officer = create_user("officer")
+        cls.applicant = create_character(9000, "applicant")
+        cls.outsider = create_character(9001, "outsider")
+        Applications.objects.filter(eve_character=cls.applicant).update(
+            member_state=APPLIED
+        )
+
+    def state(self, character):
+        return Applications.objects.get(eve_character=character).member_state
+
+    def test_should_only_accept_open_applications(self, notify):
+        # when
+        accepted = accept_applications(
+            [self.applicant.character_id, self.outsider.character_id],
+            "WHC",
+            self.officer,
+            None,
+        )
+        # then
+        self.assertEqual([app.eve_character for app in accepted], [self.applicant])
+        self.assertEqual(self.state(self.applicant), ACCEPTED)
+        self.assertEqual(self.state(self.outsider), NOTAMEMBER)
+        self.assertEqual(list(self.acl.characters.all()), [self.applicant])
+
+    def test_should_not_accept_an_application_twice(self, notify):
+        # given
+        accept_applications([self.applicant.character_id], "WHC", self.officer, None)
+        # when
+        accepted = accept_applications(
+            [self.applicant.character_id], "WHC", self.officer, None
+        )
+        # then
+        self.assertEqual(accepted, [])
+        self.assertEqual(
+            ApplicationHistory.objects.filter(
+                application__eve_character=self.applicant
+            ).count(),
+            1,
+        )
+
+
+@patch.object(wanderer, "WANDERER_ACL_ID", None)
+@patch("whctools.views_actions.staff_actions.notify")
+class TestRejectApplications(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.acl, _ = Acl.objects.get_or_create(name="WHC")
+        cls.officer = create_user("officer")
+        cls.applicant = create_character(9100, "applicant")
+        cls.member = create_character(9101, "member")
+        for character, state in ((cls.applicant, APPLIED), (cls.member, ACCEPTED)):
+            Applications.objects.filter(eve_character=character).update(
+                member_state=state
+            )
+        cls.acl.characters.add(cls.member)
+
+    def test_should_only_reject_open_applications(self, notify):
+        # when
+        rejected = reject_applications(
+            [self.applicant.character_id, self.member.character_id],
+            "skills",
+            "WHC",
+            self.officer,
+        )
+        # then
+        self.assertEqual([app.eve_character for app in rejected], [self.applicant])
+        application = Applications.objects.get(eve_character=self.applicant)
+        self.assertEqual(application.member_state, REJECTED)
+        self.assertEqual(application.reject_reason, Applications.RejectionStates.SKILLS)
+        self.assertEqual(
+            Applications.objects.get(eve_character=self.member).member_state,
+            ACCEPTED,
+        )
+        self.assertEqual(list(self.acl.characters.all()), [self.member])
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+class TestBulkDecision(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.applicant = create_character(9200, "applicant")
+        Applications.objects.filter(eve_character=cls.applicant).update(
+            member_state=APPLIED
+        )
+        cls.officer = create_user("officer", [cls.applicant], superuser=True)
+
+    def test_should_refuse_an_unknown_acl(self):
+        # given
+        self.client.force_login(self.officer)
+        # when
+        response = self.client.post(
+            "/whctools/staff/action/bulk",
+            {
+                "char_ids": [self.applicant.character_id],
+                "decision": "skills",
+                "acl_name": "missing",
+            },
+        )
+        # then
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            [str(message) for message in get_messages(response.wsgi_request)],
+            ["ACL 'missing' does not exist."],
+        )
+        self.assertEqual(
+            Applications.objects.get(eve_character=self.applicant).member_state,
+            APPLIED,
+        )
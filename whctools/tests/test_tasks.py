@@ -1,11 +1,360 @@
+from unittest.mock import patch
+
+from memberaudit.models import Character as MACharacter
+from memberaudit.models import CharacterUpdateStatus
+
+from django.core.cache import cache
 from django.test import TestCase
 
+from allianceauth.eveonline.models import (
+    EveAllianceInfo,
+    EveCharacter,
+    EveCorporationInfo,
+)
+
+from whctools import wanderer
+from whctools.affiliations import process_characters_leaving_alliance
+from whctools.app_settings import ALLOWED_ALLIANCES
+from whctools.benchmarks import data
+from whctools.models import Acl, Applications, CharacterSkillSetStatus
+from whctools.skill_sets import update_skill_set_statuses
+from whctools.tasks import (
+    LEAVING_ALLIANCE_BATCH_KEY,
+    check_alliance_affiliations,
+    process_departed_characters,
+    queue_skill_set_refresh,
+)
+from whctools.tests.utils import create_character, create_characters, create_user
+
+
+class FakeEsi:
+    """Local stand-in for ESI, answering affiliation lookups from a dict"""
+
+    class _Operation:
+        def __init__(self, result):
+            self._result = result
+
+        def result(self):
+            if isinstance(self._result, Exception):
+                raise self._result
+            return self._result
+
+    def __init__(self, alliance_ids, failing_character_ids=(), corporation_id=98000000):
+        self.alliance_ids = alliance_ids
+        self.corporation_id = corporation_id
+        self.failing_character_ids = set(failing_character_ids)
+        self.calls = []
+        self.client = self
+        self.Character = self
+
+    def post_characters_affiliation(self, characters):
+        self.calls.append(list(characters))
+        if self.failing_character_ids & set(characters):
+            return self._Operation(OSError("ESI is down"))
+        return self._Operation(
+            [
+                {
+                    "character_id": character_id,
+                    "corporation_id": self.corporation_id,
+                    "alliance_id": self.alliance_ids.get(
+                        character_id, ALLOWED_ALLIANCES[0]
+                    ),
+                }
+                for character_id in characters
+            ]
+        )
+
+
+@patch.object(wanderer, "WANDERER_ACL_ID", None)
+@patch("whctools.affiliations.ESI_AFFILIATION_CHUNK_SIZE", 10)
+class TestCheckAllianceAffiliations(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        data.generate(60)
+        cls.members = list(
+            EveCharacter.objects.filter(
+                acl__name=data.ACL_NAME, alliance_id__in=ALLOWED_ALLIANCES
+            ).order_by("pk")
+        )
+
+    def run_check(self, esi):
+        """Run the task, returning the mock of Auth's character refresh"""
+        with patch("whctools.affiliations.EsiClientProvider", return_value=esi), patch(
+            "whctools.affiliations.update_character"
+        ) as update_character:
+            check_alliance_affiliations()
+        return update_character
+
+    def test_should_remove_members_that_left(self):
+        # given
+        departed = self.members[1]
+        esi = FakeEsi({departed.character_id: 99000001})
+        # when
+        self.run_check(esi)
+        # then
+        self.assertFalse(
+            Acl.characters.through.objects.filter(evecharacter=departed).exists()
+        )
+        departed.refresh_from_db()
+        self.assertEqual(departed.alliance_id, 99000001)
+        self.assertEqual(
+            Applications.objects.get(eve_character=departed).reject_reason,
+            Applications.RejectionStates.LEFT_ALLIANCE,
+        )
+        self.assertTrue(
+            Acl.characters.through.objects.filter(evecharacter=self.members[2]).exists()
+        )
+
+    def test_should_fill_in_a_known_corporation_and_alliance(self):
+        # given
+        departed = self.members[1]
+        EveAllianceInfo.objects.create(
+            alliance_id=99000001,
+            alliance_name="Elsewhere",
+            alliance_ticker="ELSE",
+            executor_corp_id=98000001,
+        )
+        EveCorporationInfo.objects.create(
+            corporation_id=98000001,
+            corporation_name="New Corp",
+            corporation_ticker="NEW",
+            member_count=1,
+        )
+        esi = FakeEsi({departed.character_id: 99000001}, corporation_id=98000001)
+        # when
+        update_character = self.run_check(esi)
+        # then
+        departed.refresh_from_db()
+        self.assertEqual(
+            (
+                departed.corporation_id,
+                departed.corporation_name,
+                departed.alliance_name,
+                departed.alliance_ticker,
+            ),
+            (98000001, "New Corp", "Elsewhere", "ELSE"),
+        )
+        update_character.delay.assert_not_called()
+
+    def test_should_queue_a_refresh_for_an_unknown_alliance(self):
+        # given
+        departed = self.members[1]
+        alliance_name = departed.alliance_name
+        esi = FakeEsi({departed.character_id: 99000001})
+        # when
+        update_character = self.run_check(esi)
+        # then
+        departed.refresh_from_db()
+        self.assertEqual(departed.alliance_name, alliance_name)
+        update_character.delay.assert_called_once_with(departed.character_id)
+
+    def test_should_look_up_characters_in_chunks(self):
+        # given
+        esi = FakeEsi({})
+        # when
+        self.run_check(esi)
+        # then
+        self.assertGreater(len(esi.calls), 1)
+        self.assertTrue(all(len(chunk) <= 10 for chunk in esi.calls))
+        checked = [character_id for chunk in esi.calls for character_id in chunk]
+        self.assertEqual(len(checked), len(set(checked)))
+        self.assertTrue(
+            {member.character_id for member in self.members} <= set(checked)
+        )
+
+    def test_should_skip_chunks_esi_fails_on(self):
+        # given
+        first, later = self.members[0], self.members[-1]
+        esi = FakeEsi(
+            {first.character_id: None, later.character_id: None},
+            failing_character_ids=[first.character_id],
+        )
+        # when
+        self.run_check(esi)
+        # then
+        failed_chunk = next(chunk for chunk in esi.calls if first.character_id in chunk)
+        self.assertNotIn(later.character_id, failed_chunk)
+        self.assertTrue(
+            Acl.characters.through.objects.filter(evecharacter=first).exists()
+        )
+        self.assertFalse(
+            Acl.characters.through.objects.filter(evecharacter=later).exists()
+        )
+
+
+@patch.object(wanderer, "WANDERER_ACL_ID", None)
+@patch("whctools.affiliations.notify")
+class TestProcessCharactersLeavingAlliance(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = create_character(6000, "member", alliance_id=99000001)
+        cls.bystander = create_character(6001, "bystander", alliance_id=99000001)
+        cls.user = create_user("leaver", [cls.member, cls.bystander])
+        Applications.objects.filter(eve_character=cls.member).update(
+            member_state=Applications.MembershipStates.ACCEPTED
+        )
+        Acl.objects.get_or_create(name="WHC")[0].characters.add(cls.member)
+
+    def test_should_only_notify_about_characters_that_changed(self, notify):
+        # when
+        process_characters_leaving_alliance([self.member.pk, self.bystander.pk])
+        # then
+        notify.danger.assert_called_once()
+        message = notify.danger.call_args.args[2]
+        self.assertIn("member", message)
+        self.assertNotIn("bystander", message)
+        self.assertEqual(
+            Applications.objects.get(eve_character=self.bystander).member_state,
+            Applications.MembershipStates.NOTAMEMBER,
+        )
+
+    def test_should_not_notify_when_nothing_changed(self, notify):
+        # when
+        process_characters_leaving_alliance([self.bystander.pk])
+        # then
+        notify.danger.assert_not_called()
+
+
+class TestLeavesUni(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.characters = create_characters(
+            3,
+            6300,
+            name="member",
+            alliance_id=ALLOWED_ALLIANCES[0],
+            alliance_name="alliance",
+            alliance_ticker="ALLY",
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def leave(self, characters):
+        for character in characters:
+            character = EveCharacter.objects.get(pk=character.pk)
+            character.alliance_id = None
+            character.save()
+
+    @patch("whctools.tasks.process_departed_characters")
+    def test_should_schedule_one_batch_after_commit(self, process_departed_characters):
+        # when
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.leave(self.characters[:2])
+        # then
+        process_departed_characters.apply_async.assert_not_called()
+        self.assertIsNone(cache.get(LEAVING_ALLIANCE_BATCH_KEY))
+        # when
+        for callback in callbacks:
+            callback()
+        # then
+        process_departed_characters.apply_async.assert_called_once()
+
+    @patch("whctools.tasks.process_characters_leaving_alliance")
+    def test_should_pass_the_departed_characters_to_the_batch(
+        self, process_characters_leaving_alliance
+    ):
+        # given
+        with patch("whctools.tasks.process_departed_characters.apply_async"):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.leave(self.characters[:2])
+        # when
+        process_departed_characters()
+        process_departed_characters()
+        # then
+        process_characters_leaving_alliance.assert_called_once_with(
+            sorted(character.pk for character in self.characters[:2])
+        )
+        self.assertIsNone(cache.get(LEAVING_ALLIANCE_BATCH_KEY))
+
+
+@patch("whctools.tasks.refresh_skill_set_statuses")
+class TestQueueSkillSetRefresh(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def queue(self, recompute):
+        with self.captureOnCommitCallbacks(execute=True):
+            queue_skill_set_refresh(1, recompute=recompute)
+
+    def test_should_queue_a_recompute_only_once(self, refresh_skill_set_statuses):
+        # when
+        self.queue(True)
+        self.queue(False)
+        self.queue(True)
+        # then
+        refresh_skill_set_statuses.delay.assert_called_once_with(1, recompute=True)
+
+    def test_should_still_queue_a_recompute_after_a_refresh(
+        self, refresh_skill_set_statuses
+    ):
+        # when
+        self.queue(False)
+        self.queue(True)
+        # then
+        self.assertEqual(refresh_skill_set_statuses.delay.call_count, 2)
+
+    def test_should_wait_for_the_transaction_to_commit(
+        self, refresh_skill_set_statuses
+    ):
+        # when
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            queue_skill_set_refresh(1)
+        # then
+        refresh_skill_set_statuses.delay.assert_not_called()
+        self.assertEqual(len(callbacks), 1)
+
+
+@patch("whctools.signals.queue_skill_set_refresh")
+class TestMemberauditSkillsUpdated(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        data.generate(1)
+        cls.ma_character = MACharacter.objects.filter(
+            eve_character__in=data.bench_characters()
+        ).first()
+
+    def finish(self, section, is_success=True):
+        CharacterUpdateStatus.objects.update_or_create(
+            character=self.ma_character,
+            section=section,
+            defaults={"is_success": is_success},
+        )
+
+    def test_should_copy_the_checks_after_a_skill_set_update(
+        self, queue_skill_set_refresh
+    ):
+        # when
+        self.finish(MACharacter.UpdateSection.SKILL_SETS)
+        # then
+        queue_skill_set_refresh.assert_called_once_with(
+            self.ma_character.pk, recompute=False
+        )
+
+    def test_should_ignore_skill_updates_and_failures(self, queue_skill_set_refresh):
+        # when
+        self.finish(MACharacter.UpdateSection.SKILLS)
+        self.finish(MACharacter.UpdateSection.SKILL_SETS, is_success=False)
+        # then
+        queue_skill_set_refresh.assert_not_called()
+
+
+class TestUpdateSkillSetStatuses(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        data.generate(4)
 
-class TestTasks(TestCase):
-    def test_should_run_task(self):
+    def test_should_record_skill_sets_without_a_check(self):
         # given
-        ...
+        ma_character = MACharacter.objects.filter(
+            eve_character__in=data.bench_characters()
+        ).first()
         # when
-        ...
+        count = update_skill_set_statuses(ma_character, recompute=False)
         # then
-        ...
+        self.assertEqual(count, 1)
+        status = CharacterSkillSetStatus.objects.get(
+            eve_character_id=ma_character.eve_character_id
+        )
+        self.assertEqual(status.skill_set.name, data.SKILL_SET_NAME)
+        self.assertIsNone(status.can_fly)
@@ -0,0 +1,361 @@
+import datetime
+from unittest.mock import patch
+
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from whctools import wanderer
+from whctools.models import (
+    Acl,
+    ACLHistory,
+    AclSideEffect,
+    ApplicationHistory,
+    Applications,
+    WandererSyncCursor,
+)
+from whctools.tests.utils import create_characters, create_user
+from whctools.utils import (
+    OPEN_APPLICATIONS_COUNT_KEY,
+    expire_rejections,
+    get_open_applications_count,
+    invalidate_open_applications_count,
+    remove_character_from_community,
+    remove_characters_from_acl,
+    sync_groups_with_acl_helper,
+)
+from whctools.views_staff.acl_history import get_acl_history_page
+from whctools.wanderer_sync import sync_wanderer_incremental_helper
+
+APPLIED = Applications.MembershipStates.APPLIED
+ACCEPTED = Applications.MembershipStates.ACCEPTED
+REJECTED = Applications.MembershipStates.REJECTED
+NOTAMEMBER = Applications.MembershipStates.NOTAMEMBER
+
+
+def add_change(acl, character, date_of_change, old_state=APPLIED, new_state=ACCEPTED):
+    return ACLHistory.objects.create(
+        acl=acl,
+        character=character,
+        date_of_change=date_of_change,
+        old_state=old_state,
+        new_state=new_state,
+    )
+
+
+@patch.object(wanderer, "WANDERER_ACL_ID", "acl")
+@patch.object(wanderer, "WANDERER_ACL_TOKEN", "token")
+@patch("whctools.wanderer.apply_changes", return_value=(0, []))
+class TestSyncWandererIncremental(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.acl, _ = Acl.objects.get_or_create(name="WHC")
+        cls.joined, cls.left = create_characters(2, 7000)
+        cls.acl.characters.add(cls.joined)
+        cls.start = add_change(cls.acl, cls.joined, timezone.now())
+
+    def start_cursor(self):
+        WandererSyncCursor.objects.create(acl=self.acl, last_history_id=self.start.pk)
+
+    def test_should_start_a_new_cursor_at_the_latest_change(self, apply_changes):
+        # when
+        sent = sync_wanderer_incremental_helper("WHC")
+        # then
+        self.assertEqual(sent, 0)
+        apply_changes.assert_not_called()
+        self.assertEqual(
+            WandererSyncCursor.objects.get(acl=self.acl).last_history_id, self.start.pk
+        )
+
+    def test_should_send_the_current_state_of_changed_characters(self, apply_changes):
+        # given
+        self.start_cursor()
+        now = timezone.now()
+        add_change(self.acl, self.joined, now)
+        add_change(self.acl, self.left, now)
+        latest = add_change(self.acl, self.left, now, ACCEPTED, REJECTED)
+        # when
+        sent = sync_wanderer_incremental_helper("WHC")
+        # then
+        self.assertEqual(sent, 2)
+        apply_changes.assert_called_once_with(
+            [self.joined.character_id], [self.left.character_id]
+        )
+        self.assertEqual(
+            WandererSyncCursor.objects.get(acl=self.acl).last_history_id, latest.pk
+        )
+
+    def test_should_skip_changes_the_outbox_delivers(self, apply_changes):
+        # given
+        self.start_cursor()
+        add_change(self.acl, self.joined, timezone.now() - datetime.timedelta(hours=1))
+        AclSideEffect.objects.create(
+            acl=self.acl,
+            eve_character=self.joined,
+            step=AclSideEffect.Steps.WANDERER_ADD,
+            status=AclSideEffect.Status.DONE,
+        )
+        # when
+        sent = sync_wanderer_incremental_helper("WHC")
+        # then
+        self.assertEqual(sent, 0)
+        apply_changes.assert_called_once_with([], [])
+
+    def test_should_replay_changes_that_failed(self, apply_changes):
+        # given
+        self.start_cursor()
+        failed = add_change(self.acl, self.joined, timezone.now())
+        add_change(self.acl, self.left, timezone.now(), ACCEPTED, REJECTED)
+        apply_changes.return_value = (1, [("add", self.joined.character_id)])
+        # when
+        sync_wanderer_incremental_helper("WHC")
+        # then
+        self.assertEqual(
+            WandererSyncCursor.objects.get(acl=self.acl).last_history_id,
+            failed.pk - 1,
+        )
+
+
+class TestExpireRejections(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.expired, cls.cooling_down, cls.accepted = create_characters(3, 7100)
+        for character, state, timeout in (
+            (cls.expired, REJECTED, now - datetime.timedelta(minutes=1)),
+            (cls.cooling_down, REJECTED, now + datetime.timedelta(days=1)),
+            (cls.accepted, ACCEPTED, now - datetime.timedelta(days=1)),
+        ):
+            Applications.objects.filter(eve_character=character).update(
+                member_state=state,
+                reject_reason=Applications.RejectionStates.SKILLS,
+                reject_timeout=timeout,
+            )
+
+    def state(self, character):
+        return Applications.objects.get(eve_character=character).member_state
+
+    def test_should_reset_only_expired_rejections(self):
+        # when
+        count = expire_rejections()
+        # then
+        self.assertEqual(count, 1)
+        self.assertEqual(self.state(self.expired), NOTAMEMBER)
+        self.assertEqual(self.state(self.cooling_down), REJECTED)
+        self.assertEqual(self.state(self.accepted), ACCEPTED)
+        history = ApplicationHistory.objects.get()
+        self.assertEqual(history.application_id, self.expired.pk)
+        self.assertEqual((history.old_state, history.new_state), (REJECTED, NOTAMEMBER))
+
+    def test_should_do_nothing_when_run_again(self):
+        # given
+        expire_rejections()
+        # when
+        count = expire_rejections()
+        # then
+        self.assertEqual(count, 0)
+        self.assertEqual(ApplicationHistory.objects.count(), 1)
+
+
+class TestAclHistoryPage(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.acl, _ = Acl.objects.get_or_create(name="WHC")
+        cls.first, cls.second = create_characters(2, 7200)
+        cls.start = timezone.now() - datetime.timedelta(days=10)
+        # Several entries share a date, so pages have to break ties by id
+        cls.entries = [
+            add_change(
+                cls.acl,
+                cls.first if i % 2 else cls.second,
+                cls.start + datetime.timedelta(days=i // 2),
+            )
+            for i in range(7)
+        ]
+
+    def page_through(self, page_size, since=None, character_name=""):
+        pks, cursor = [], None
+        while True:
+            entries, cursor = get_acl_history_page(
+                "WHC",
+                since or self.start,
+                character_name=character_name,
+                cursor=cursor,
+                page_size=page_size,
+            )
+            pks += [entry.pk for entry in entries]
+            if cursor is None:
+                return pks
+
+    def test_should_page_through_the_log_oldest_first(self):
+        for page_size in (1, 2, 3, 7, 100):
+            self.assertEqual(
+                self.page_through(page_size),
+                [entry.pk for entry in self.entries],
+                page_size,
+            )
+
+    def test_should_filter_by_date_and_character(self):
+        self.assertEqual(
+            self.page_through(2, since=self.start + datetime.timedelta(days=2)),
+            [entry.pk for entry in self.entries[4:]],
+        )
+        self.assertEqual(
+            self.page_through(2, character_name=self.first.character_name),
+            [entry.pk for entry in self.entries if entry.character == self.first],
+        )
+
+    def test_should_raise_on_an_invalid_cursor(self):
+        with self.assertRaises(ValueError):
+            get_acl_history_page("WHC", self.start, cursor="not a cursor")
+
+
+@patch.object(wanderer, "WANDERER_ACL_ID", "acl")
+@patch.object(wanderer, "WANDERER_ACL_TOKEN", "token")
+class TestRemoveCharactersFromAcl(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.acl, _ = Acl.objects.get_or_create(name="WHC")
+        cls.group = Group.objects.create(name="WHC members")
+        cls.acl.groups.add(cls.group)
+        cls.leaver, cls.stayer_main, cls.stayer_alt, cls.outsider = create_characters(
+            4, 7300
+        )
+        cls.leaving_user = create_user("leaver", [cls.leaver])
+        cls.staying_user = create_user("stayer", [cls.stayer_main, cls.stayer_alt])
+        cls.acl.characters.add(cls.leaver, cls.stayer_main, cls.stayer_alt)
+        cls.group.user_set.add(cls.leaving_user, cls.staying_user)
+
+    def remove(self, characters):
+        return remove_characters_from_acl(
+            "WHC",
+            characters,
+            ACCEPTED,
+            REJECTED,
+            ACLHistory.ApplicationStateChangeReason.REMOVED,
+        )
+
+    def test_should_only_log_characters_that_were_on_the_acl(self):
+        # when
+        removed = self.remove([self.leaver, self.stayer_alt, self.outsider])
+        # then
+        self.assertEqual(removed, [self.leaver, self.stayer_alt])
+        self.assertEqual(list(self.acl.characters.all()), [self.stayer_main])
+        self.assertEqual(
+            set(ACLHistory.objects.values_list("character_id", flat=True)),
+            {self.leaver.pk, self.stayer_alt.pk},
+        )
+        self.assertEqual(
+            set(
+                AclSideEffect.objects.filter(
+                    step=AclSideEffect.Steps.WANDERER_REMOVE
+                ).values_list("eve_character_id", flat=True)
+            ),
+            {self.leaver.pk, self.stayer_alt.pk},
+        )
+
+    def test_should_keep_owners_with_another_character_in_the_groups(self):
+        # when
+        self.remove([self.leaver, self.stayer_alt])
+        # then
+        self.assertEqual(list(self.group.user_set.all()), [self.staying_user])
+
+    def test_should_do_nothing_for_characters_not_on_the_acl(self):
+        # when
+        removed = self.remove([self.outsider])
+        # then
+        self.assertEqual(removed, [])
+        self.assertFalse(ACLHistory.objects.exists())
+        self.assertFalse(AclSideEffect.objects.exists())
+
+
+class TestSyncGroupsWithAcl(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.acl, _ = Acl.objects.get_or_create(name="WHC")
+        cls.groups = [Group.objects.create(name=f"WHC {i}") for i in range(2)]
+        cls.acl.groups.add(*cls.groups)
+        member, joined, _ = create_characters(3, 7400)
+        cls.member = create_user("member", [member])
+        cls.joined = create_user("joined", [joined])
+        cls.departed = create_user("departed")
+        cls.acl.characters.add(member, joined)
+        for group in cls.groups:
+            group.user_set.add(cls.member, cls.departed)
+
+    def test_should_add_and_remove_the_difference_only(self):
+        # when
+        result = sync_groups_with_acl_helper("WHC")
+        # then
+        self.assertEqual(result, (2, 2))
+        for group in self.groups:
+            self.assertEqual(set(group.user_set.all()), {self.member, self.joined})
+
+    def test_should_change_nothing_once_in_sync(self):
+        # given
+        sync_groups_with_acl_helper("WHC")
+        # when
+        result = sync_groups_with_acl_helper("WHC")
+        # then
+        self.assertEqual(result, (0, 0))
+
+    def test_should_return_none_for_an_unknown_acl(self):
+        self.assertIsNone(sync_groups_with_acl_helper("missing"))
+
+
+class TestOpenApplicationsCount(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.characters = create_characters(3, 7500)
+        Applications.objects.filter(eve_character__in=cls.characters[:2]).update(
+            member_state=APPLIED
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_should_count_applied_applications(self):
+        self.assertEqual(get_open_applications_count(), 2)
+
+    def test_should_serve_the_count_from_the_cache(self):
+        # given
+        get_open_applications_count()
+        # when/then
+        with self.assertNumQueries(0):
+            self.assertEqual(get_open_applications_count(), 2)
+
+    def test_should_invalidate_only_once_committed(self):
+        # given
+        get_open_applications_count()
+        # when
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_open_applications_count()
+            self.assertEqual(cache.get(OPEN_APPLICATIONS_COUNT_KEY), 2)
+        # then
+        self.assertIsNone(cache.get(OPEN_APPLICATIONS_COUNT_KEY))
+
+    def test_should_refresh_when_an_application_leaves_applied(self):
+        # given
+        get_open_applications_count()
+        application = Applications.objects.get(eve_character=self.characters[0])
+        # when
+        with self.captureOnCommitCallbacks(execute=True):
+            remove_character_from_community(
+                application, REJECTED, Applications.RejectionStates.OTHER, 1
+            )
+        # then
+        self.assertEqual(get_open_applications_count(), 1)
+
+    def test_should_keep_the_cache_when_applied_is_not_involved(self):
+        # given
+        get_open_applications_count()
+        application = Applications.objects.get(eve_character=self.characters[2])
+        # when
+        with self.captureOnCommitCallbacks() as callbacks:
+            remove_character_from_community(
+                application, REJECTED, Applications.RejectionStates.OTHER, 1
+            )
+        # then
+        self.assertEqual(callbacks, [])
+        self.assertEqual(cache.get(OPEN_APPLICATIONS_COUNT_KEY), 2)
@@ -0,0 +1,60 @@
+from unittest.mock import Mock, patch
+
+from django.test import TestCase, override_settings
+
+from whctools import wanderer
+from whctools.app_settings import WANDERER_BACKOFF_MAX
+from whctools.tests.utils import create_character, create_user
+
+
+class TestWandererRetry(TestCase):
+    def setUp(self):
+        wanderer._session = None
+        self.addCleanup(setattr, wanderer, "_session", None)
+
+    def retry(self):
+        return wanderer.get_session().get_adapter("https://").max_retries
+
+    def test_should_not_retry_adding_a_member(self):
+        # when
+        retry = self.retry()
+        # then
+        self.assertFalse(retry.is_retry("POST", 503))
+        self.assertTrue(retry.is_retry("DELETE", 503))
+
+    def test_should_cap_the_wait_asked_for_by_the_server(self):
+        # given
+        response = Mock(headers={"Retry-After": "3600"})
+        # when
+        retry_after = self.retry().get_retry_after(response)
+        # then
+        self.assertEqual(retry_after, WANDERER_BACKOFF_MAX)
+
+    def test_should_cap_the_backoff(self):
+        # given
+        retry = self.retry()
+        for _ in range(20):
+            retry = retry.increment("GET", "/", error=ConnectionError())
+            retry.total = 30
+        # when
+        backoff = retry.get_backoff_time()
+        # then
+        self.assertEqual(backoff, WANDERER_BACKOFF_MAX)
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+class TestSyncWandererView(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        character = create_character(7600, "officer")
+        cls.officer = create_user("officer", [character], superuser=True)
+
+    @patch("whctools.views.sync_wanderer_full")
+    def test_should_queue_the_sync(self, sync_wanderer_full):
+        # given
+        self.client.force_login(self.officer)
+        # when
+        response = self.client.get("/whctools/staff/WHC/sync_wanderer_with_acl")
+        # then
+        self.assertEqual(response.status_code, 302)
+        sync_wanderer_full.delay.assert_called_once_with("WHC")
@@ -0,0 +1,43 @@
+"""Factories shared by the whctools tests"""
+
+from django.contrib.auth.models import User
+
+from allianceauth.authentication.models import CharacterOwnership
+from allianceauth.eveonline.models import EveCharacter
+
+
+def create_character(character_id, character_name=None, **fields):
+    """An EveCharacter in a placeholder corp, with its NOTAMEMBER application"""
+    fields.setdefault("corporation_id", 98000000)
+    fields.setdefault("corporation_name", "corp")
+    fields.setdefault("corporation_ticker", "CORP")
+    return EveCharacter.objects.create(
+        character_id=character_id,
+        character_name=character_name or f"character {character_id}",
+        **fields,
+    )
+
+
+def create_characters(count, first_id, name="character", **fields):
+    """count characters with consecutive ids, named "<name> 0" onwards"""
+    return [
+        create_character(first_id + i, f"{name} {i}", **fields) for i in range(count)
+    ]
+
+
+def create_user(username, characters=(), superuser=False):
+    """A user owning the given characters, the first of them as main"""
+    if superuser:
+        user = User.objects.create_superuser(username)
+    else:
+        user = User.objects.create_user(username)
+    for character in characters:
+        CharacterOwnership.objects.create(
+            character=character,
+            user=user,
+            owner_hash=f"{username}-{character.character_id}",
+        )
+    if characters:
+        user.profile.main_character = characters[0]
+        user.profile.save()
+    return user
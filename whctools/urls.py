@@ -22,8 +22,26 @@ urlpatterns = [
         views.reject,
         name="staff_reject",
     ),
+    path("staff/action/bulk", views.bulk_decision, name="staff_bulk_decision"),
+    path(
+        "staff/action/side_effects/retry",
+        views.retry_side_effects,
+        name="staff_retry_side_effects",
+    ),
     path("staff/action/<char_id>/reset", views.reset, name="staff_reset"),
     path("staff/action/<acl_pk>/view", views.list_acl_members, name="view_acl_members"),
+    path("staff/action/<acl_pk>/roster", views.acl_roster_page, name="acl_roster"),
+    path("staff/action/<acl_pk>/changes", views.acl_changes, name="acl_changes"),
+    path(
+        "staff/action/<acl_pk>/export/members/<export_format>",
+        views.export_acl_members,
+        name="export_acl_members",
+    ),
+    path(
+        "staff/action/<acl_pk>/export/history/<export_format>",
+        views.export_acl_history,
+        name="export_acl_history",
+    ),
     path("staff/open", views.open_applications, name="staff_view_open_apps"),
     path(
         "staff/rejected", views.rejected_applications, name="staff_view_rejected_apps"
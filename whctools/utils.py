@@ -1,40 +1,82 @@
+import base64
 import datetime
-import functools
-import threading
+import json
+from collections import defaultdict
 
-import requests
+from celery import chain
 from memberaudit.models import Character as MACharacter
 
 # from memberaudit.tasks import update_character as ma_update_character
 # For MA 3.x, we have more granularity.
+from memberaudit.tasks import (
+    update_character_skill_sets as ma_update_character_skill_sets,
+)
 from memberaudit.tasks import update_character_skills as ma_update_character_skills
 
 from django.apps import apps
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 from esi.clients import EsiClientProvider
+from esi.models import Token
 
-from allianceauth.framework.api.evecharacter import (
-    get_main_character_from_evecharacter,
-    get_user_from_evecharacter,
-)
+from allianceauth.authentication.models import CharacterOwnership
 from allianceauth.notifications import notify
 from allianceauth.services.hooks import get_extension_logger
 from app_utils.logging import LoggerAddTag
 
-from whctools import __title__
-from whctools.app_settings import ALLOWED_ALLIANCES, WANDERER_ACL_ID, WANDERER_ACL_TOKEN
+from whctools import __title__, wanderer
+from whctools.app_settings import (
+    ALLOWED_ALLIANCES,
+    ESI_MAIL_MAX_RECIPIENTS,
+    OPEN_APPLICATIONS_COUNT_TTL,
+    WANDERER_ACL_ID,
+)
 from whctools.models import (
     Acl,
     ACLHistory,
+    AclSideEffect,
     ApplicationHistory,
     Applications,
     WelcomeMail,
 )
 
-from .aa3compat import get_all_related_characters_from_character
-from .app_settings import TRANSIENT_REJECT
+from .aa3compat import (  # noqa: F401 - batch resolver is re-exported
+    get_main_characters_from_evecharacters,
+)
+from .identity_map import (
+    get_all_related_characters_from_character,
+    get_main_character_from_evecharacter,
+    get_user_from_evecharacter,
+)
+from .outbox import queue_acl_side_effects
+
+OPEN_APPLICATIONS_COUNT_KEY = "whctools_open_applications_count"
+
+
+def get_open_applications_count():
+    """
+    Number of applications in the APPLIED state, for the officer menu badge.
+    Cached, as the menu is rendered on every Auth page.
+    """
+    return cache.get_or_set(
+        OPEN_APPLICATIONS_COUNT_KEY,
+        lambda: Applications.objects.filter(
+            member_state=Applications.MembershipStates.APPLIED
+        ).count(),
+        OPEN_APPLICATIONS_COUNT_TTL,
+    )
+
+
+def invalidate_open_applications_count():
+    """
+    Drop the cached open application count once the current transaction has
+    committed. Call it whenever an application enters or leaves APPLIED.
+    """
+    transaction.on_commit(lambda: cache.delete(OPEN_APPLICATIONS_COUNT_KEY))
 
 
 def discord_bot_active():
@@ -73,6 +115,8 @@ def remove_character_from_community(app, new_state, reason, reject_time):
     remove a singular character application to a new_state for a given reason with a reject_time cooldown on a new application
     """
     try:
+        if Applications.MembershipStates.APPLIED in (app.member_state, new_state):
+            invalidate_open_applications_count()
 
         app.member_state = new_state
         app.reject_reason = reason
@@ -92,98 +136,154 @@ def remove_all_alts(acl_name, member_application, new_state, reason, reject_time
     all_characters = get_all_related_characters_from_character(
         member_application.eve_character
     )
-    for char in all_characters:
+    applications = Applications.objects.filter(
+        eve_character__in=all_characters
+    ).select_related("eve_character")
+
+    # The ACL history records the state each alt came from, so batch the removals
+    # by that state rather than issuing one removal per alt.
+    characters_by_old_state = defaultdict(list)
+    for app in applications:
         logger.debug(
-            f"[Remove All Alts]- checking alt {char.character_name} for application"
+            f"Removing alt named {app.eve_character.character_name} belonging to {member_application.eve_character.character_name}"
         )
-        app = Applications.objects.filter(eve_character=char)[0]
-        if app:
-            logger.debug(
-                f"Removing alt named {app.eve_character.character_name} belonging to {member_application.eve_character.character_name}"
-            )
-            old_state = app.member_state
-            remove_character_from_community(app, new_state, reason, reject_time)
-            remove_character(
-                acl_name,
-                app.eve_character,
-                old_state,
-                app.member_state,
-                reason,
-            )
+        characters_by_old_state[app.member_state].append(app.eve_character)
+        remove_character_from_community(app, new_state, reason, reject_time)
+
+    for old_state, characters in characters_by_old_state.items():
+        remove_characters(acl_name, characters, old_state, new_state, reason)
 
     notification_names = ", ".join([char.character_name for char in all_characters])
     return notification_names
 
 
 def remove_character(acl_name, eve_character, from_state, to_state, reason):
-    remove_character_from_acl(acl_name, eve_character, from_state, to_state, reason)
-    remove_character_from_wanderer(
-        acl_name, eve_character.character_id, eve_character.character_name
+    remove_characters(acl_name, [eve_character], from_state, to_state, reason)
+
+
+def remove_characters(acl_name, eve_characters, from_state, to_state, reason):
+    """
+    Remove characters from the acl. Their removal from Wanderer is queued in the
+    same transaction and delivered by the outbox dispatcher.
+    """
+    return remove_characters_from_acl(
+        acl_name, eve_characters, from_state, to_state, reason
     )
 
 
 def remove_character_from_acl(acl_name, eve_character, from_state, to_state, reason):
     """Helper function to remove a character from an acl"""
+    return remove_characters_from_acl(
+        acl_name, [eve_character], from_state, to_state, reason
+    )
 
-    acl_object = Acl.objects.filter(pk=acl_name)
-    if acl_object:
-        user = None
-        characters = acl_object[0].characters.all()
-        for char in characters:
-            if char.character_id == eve_character.character_id:
-                user = get_user_from_evecharacter(char)
-                logger.debug(
-                    f"Removing {char.character_name} form {acl_name} - setting to {Applications.MembershipStates(to_state).name} for {reason}"
-                )
-                acl_object[0].characters.remove(char)
-                history_entry = ACLHistory(
+
+def remove_characters_from_acl(acl_name, eve_characters, from_state, to_state, reason):
+    """
+    Remove several characters from an acl at once, deleting their rows from the acl's
+    character table by id instead of scanning the whole member list.
+
+    Only characters that were actually on the acl get an ACLHistory entry and a
+    queued Wanderer removal. Owners left with no other character on the acl are
+    also removed from the acl's groups. Returns the characters that were removed.
+    """
+    acl_obj = Acl.objects.filter(pk=acl_name).first()
+    if acl_obj is None:
+        logger.error(
+            f"Attempted to remove characters from nonexistent ACL '{acl_name}'"
+        )
+        return []
+
+    memberships = Acl.characters.through.objects.filter(
+        acl=acl_obj, evecharacter__in=eve_characters
+    )
+    removed_pks = set(memberships.values_list("evecharacter_id", flat=True))
+    if not removed_pks:
+        return []
+    removed_characters = [char for char in eve_characters if char.pk in removed_pks]
+
+    now = timezone.now()
+    with transaction.atomic():
+        memberships.delete()
+        ACLHistory.objects.bulk_create(
+            [
+                ACLHistory(
                     character=char,
-                    date_of_change=timezone.now(),
+                    date_of_change=now,
                     old_state=from_state,
                     new_state=to_state,
                     reason_for_change=reason,
                     changed_by="ToDo",
-                    acl=acl_object[0],
+                    acl=acl_obj,
                 )
-                history_entry.save()
-                acl_object[0].changes.add(history_entry)
-        # Character has been removed, if it existed in the ACL.
-        # If this was the last character, also remove the user from all the
-        # ACL's associated groups.
-        characters = acl_object[0].characters.all()
-        if len(characters) == 0 and user is not None:
-            for group in acl_object[0].groups.all():
-                user.groups.remove(group)
+                for char in removed_characters
+            ]
+        )
+        queue_acl_side_effects(
+            acl_name, removed_characters, [AclSideEffect.Steps.WANDERER_REMOVE]
+        )
+        for char in removed_characters:
+            logger.debug(
+                f"Removed {char.character_name} from {acl_name} - setting to {Applications.MembershipStates(to_state).name} for {reason}"
+            )
+
+        # If an owner has no other character left on the ACL, also remove them
+        # from all the ACL's associated groups.
+        groups = list(acl_obj.groups.all())
+        if groups:
+            owner_ids = set(
+                CharacterOwnership.objects.filter(
+                    character_id__in=removed_pks
+                ).values_list("user_id", flat=True)
+            )
+            departed_owner_ids = owner_ids - set(
+                CharacterOwnership.objects.filter(
+                    user_id__in=owner_ids,
+                    character_id__in=Acl.characters.through.objects.filter(
+                        acl=acl_obj
+                    ).values("evecharacter_id"),
+                ).values_list("user_id", flat=True)
+            )
+            if departed_owner_ids:
+                for group in groups:
+                    group.user_set.remove(*departed_owner_ids)
+
+    return removed_characters
 
 
 def remove_character_from_wanderer(
     acl_name, eve_character_id, eve_character_name="Unknown"
 ):
-    if WANDERER_ACL_ID is None or WANDERER_ACL_TOKEN is None:
-        logger.error(
-            "No WANDERER_ACL_ID or WANDERER_ACL_TOKEN app_settings found. Unable to issue API commands."
-        )
+    if not wanderer.is_configured():
         return
     logger.debug(f"Removing {eve_character_name} from Wanderer ACL {WANDERER_ACL_ID}")
-    # Remove character
-    api_url = f"https://wanderer.eveuniversity.org/api/acls/{WANDERER_ACL_ID}/members/{eve_character_id}"
-    headers = {"Authorization": f"Bearer {WANDERER_ACL_TOKEN}"}
-    r = requests.delete(api_url, headers=headers)
-    if r.status_code != 200:
+    if not wanderer.remove_member(eve_character_id):
         logger.error(
-            f"Unable to remove character {eve_character_name} from Wanderer ACL {WANDERER_ACL_ID}: {r.status_code}"
+            f"Unable to remove character {eve_character_name} from Wanderer ACL {WANDERER_ACL_ID}"
         )
 
 
-def add_character(
-    acl_name, eve_character, old_state, new_state, reason, cc_user, token
-):
-    add_character_to_acl(acl_name, eve_character, old_state, new_state, reason)
-    add_character_to_wanderer(
-        acl_name, eve_character.character_id, eve_character.character_name
-    )
-    send_welcome_message(eve_character)
-    send_ingame_mail(eve_character, cc_user, token)
+def add_character(acl_name, eve_character, old_state, new_state, reason, token):
+    add_characters(acl_name, [eve_character], old_state, new_state, reason, token)
+
+
+def add_characters(acl_name, eve_characters, old_state, new_state, reason, token):
+    """
+    Add characters to the acl and queue their discord welcome and welcome mail
+    (sent from the token's owner) next to the Wanderer access, all delivered by
+    the outbox dispatcher once the acl change has committed.
+    """
+    with transaction.atomic():
+        add_characters_to_acl(acl_name, eve_characters, old_state, new_state, reason)
+        queue_acl_side_effects(
+            acl_name,
+            eve_characters,
+            [
+                AclSideEffect.Steps.DISCORD_WELCOME,
+                AclSideEffect.Steps.WELCOME_MAIL,
+            ],
+            token=token,
+        )
 
 
 def get_welcome_mail():
@@ -203,43 +303,79 @@ def update_welcome_mail(message):
     return current_mail.mail_content
 
 
+def get_mail_token(user):
+    """Return a valid mail sending token for the user's main character, or None"""
+    try:
+        main_character_id = user.profile.main_character.character_id
+    except AttributeError:
+        return None
+    return (
+        Token.objects.filter(user=user, character_id=main_character_id)
+        .require_scopes("esi-mail.send_mail.v1")
+        .require_valid()
+        .first()
+    )
+
+
 def send_ingame_mail(app_char, cc_user, token):
-    eve_char_id = app_char.character_id
+    send_ingame_mails([app_char], cc_user, token)
+
+
+def send_ingame_mails(app_chars, cc_user, token):
     cc_char_id = cc_user.profile.main_character.character_id
     mail_message = get_welcome_mail()
+    mail_api = EsiClientProvider(token=token)
 
-    logger.debug(f"Send to: {eve_char_id} Send from: {cc_char_id}")
-
-    mail = {
-        "approved_cost": 0,
-        "body": mail_message,
-        "recipients": [{"recipient_id": eve_char_id, "recipient_type": "character"}],
-        "subject": "Welcome to WHC!",
-    }
+    # One mail can be addressed to at most ESI_MAIL_MAX_RECIPIENTS characters
+    app_chars = list(app_chars)
+    for i in range(0, len(app_chars), ESI_MAIL_MAX_RECIPIENTS):
+        recipients = [
+            {"recipient_id": char.character_id, "recipient_type": "character"}
+            for char in app_chars[i : i + ESI_MAIL_MAX_RECIPIENTS]
+        ]
+
+        logger.debug(f"Send to: {recipients} Send from: {cc_char_id}")
+
+        mail = {
+            "approved_cost": 0,
+            "body": mail_message,
+            "recipients": recipients,
+            "subject": "Welcome to WHC!",
+        }
 
-    mail_api = EsiClientProvider(token=token)
-    response = mail_api.client.Mail.post_characters_character_id_mail(
-        character_id=cc_char_id, mail=mail
-    ).result()
+        response = mail_api.client.Mail.post_characters_character_id_mail(
+            character_id=cc_char_id, mail=mail
+        ).result()
 
-    logger.debug(f"Mail sent. Response: {response}")
+        logger.debug(f"Mail sent. Response: {response}")
 
 
 def send_welcome_message(char):
+    send_welcome_messages([char])
+
+
+def send_welcome_messages(chars):
     if discord_bot_active():
-        auth_usr = get_user_from_evecharacter(char)
-        discord_usr_id = get_discord_user_id(auth_usr)
+        discord_usr_ids = []
+        for auth_usr in {get_user_from_evecharacter(char) for char in chars}:
+            try:
+                discord_usr_ids.append(get_discord_user_id(auth_usr))
+            except Exception:
+                logger.warning(f"No discord account found for {auth_usr}")
+        if not discord_usr_ids:
+            return
         channel_id = settings.DISCORD_WELCOME_MAIL_CHANNEL[0]
 
         logger.debug(f"Sending welcome message to channel: {channel_id}")
 
         # discord ID of channel
-        msg = f"<@{discord_usr_id}> Welcome to WHC! Please check your in-game mails for some useful links and information."
+        mentions = " ".join(
+            f"<@{discord_usr_id}>" for discord_usr_id in discord_usr_ids
+        )
+        msg = f"{mentions} Welcome to WHC! Please check your in-game mails for some useful links and information."
 
-        threading.Thread(
-            daemon=True,  # never blocks process exit
-            target=functools.partial(send_message, channel_id=channel_id, message=msg),
-        ).start()
+        # Sent in line, so a failure reaches the outbox and the step is retried
+        send_message(channel_id=channel_id, message=msg)
 
         # User DM
         # msg = "Welcome to WHC"
@@ -253,48 +389,57 @@ def send_welcome_message(char):
 
 
 def add_character_to_acl(acl_name, eve_character, old_state, new_state, reason):
-    logger.debug(
-        f"Adding {eve_character.character_name} to {acl_name} - setting to {Applications.MembershipStates(new_state).name} for reason of {reason}"
-    )
+    add_characters_to_acl(acl_name, [eve_character], old_state, new_state, reason)
+
+
+def add_characters_to_acl(acl_name, eve_characters, old_state, new_state, reason):
+    """
+    Add several characters to an acl at once, with one ACLHistory entry and one
+    queued Wanderer add each, and add all their owners to the acl's groups.
+    """
     acl_obj = Acl.objects.get(pk=acl_name)
-    if acl_obj:
-        acl_obj.characters.add(eve_character)
-        history_entry = ACLHistory(
-            character=eve_character,
-            date_of_change=timezone.now(),
-            old_state=old_state,
-            new_state=new_state,
-            reason_for_change=reason,
-            changed_by="Acceptance (todo)",
-            acl=acl_obj,
+    for eve_character in eve_characters:
+        logger.debug(
+            f"Adding {eve_character.character_name} to {acl_name} - setting to {Applications.MembershipStates(new_state).name} for reason of {reason}"
         )
-        history_entry.save()
-        acl_obj.changes.add(history_entry)
-        user = get_user_from_evecharacter(eve_character)
-        for group in acl_obj.groups.all():
-            user.groups.add(group)
+
+    now = timezone.now()
+    with transaction.atomic():
+        acl_obj.characters.add(*eve_characters)
+        ACLHistory.objects.bulk_create(
+            [
+                ACLHistory(
+                    character=eve_character,
+                    date_of_change=now,
+                    old_state=old_state,
+                    new_state=new_state,
+                    reason_for_change=reason,
+                    changed_by="Acceptance (todo)",
+                    acl=acl_obj,
+                )
+                for eve_character in eve_characters
+            ]
+        )
+        queue_acl_side_effects(
+            acl_name, eve_characters, [AclSideEffect.Steps.WANDERER_ADD]
+        )
+        owner_ids = set(
+            CharacterOwnership.objects.filter(character__in=eve_characters).values_list(
+                "user_id", flat=True
+            )
+        )
+        if owner_ids:
+            for group in acl_obj.groups.all():
+                group.user_set.add(*owner_ids)
 
 
 def add_character_to_wanderer(acl_name, eve_character_id, eve_character_name="Unknown"):
-    if WANDERER_ACL_ID is None or WANDERER_ACL_TOKEN is None:
-        logger.error(
-            "No WANDERER_ACL_ID or WANDERER_ACL_TOKEN app_settings found. Unable to issue API commands."
-        )
+    if not wanderer.is_configured():
         return
     logger.debug(f"Adding {eve_character_name} to Wanderer ACL {WANDERER_ACL_ID}")
-    # Add character
-    api_url = f"https://wanderer.eveuniversity.org/api/acls/{WANDERER_ACL_ID}/members"
-    headers = {"Authorization": f"Bearer {WANDERER_ACL_TOKEN}"}
-    payload = {
-        "member": {
-            "eve_character_id": str(eve_character_id),
-            "role": "member",
-        }
-    }
-    r = requests.post(api_url, headers=headers, json=payload)
-    if r.status_code != 200:
+    if not wanderer.add_member(eve_character_id):
         logger.error(
-            f"Unable to add character {eve_character_name} to Wanderer ACL {WANDERER_ACL_ID}: {r.status_code}"
+            f"Unable to add character {eve_character_name} to Wanderer ACL {WANDERER_ACL_ID}"
         )
 
 
@@ -312,161 +457,151 @@ def log_application_change(
     log_user_application_change.save()
 
 
-def update_all_acls_for_character_leaving_alliance(
-    character, acls_character_is_on, character_acl_application, user, existing_acl_state
-):
-    """
-    Removes a character from all ACls they may be on, and informs the user for each character that they have been removed due to leaving the uni.
+def sync_groups_with_acl_helper(acl_name):
     """
+    Reconcile the acl's groups with the owners of its characters as a set diff on
+    user ids: one bulk add and one bulk remove per group. Going through the
+    groups' user_set keeps the m2m signals Auth uses to update services.
 
-    if character_acl_application is not None:
-        remove_character_from_community(
-            character_acl_application.Applications.MembershipStates.REJECTED,
-            Applications.RejectionStates.LEFT_ALLIANCE,
-            TRANSIENT_REJECT,
-        )
-        new_state = Applications.MembershipStates.REJECTED
-    else:
-        new_state = Applications.MembershipStates.NOTAMEMBER
-
-    for acl in acls_character_is_on:
-        logger.debug(f"Removing {character.character_name} from {acl.name}")
-        remove_character(
-            acl.name,
-            character.character_id,
-            existing_acl_state,
-            new_state,
-            ACLHistory.ApplicationStateChangeReason.LEFT_UNI,
-        )
-
-        notify.danger(
-            user,
-            "WHC Community Status",
-            f"Your status with {acl.name} on {character.character_name} has been removed\n:Reason: Character is no longer part of IVY or IVY-A",
-        )
-
-
-def sync_groups_with_acl_helper(acl_name):
-    acl_result = Acl.objects.filter(pk=acl_name)
-    if not acl_result:
+    Returns (added, removed) user counts summed over all groups, or None if the
+    acl does not exist.
+    """
+    acl = Acl.objects.filter(pk=acl_name).first()
+    if acl is None:
         logger.error(
             f"Attempted to synchronize groups with nonexistent ACL '{acl_name}'"
         )
-        return
+        return None
     logger.debug(f"Attempting to synchronize groups with ACL '{acl_name}'")
-    acl = acl_result[0]
-    # Add characters in the ACL that should be in groups
-    all_authorized_users = set([])
-    for char in acl.characters.all():
-        user = get_user_from_evecharacter(char)
-        all_authorized_users.add(user)
-        for group in acl.groups.all():
-            user.groups.add(group)
-    # Remove characters not in the ACL that shouldn't be in groups
-    for group in acl.groups.all():
-        group_users = group.user_set.all()
-        invalid_users = set(group_users) - all_authorized_users
-        for user in invalid_users:
-            user.groups.remove(group)
-
-
-def sync_wanderer_with_acl_helper(acl_name):
-    acl_result = Acl.objects.filter(pk=acl_name)
-    if not acl_result:
-        logger.error(
-            f"Attempted to synchronize wanderer with nonexistent ACL '{acl_name}'"
-        )
-        return
-    logger.debug(f"Attempting to synchronize wanderer with ACL '{acl_name}'")
-    acl = acl_result[0]
 
-    if WANDERER_ACL_ID is None or WANDERER_ACL_TOKEN is None:
-        logger.error(
-            "No WANDERER_ACL_ID or WANDERER_ACL_TOKEN app_settings found. Unable to issue API commands."
-        )
-        return
-
-    # Characters on wanderer may not by on auth and vice-versa. To make logging
-    # informative, we grab the names from both sources and unify them.
-    id_to_name = {}
+    authorized_user_ids = set(
+        CharacterOwnership.objects.filter(
+            character_id__in=Acl.characters.through.objects.filter(acl=acl).values(
+                "evecharacter_id"
+            )
+        ).values_list("user_id", flat=True)
+    )
 
-    # Pull set of all characters on Auth ACL
-    auth_char_tuples = set(
-        [(int(char.character_id), char.character_name) for char in acl.characters.all()]
+    added = removed = 0
+    with transaction.atomic():
+        for group in acl.groups.all():
+            group_user_ids = set(group.user_set.values_list("id", flat=True))
+            # Add owners of characters in the ACL that should be in groups
+            to_add = authorized_user_ids - group_user_ids
+            if to_add:
+                group.user_set.add(*to_add)
+            # Remove users without a character in the ACL that shouldn't be in groups
+            to_remove = group_user_ids - authorized_user_ids
+            if to_remove:
+                group.user_set.remove(*to_remove)
+            added += len(to_add)
+            removed += len(to_remove)
+
+    logger.info(
+        f"Synchronized groups with ACL '{acl_name}': {added} added, {removed} removed"
     )
-    auth_char_ids = set([t[0] for t in auth_char_tuples])
-    id_to_name.update(dict(auth_char_tuples))
-
-    # Pull set of all characters on Wanderer ACL
-    api_url = f"https://wanderer.eveuniversity.org/api/acls/{WANDERER_ACL_ID}"
-    headers = {"Authorization": f"Bearer {WANDERER_ACL_TOKEN}"}
-    r = requests.get(api_url, headers=headers)
-    if r.status_code != 200:
-        logger.error(
-            f"Unable to retrieve Wanderer ACL {WANDERER_ACL_ID}: {r.status_code}"
-        )
-        return
-    response = r.json()
-    try:
-        members = response["data"]["members"]
-    except KeyError:
-        logger.error(f"Malformed response received from Wanderer server: {response}")
-        return
-    wanderer_char_tuples = [
-        (int(member["eve_character_id"]), member["name"]) for member in members
+    return added, removed
+
+
+def create_missing_applications(eve_characters):
+    """
+    Create NOTAMEMBER applications for characters that have none, with one insert
+    per batch. Applications created concurrently are left alone, so the returned
+    applications may include some that were not inserted.
+    """
+    applications = [
+        Applications(eve_character=eve_character) for eve_character in eve_characters
     ]
-    if len(wanderer_char_tuples) == 0:
-        logger.warning(
-            "Zero members received from Wanderer ACL. This is almost certainly wrong. *Someone* should have access. Aborting sync."
+    if applications:
+        Applications.objects.bulk_create(
+            applications, batch_size=1000, ignore_conflicts=True
         )
-        return
-    wanderer_char_ids = set([t[0] for t in wanderer_char_tuples])
-    id_to_name.update(dict(wanderer_char_tuples))
+    return applications
 
-    # Add characters in the ACL that should be in groups
-    chars_to_add = list(auth_char_ids - wanderer_char_ids)
-    for char_id in chars_to_add:
-        add_character_to_wanderer(acl_name, char_id, id_to_name[char_id])
-    # Remove characters not in the ACL that shouldn't be in groups
-    chars_to_remove = list(wanderer_char_ids - auth_char_ids)
-    for char_id in chars_to_remove:
-        remove_character_from_wanderer(acl_name, char_id, id_to_name[char_id])
+
+def expired_rejections_q(now):
+    """Applications whose rejection has timed out by now"""
+    return Q(
+        member_state=Applications.MembershipStates.REJECTED,
+        reject_timeout__lt=now,
+    )
 
 
-def remove_in_process_application(user, application_details):
+def expire_rejection(application):
     """
-    For a character that has an un-accepted application still open, withdraw it.
+    Reset a single timed out rejection to NOTAMEMBER, as expire_rejections does,
+    so it does not have to wait for the next sweep. Returns whether it expired.
     """
-    try:
-        application_details.member_state = Applications.MembershipStates.REJECTED
-        application_details.reject_reason = Applications.RejectionStates.LEFT_ALLIANCE
-        application_details.save()
+    now = timezone.now()
+    expired = Applications.objects.filter(
+        expired_rejections_q(now), pk=application.pk
+    ).update(
+        member_state=Applications.MembershipStates.NOTAMEMBER,
+        reject_reason=Applications.RejectionStates.NONE,
+        last_updated=now,
+    )
+    if not expired:
+        return False
+
+    application.member_state = Applications.MembershipStates.NOTAMEMBER
+    application.reject_reason = Applications.RejectionStates.NONE
+    ApplicationHistory.objects.create(
+        application=application,
+        old_state=Applications.MembershipStates.REJECTED,
+        new_state=Applications.MembershipStates.NOTAMEMBER,
+    )
+    return True
 
-        log_application_change(
-            application=application_details,
-            old_state=Applications.MembershipStates.APPLIED,
-        )
 
-        notify.danger(
-            user,
-            "WHC Application",
-            f"Your character {application_details.eve_character.character_name} has left IVY or IVY-A and so your application to join WHC has been rejected automatically.",
+def expire_rejections():
+    """
+    Reset every rejection whose timeout has passed to NOTAMEMBER with a single
+    update, and log an ApplicationHistory entry for each. Returns how many expired.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        expired = Applications.objects.select_for_update().filter(
+            expired_rejections_q(now)
         )
-    except Exception:
-        logger.error(
-            f"Could not remove in process application of {application_details} for user: {user}"
+        expired_pks = list(expired.values_list("pk", flat=True))
+        if not expired_pks:
+            return 0
+
+        Applications.objects.filter(
+            pk__in=expired_pks, member_state=Applications.MembershipStates.REJECTED
+        ).update(
+            member_state=Applications.MembershipStates.NOTAMEMBER,
+            reject_reason=Applications.RejectionStates.NONE,
+            last_updated=now,
+        )
+        ApplicationHistory.objects.bulk_create(
+            [
+                ApplicationHistory(
+                    application_id=pk,
+                    old_state=Applications.MembershipStates.REJECTED,
+                    new_state=Applications.MembershipStates.NOTAMEMBER,
+                )
+                for pk in expired_pks
+            ]
         )
 
+    logger.info(f"Expired {len(expired_pks)} rejections")
+    return len(expired_pks)
 
-def generate_raw_copy_for_acl(sorted_char_list: list):
-    output = []
-    for character in sorted_char_list:
-        if character["is_main"]:
-            output.append(f"Main: {character['name']}")
-        else:
-            output.append(f"Alt: {character['name']}")
 
-    return "\n".join(output)
+def encode_keyset_cursor(date, pk):
+    """Opaque cursor for keyset pagination on (date, pk)"""
+    key = json.dumps([date.isoformat(), pk])
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+
+def decode_keyset_cursor(cursor):
+    """Returns (date, pk) of a keyset cursor, raising ValueError if it is invalid"""
+    try:
+        date, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.datetime.fromisoformat(date), int(pk)
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor {cursor!r}") from e
 
 
 def force_update_memberaudit(eve_character):
@@ -477,9 +612,13 @@ def force_update_memberaudit(eve_character):
         ma_char = None
     if ma_char is not None:
         ma_char.reset_update_section("skills")
-        ma_update_character_skills.apply_async(
-            kwargs={"character_pk": ma_char.pk, "force_update": True}, priority=3
-        )
+        # The skill set checks follow, so the materialized copy is refreshed too
+        chain(
+            ma_update_character_skills.si(character_pk=ma_char.pk, force_update=True),
+            ma_update_character_skill_sets.si(
+                character_pk=ma_char.pk, force_update=True
+            ),
+        ).apply_async(priority=3)
     else:
         notify.warning(
             f"{eve_character.character_name} is not registered with Member Audit.",
@@ -1,14 +1,20 @@
 """Views."""
 
 import json
+import math
 from datetime import timedelta
 
 from memberaudit.models import Character
 
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required, permission_required
-from django.http import JsonResponse
-from django.shortcuts import redirect, render
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from esi.decorators import token_required
 
 from allianceauth.eveonline.models import EveCharacter
@@ -16,47 +22,69 @@ from allianceauth.notifications import notify
 from allianceauth.services.hooks import get_extension_logger
 from app_utils.logging import LoggerAddTag
 
-from whctools.views_actions.player_actions import withdraw_app
-from whctools.views_staff.open_applications import getMail, getSkills, updateMail
-
-try:
-    # Alliance auth 4.0 only
-    from allianceauth.framework.api.evecharacter import (
-        get_main_character_from_evecharacter,
-    )
-    from allianceauth.framework.api.user import get_main_character_name_from_user
-except Exception:
-    # Alliance 3.0 backwards compatibility
-    from .aa3compat import (
-        bc_get_main_character_from_evecharacter as get_main_character_from_evecharacter,
-    )
-    from .aa3compat import (
-        bc_get_main_character_name_from_user as get_main_character_name_from_user,
-    )
-
 from whctools import __title__
 from whctools.app_settings import (
+    ACL_HISTORY_MAX_PAGE_SIZE,
+    ACL_HISTORY_PAGE_SIZE,
     LARGE_REJECT,
     MEDIUM_REJECT,
+    ROSTER_MAX_OFFSET,
+    ROSTER_MAX_PAGE_SIZE,
+    ROSTER_PAGE_SIZE,
     SHORT_REJECT,
     TRANSIENT_REJECT,
 )
-from whctools.models import Acl, ACLHistory, AclHistoryRequest, Applications
+from whctools.models import (
+    Acl,
+    ACLHistory,
+    AclHistoryRequest,
+    Applications,
+    RejectedAppsFilter,
+)
+from whctools.views_actions.player_actions import withdraw_app
+from whctools.views_staff.open_applications import getMail, getSkills, updateMail
 
+from .identity_map import get_main_character_name_from_user, with_identity_map
+from .outbox import retry_failed_acl_side_effects
+from .tasks import sync_wanderer_full
 from .utils import (
-    add_character,
-    generate_raw_copy_for_acl,
+    create_missing_applications,
     get_corp_requirements_message,
+    get_mail_token,
+    invalidate_open_applications_count,
     is_character_in_allowed_corp,
     log_application_change,
     remove_all_alts,
     remove_character,
     remove_character_from_community,
     sync_groups_with_acl_helper,
-    sync_wanderer_with_acl_helper,
 )
 from .views_actions.player_actions import submit_application
-from .views_staff.open_applications import all_characters_currently_with_open_apps
+from .views_actions.staff_actions import accept_applications, reject_applications
+from .views_staff.acl_change_feed import (
+    decode_change_cursor,
+    encode_change_cursor,
+    latest_change_cursor,
+    wait_for_changes,
+)
+from .views_staff.acl_exports import (
+    HISTORY_FIELDS,
+    ROSTER_FIELDS,
+    history_rows,
+    roster_rows,
+    streaming_export,
+)
+from .views_staff.acl_history import get_acl_history_page
+from .views_staff.acl_roster import (
+    acl_roster,
+    acl_roster_totals,
+    filter_acl_roster,
+    sort_acl_roster,
+)
+from .views_staff.open_applications import (
+    all_characters_currently_with_open_apps,
+    outstanding_acl_side_effects,
+)
 from .views_staff.rejected_applications import get_rejected_apps
 from .views_staff.staff_utils import build_default_staff_context
 
@@ -65,6 +93,7 @@ logger = LoggerAddTag(get_extension_logger(__name__), __title__)
 
 @login_required
 @permission_required("whctools.basic_access")
+@with_identity_map
 def index(request):
     """Render index view."""
     owned_chars_query = (
@@ -82,8 +111,16 @@ def index(request):
     except AttributeError:
         main_character_id = None
 
+    # Applications are created with the character, this only covers the odd one
+    # that slipped through, in one insert for all of them.
+    owned_chars = list(owned_chars_query)
+    for application in create_missing_applications(
+        [eve_char for eve_char in owned_chars if not hasattr(eve_char, "applications")]
+    ):
+        application.eve_character.applications = application
+
     is_main_accepted = False
-    for eve_char in owned_chars_query:
+    for eve_char in owned_chars:
 
         if eve_char.character_name == main_character_name:
             try:
@@ -100,13 +137,7 @@ def index(request):
                 logger.debug("No app status on main")
                 pass
 
-    for eve_char in owned_chars_query:
-        try:
-            eve_char.applications
-        except AttributeError:
-            logger.debug(AttributeError)
-            Applications.objects.update_or_create(eve_character=eve_char)
-
+    for eve_char in owned_chars:
         try:
             macharacter: Character = eve_char.memberaudit_character
             application: Applications = eve_char.applications
@@ -122,15 +153,14 @@ def index(request):
             logger.debug(
                 f"Character {eve_char.character_name} is in approved corp: {is_in_approved_corp}"
             )
-            reject_timeout = application.reject_timeout - now
-            timedout = reject_timeout.total_seconds() < 0
+            # Expired rejections are reset by the expire_rejections task; until it
+            # has run, show them as reset without writing from a GET.
             if (
-                timedout
-                and application.member_state == Applications.MembershipStates.REJECTED
+                application.member_state == Applications.MembershipStates.REJECTED
+                and application.reject_timeout < now
             ):
                 application.member_state = Applications.MembershipStates.NOTAMEMBER
                 application.reject_reason = Applications.RejectionStates.NONE
-                application.save()
 
             auth_characters.append(
                 {
@@ -166,6 +196,9 @@ def open_applications(request):
     context = build_default_staff_context("Open Apps")
     context["existing_acls"] = Acl.objects.all()
     context["applied_chars"] = all_characters_currently_with_open_apps()
+    side_effects, side_effects_count = outstanding_acl_side_effects()
+    context["side_effects"] = side_effects
+    context["side_effects_count"] = side_effects_count
     return render(request, "whctools/staff/staff_apps_in_progress.html", context)
 
 
@@ -173,7 +206,35 @@ def open_applications(request):
 @permission_required("whctools.whc_officer")
 def rejected_applications(request):
     context = build_default_staff_context("Rejected Apps")
-    context["rejected_chars"] = get_rejected_apps()
+    rejected_filter = RejectedAppsFilter(request.GET)
+    filters = {}
+    cursor = None
+    if rejected_filter.is_valid():
+        filters = {
+            "reason": rejected_filter.cleaned_data["reason"],
+            "expires_within_days": rejected_filter.cleaned_data["expires_within"],
+        }
+        cursor = rejected_filter.cleaned_data["cursor"]
+    try:
+        rejected_chars, next_cursor = get_rejected_apps(cursor=cursor, **filters)
+    except ValueError as e:
+        logger.warning(e)
+        messages.warning(
+            request,
+            "That page of rejected applications has expired, showing the first page.",
+        )
+        rejected_chars, next_cursor = get_rejected_apps(**filters)
+
+    # Next page keeps the filters, only swapping the cursor
+    next_page_query = None
+    if next_cursor:
+        query = request.GET.copy()
+        query["cursor"] = next_cursor
+        next_page_query = query.urlencode()
+
+    context["rejected_chars"] = rejected_chars
+    context["rejected_filter"] = rejected_filter
+    context["next_page_query"] = next_page_query
     return render(request, "whctools/staff/staff_rejected_apps.html", context)
 
 
@@ -187,15 +248,17 @@ def rejected_applications(request):
 
 @login_required
 @permission_required("whctools.basic_access")
+@with_identity_map
 def apply(request, char_id):
 
-    _ = submit_application(request, char_id)  # returns a message, TODO use it!
+    messages.info(request, submit_application(request, char_id))
 
     return redirect("/whctools")
 
 
 @login_required
 @permission_required("whctools.basic_access")
+@with_identity_map
 def withdraw(request, char_id, acl_name="WHC"):
     """Remove Application"""
     withdraw_app(request, char_id, acl_name)
@@ -206,37 +269,51 @@ def withdraw(request, char_id, acl_name="WHC"):
 @login_required
 @permission_required("whctools.whc_officer")
 @token_required(scopes="esi-mail.send_mail.v1")
+@with_identity_map
 def accept(request, token, char_id, acl_name="WHC"):
+    get_object_or_404(Acl, pk=acl_name)
+    accept_applications([char_id], acl_name, request.user, token)
 
-    whcapplication = Applications.objects.filter(
-        eve_character__character_id=char_id
-    ).select_related("eve_character")
+    return redirect("/whctools/staff/open")
 
-    if whcapplication:
-        member_application = whcapplication[0]
-        old_state = member_application.member_state
-        member_application.member_state = Applications.MembershipStates.ACCEPTED
-        member_application.save()
-        main_user = member_application.eve_character.character_ownership.user
 
-        log_application_change(
-            application=member_application,
-            old_state=member_application.member_state,
-        )
-        add_character(
-            acl_name,
-            member_application.eve_character,
-            old_state,
-            Applications.MembershipStates.ACCEPTED,
-            ACLHistory.ApplicationStateChangeReason.ACCEPTED,
-            request.user,
-            token,
-        )
-        notify.success(
-            main_user,
-            f"{acl_name} application: Approved",
-            f"Your application to the {acl_name} Community on {member_application.eve_character.character_name} has been approved.",
+@login_required
+@permission_required("whctools.whc_officer")
+@with_identity_map
+def bulk_decision(request):
+    """Accept or reject all selected open applications in one go"""
+    if request.method != "POST":
+        return redirect("/whctools/staff/open")
+
+    char_ids = request.POST.getlist("char_ids")
+    decision = request.POST.get("decision")
+    acl_name = request.POST.get("acl_name", "WHC")
+
+    if not char_ids:
+        messages.warning(request, "No applications selected.")
+        return redirect("/whctools/staff/open")
+
+    if not Acl.objects.filter(pk=acl_name).exists():
+        messages.error(request, f"ACL '{acl_name}' does not exist.")
+        return redirect("/whctools/staff/open")
+
+    if decision == "accept":
+        token = get_mail_token(request.user)
+        if token is None:
+            messages.error(
+                request,
+                "No valid mail token found for your main character. Accept a single application first to add one.",
+            )
+            return redirect("/whctools/staff/open")
+        applications = accept_applications(char_ids, acl_name, request.user, token)
+        messages.success(
+            request, f"Accepted {len(applications)} applications to {acl_name}."
         )
+    elif decision in ("skills", "other"):
+        applications = reject_applications(char_ids, decision, acl_name, request.user)
+        messages.success(request, f"Rejected {len(applications)} applications.")
+    else:
+        messages.error(request, f"Unknown decision '{decision}'.")
 
     return redirect("/whctools/staff/open")
 
@@ -244,6 +321,7 @@ def accept(request, token, char_id, acl_name="WHC"):
 # @@@ TODO - Add to the views.html templates the ability to remove from specific acls
 @login_required
 @permission_required("whctools.whc_officer")
+@with_identity_map
 def reject(request, char_id, reason, days, source="staff", acl_name="WHC"):
     logger.debug(
         f"Attempting to delete character with char_id: {char_id}, reason: {reason}, days: {days}"
@@ -327,6 +405,16 @@ def reject(request, char_id, reason, days, source="staff", acl_name="WHC"):
 
 @login_required
 @permission_required("whctools.whc_officer")
+def retry_side_effects(request):
+    if request.method == "POST":
+        count = retry_failed_acl_side_effects()
+        messages.info(request, f"Queued {count} failed steps for another attempt.")
+    return redirect("/whctools/staff/open")
+
+
+@login_required
+@permission_required("whctools.whc_officer")
+@with_identity_map
 def reset(request, char_id, acl_name="WHC"):
 
     whcapplication = Applications.objects.filter(eve_character__character_id=char_id)
@@ -336,6 +424,8 @@ def reset(request, char_id, acl_name="WHC"):
         old_state = member_application.member_state
         member_application.member_state = Applications.MembershipStates.NOTAMEMBER
         member_application.save()
+        if old_state == Applications.MembershipStates.APPLIED:
+            invalidate_open_applications_count()
         log_application_change(
             application=member_application,
             old_state=old_state,
@@ -348,7 +438,7 @@ def reset(request, char_id, acl_name="WHC"):
             )
             remove_character(
                 acl_name,
-                member_application.eve_character.character_id,
+                member_application.eve_character,
                 old_state,
                 member_application.member_state,
                 ACLHistory.ApplicationStateChangeReason.REMOVED,
@@ -372,7 +462,6 @@ def list_acl_members(request, acl_pk=""):
     acl_obj = Acl.objects.get(pk=acl_pk)
     if not acl_obj:
         return redirect("/whctools")
-    members_on_acl = acl_obj.characters.all()
     date_selected = None
 
     # Audit Log
@@ -381,6 +470,7 @@ def list_acl_members(request, acl_pk=""):
     )
     acl_changes = []
     num_acl_changes = 0
+    next_cursor = None
     if request.method == "POST":
         logger.debug("POST request for acl history")
         form = AclHistoryRequest(request.POST)
@@ -389,26 +479,37 @@ def list_acl_members(request, acl_pk=""):
             acl_history_request = form  # Preserve previous query
 
             date_selected = form.cleaned_data.get("date_of_change")
-            acl_history_entries = ACLHistory.objects.filter(
-                date_of_change__gte=date_selected
-            ).order_by("date_of_change")
-            character_name = form.cleaned_data.get("character_name")
-            if character_name != "":
-                acl_history_entries = acl_history_entries.filter(
-                    character__character_name=character_name
-                )
             limit = form.cleaned_data.get("limit")
-            if limit != 0:
-                acl_history_entries = acl_history_entries[:limit]
             logger.debug(
-                f"Pulling {'all' if limit==0 else str(limit)} ACL history entries after {date_selected} for {acl_pk}"
+                f"Pulling a page of {limit or ACL_HISTORY_PAGE_SIZE} ACL history entries after {date_selected} for {acl_pk}"
             )
+            try:
+                acl_history_entries, next_cursor = get_acl_history_page(
+                    acl_pk,
+                    date_selected,
+                    character_name=form.cleaned_data.get("character_name"),
+                    cursor=form.cleaned_data.get("cursor"),
+                    page_size=limit,
+                )
+            except ValueError as e:
+                logger.warning(e)
+                messages.warning(
+                    request,
+                    "That page of the audit log has expired, showing the first page.",
+                )
+                acl_history_entries, next_cursor = get_acl_history_page(
+                    acl_pk,
+                    date_selected,
+                    character_name=form.cleaned_data.get("character_name"),
+                    page_size=limit,
+                )
             for entry in acl_history_entries:
+                name = entry.character.character_name if entry.character else "?"
                 acl_changes.append(
                     {
-                        "member": entry.character.character_name,
+                        "member": name,
                         "date": entry.date_of_change,
-                        "name": entry.character.character_name,
+                        "name": name,
                         "old_state": Applications.MembershipStates(
                             entry.old_state
                         ).name,
@@ -418,126 +519,22 @@ def list_acl_members(request, acl_pk=""):
                         "reason": entry.get_reason_for_change_display(),
                     }
                 )
-            acl_changes = sorted(acl_changes, key=lambda _: _["date"])
             num_acl_changes = len(acl_changes)
 
-    # ACL
-    char_list = []
-    mains_set = set([])  # just mains in ACL
-    players_set = set([])  # includes mains in and not in ACL
-    for member in members_on_acl:
-        name = member.character_name
-        char_id = member.character_id
-        main = None
-        corp = member.corporation_name
-        alliance = member.alliance_name
-        error = None
-
-        main_character = get_main_character_from_evecharacter(member)
-        if main_character is None:
-            main = "?"
-            error = "Orphaned character"
-            logger.info(
-                f"WHC ACL '{acl_pk}': character '{name}' is an orphan with no main"
-            )
-        else:
-            main = main_character.character_name
-            players_set.add(main)
-
-        if name == main:
-            mains_set.add(main)
-
-        if not is_character_in_allowed_corp(member):
-            logger.info(
-                f"WHC ACL '{acl_pk}': character '{name}' is in an invalid corp or alliance"
-            )
-            error = "Disallowed corp/alliance"
-        # I believe this isn't possible, since a user has to swap Uni mains in
-        # order for them to remain in the Uni.
-        if main_character is not None and not is_character_in_allowed_corp(
-            main_character
-        ):
-            logger.info(
-                f"WHC ACL '{acl_pk}': character '{name}' has a main '{main}' in an invalid corp or alliance"
-            )
-            error = "Main in disallowed corp/alliance"
-
-        char_list.append(
-            {
-                "name": name,
-                "char_id": char_id,
-                "main": main,
-                "corp": corp,
-                "alliance": alliance,
-                "error": error,
-                "is_main": (name == main),
-                "main_in_acl": False,  # We'll backfill this
-            }
-        )
-
-    # Backfill mains
-    for char in char_list:
-        if char["main"] in mains_set:
-            char["main_in_acl"] = True
-
-    # sorted() Key function
-    class ACLSorter(object):
-        __slots__ = ["obj"]
-
-        def __init__(self, obj):
-            self.obj = obj
-
-        def __getitem__(self, key):
-            return self.obj[key]
-
-        def __lt__(self, rhs):
-            lhs = self.obj
-            # Always float errors to the top
-            # If they're both errors, revert to normal behavior
-            if lhs["error"] is not None and rhs["error"] is None:
-                return True
-            if rhs["error"] is not None and lhs["error"] is None:
-                return False
-            # Sort by main first
-            if lhs["main"] != rhs["main"]:
-                return lhs["main"] < rhs["main"]
-            else:  # both are alts of the same main
-                # Then float the main to the top of the alt group
-                if lhs["name"] == lhs["main"]:
-                    return True
-                if rhs["name"] == rhs["main"]:
-                    return False
-                return lhs["name"] < rhs["name"]
-
-        def __gt__(self, rhs):
-            return not self.__lt__(rhs)
-
-        def __eq__(self, rhs):
-            return False
-
-        def __le__(self, rhs):
-            return self.__lt__(rhs)
-
-        def __ge__(self, rhs):
-            return self.__gt__(rhs)
-
-        __hash__ = None
-
-    sorted_char_list = sorted(char_list, key=ACLSorter)
-    total_mains = len(mains_set)
-    total_players = len(players_set)
-    total_chars = len(char_list)
+    # ACL, the roster itself is fetched page by page from acl_roster_page
+    totals = acl_roster_totals(acl_pk)
 
     context = {
         "acl_name": acl_pk,
-        "total_mains": total_mains,
-        "total_chars": total_chars,
-        "total_players": total_players,
-        "characters": sorted_char_list,
+        "total_mains": totals["total_mains"],
+        "total_chars": totals["total_chars"],
+        "total_players": totals["total_players"],
+        "roster_page_size": ROSTER_PAGE_SIZE,
         "date_selected": date_selected,
         "acl_changes": acl_changes,
         "num_acl_changes": num_acl_changes,
-        "raw_acl_copy_text": generate_raw_copy_for_acl(sorted_char_list),
+        "next_cursor": next_cursor,
+        "acl_history_page_size": ACL_HISTORY_PAGE_SIZE,
         "acl_history_request": acl_history_request,
         "reject_timers": {
             "large_reject": LARGE_REJECT,
@@ -552,6 +549,7 @@ def list_acl_members(request, acl_pk=""):
 
 @login_required
 @permission_required("whctools.whc_officer")
+@with_identity_map
 def get_skills(request, char_id):
     logger.debug(f"Get Skills for {char_id}")
     skill_sets = getSkills(char_id)
@@ -562,17 +560,173 @@ def get_skills(request, char_id):
 @login_required
 @permission_required("whctools.whc_officer")
 def sync_groups_with_acl(request, acl_pk="WHC"):
-    sync_groups_with_acl_helper(acl_pk)
+    result = sync_groups_with_acl_helper(acl_pk)
+    if result is None:
+        messages.error(request, f"ACL '{acl_pk}' does not exist.")
+    else:
+        added, removed = result
+        messages.success(
+            request,
+            f"Groups synchronized with {acl_pk}: {added} users added, {removed} removed.",
+        )
     return redirect(f"/whctools/staff/action/{acl_pk}/view")
 
 
 @login_required
 @permission_required("whctools.whc_officer")
 def sync_wanderer_with_acl(request, acl_pk="WHC"):
-    sync_wanderer_with_acl_helper(acl_pk)
+    get_object_or_404(Acl, pk=acl_pk)
+    # A full sync can take a while against a slow Wanderer, so keep it off the request
+    sync_wanderer_full.delay(acl_pk)
+    messages.info(request, f"Wanderer synchronization with {acl_pk} queued.")
     return redirect(f"/whctools/staff/action/{acl_pk}/view")
 
 
+@login_required
+@permission_required("whctools.whc_officer")
+def export_acl_members(request, acl_pk, export_format):
+    """
+    Download the members of an acl as csv, ndjson or plain text.
+    The X-WHC-Cursor header has the change feed cursor to follow the roster from.
+    """
+    get_object_or_404(Acl, pk=acl_pk)
+    # Taken before the roster is read, so replaying from it misses nothing
+    cursor = latest_change_cursor(acl_pk)
+    response = streaming_export(
+        roster_rows(acl_pk), ROSTER_FIELDS, export_format, f"{acl_pk}-members"
+    )
+    if response is None:
+        raise Http404(f"Unknown export format {export_format}")
+    response["X-WHC-Cursor"] = cursor
+    return response
+
+
+@login_required
+@permission_required("whctools.whc_officer")
+def export_acl_history(request, acl_pk, export_format):
+    """
+    Download the audit log of an acl as csv or ndjson, optionally only the
+    entries from ?since=<iso datetime> onwards or for ?character_name=<name>
+    """
+    get_object_or_404(Acl, pk=acl_pk)
+    since = request.GET.get("since")
+    if since:
+        since = parse_datetime(since)
+        if since is None:
+            return HttpResponseBadRequest("since must be an ISO 8601 datetime")
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+
+    response = streaming_export(
+        history_rows(acl_pk, since, request.GET.get("character_name", "")),
+        HISTORY_FIELDS,
+        export_format,
+        f"{acl_pk}-history",
+    )
+    if response is None:
+        raise Http404(f"Unknown export format {export_format}")
+    return response
+
+
+@login_required
+@permission_required("whctools.whc_officer")
+def acl_roster_page(request, acl_pk):
+    """
+    One page of the roster of an acl as JSON.
+
+    ?page= is 1-based and ?page_size= at most ROSTER_MAX_PAGE_SIZE. The roster is
+    narrowed down by ?errors_only=1, ?mains_only=1, ?main=, ?corp= and
+    ?alliance=, and sorted by ?sort=name|main|corp|alliance (descending with a
+    leading "-"). The totals of the whole acl are rendered once by
+    list_acl_members, not with every page.
+    """
+    get_object_or_404(Acl, pk=acl_pk)
+    try:
+        page = max(1, int(request.GET.get("page", 1)))
+        page_size = int(request.GET.get("page_size", ROSTER_PAGE_SIZE))
+    except ValueError:
+        return HttpResponseBadRequest("page and page_size must be numbers")
+    page_size = max(1, min(page_size, ROSTER_MAX_PAGE_SIZE))
+
+    roster = filter_acl_roster(
+        acl_roster(acl_pk),
+        errors_only=request.GET.get("errors_only") == "1",
+        mains_only=request.GET.get("mains_only") == "1",
+        main=request.GET.get("main", ""),
+        corp=request.GET.get("corp", ""),
+        alliance=request.GET.get("alliance", ""),
+    )
+    roster = sort_acl_roster(roster, request.GET.get("sort", "")).values(
+        "is_main",
+        "main_in_acl",
+        "error",
+        name=F("character_name"),
+        char_id=F("character_id"),
+        main=F("main_name"),
+        corp=F("corporation_name"),
+        alliance=F("alliance_name"),
+    )
+
+    # One row more than the page tells whether there is a next one, no count needed
+    offset = (page - 1) * page_size
+    rows = []
+    if offset <= ROSTER_MAX_OFFSET:
+        rows = list(roster[offset : offset + page_size + 1])
+    return JsonResponse(
+        {
+            "results": rows[:page_size],
+            "page": page,
+            "has_next": len(rows) > page_size,
+        }
+    )
+
+
+@transaction.non_atomic_requests
+@login_required
+@permission_required("whctools.whc_officer")
+def acl_changes(request, acl_pk):
+    """
+    Read-only feed of the changes to an acl after ?cursor=<cursor>, oldest first.
+
+    ?limit= caps the changes per response, ?wait=<seconds> waits for new changes
+    when there are none yet, and ?format=ndjson returns one change per line.
+    The cursor to continue from is in the X-WHC-Cursor header, and for json
+    also in the body.
+    """
+    get_object_or_404(Acl, pk=acl_pk)
+    try:
+        after_id = decode_change_cursor(request.GET.get("cursor", ""))
+        limit = int(request.GET.get("limit", ACL_HISTORY_PAGE_SIZE))
+        wait = float(request.GET.get("wait", 0))
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    if not math.isfinite(wait):
+        return HttpResponseBadRequest("wait must be a number of seconds")
+    export_format = request.GET.get("format", "json")
+    if export_format not in ("json", "ndjson"):
+        return HttpResponseBadRequest("format must be json or ndjson")
+
+    changes, has_more = wait_for_changes(
+        acl_pk, after_id, max(1, min(limit, ACL_HISTORY_MAX_PAGE_SIZE)), wait
+    )
+    cursor = encode_change_cursor(changes[-1]["id"] if changes else after_id)
+
+    if export_format == "ndjson":
+        response = HttpResponse(
+            "".join(
+                json.dumps(change, cls=DjangoJSONEncoder) + "\n" for change in changes
+            ),
+            content_type="application/x-ndjson",
+        )
+    else:
+        response = JsonResponse(
+            {"changes": changes, "cursor": cursor, "has_more": has_more}
+        )
+    response["X-WHC-Cursor"] = cursor
+    response["X-WHC-Has-More"] = "true" if has_more else "false"
+    return response
+
+
 @login_required
 @permission_required("whctools.whc_officer")
 def get_mail(request):
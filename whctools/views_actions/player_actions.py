@@ -8,10 +8,12 @@ from whctools import __title__
 from ..app_settings import TRANSIENT_REJECT
 from ..models import ACLHistory, Applications
 from ..utils import (
+    expire_rejection,
     force_update_memberaudit,
+    invalidate_open_applications_count,
     is_character_in_allowed_corp,
     log_application_change,
-    remove_character_from_acl,
+    remove_character,
     remove_character_from_community,
 )
 
@@ -38,8 +40,11 @@ def submit_application(request, char_id):
     if eve_char_application.member_state == Applications.MembershipStates.ACCEPTED:
         return "This character is already a member! How'd you do this?"
 
-    # Check if rejected
-    if eve_char_application.member_state == Applications.MembershipStates.REJECTED:
+    # Check if rejected, a timed out rejection no longer blocks a new application
+    if (
+        eve_char_application.member_state == Applications.MembershipStates.REJECTED
+        and not expire_rejection(eve_char_application)
+    ):
         return "This character has been rejected previously and is still under cooldown for another application. Please contact WHC Community Coordinators on Discord"
 
     # Check if character is in a valid corp/alliance
@@ -56,6 +61,7 @@ def submit_application(request, char_id):
 
     eve_char_application.member_state = Applications.MembershipStates.APPLIED
     eve_char_application.save()
+    invalidate_open_applications_count()
 
     log_application_change(eve_char_application)
 
@@ -96,9 +102,9 @@ def withdraw_app(request, char_id, acl_name):
             reject_reason,
             reject_time=0,
         )
-        remove_character_from_acl(
-            eve_char_application.eve_character.character_id,
+        remove_character(
             acl_name,
+            eve_char_application.eve_character,
             old_state,
             eve_char_application.member_state,
             ACLHistory.ApplicationStateChangeReason.LEFT_GROUP,
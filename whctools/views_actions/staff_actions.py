@@ -0,0 +1,191 @@
+import datetime
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from allianceauth.notifications import notify
+from allianceauth.services.hooks import get_extension_logger
+from app_utils.logging import LoggerAddTag
+
+from whctools import __title__
+
+from ..app_settings import MEDIUM_REJECT, SHORT_REJECT
+from ..models import ACLHistory, AclSideEffect, ApplicationHistory, Applications
+from ..outbox import queue_acl_side_effects
+from ..utils import (
+    add_characters_to_acl,
+    invalidate_open_applications_count,
+    remove_characters_from_acl,
+)
+
+logger = LoggerAddTag(get_extension_logger(__name__), __title__)
+
+
+def _lock_applications(char_ids, member_states):
+    """
+    Lock the matching applications until the transaction ends, so a concurrent
+    decision cannot act on them too. The rows are locked on their own, as not
+    every database can lock the nullable side of the ownership join.
+    """
+    pks = list(
+        Applications.objects.select_for_update()
+        .filter(
+            eve_character__character_id__in=char_ids,
+            member_state__in=member_states,
+        )
+        .values_list("pk", flat=True)
+    )
+    return list(
+        Applications.objects.filter(pk__in=pks).select_related(
+            "eve_character__character_ownership__user"
+        )
+    )
+
+
+def _notify_owners(applications, level, title, message):
+    """Send one notification per user, listing all of their characters in the batch"""
+    names_by_user = defaultdict(list)
+    for application in applications:
+        try:
+            user = application.eve_character.character_ownership.user
+        except Exception:  # Best effort. If the owner doesn't exist, forget it.
+            continue
+        names_by_user[user].append(application.eve_character.character_name)
+
+    for user, names in names_by_user.items():
+        getattr(notify, level)(user, title, message.format(names=", ".join(names)))
+
+
+def accept_applications(char_ids, acl_name, officer, token):
+    """
+    Accept the open applications of all given characters in one transaction.
+    Characters without an open application are left alone.
+
+    Wanderer, discord and the in-game welcome mail are written to the outbox for
+    the whole batch and sent by a task once the transaction has committed.
+    Returns the accepted applications.
+    """
+    new_state = Applications.MembershipStates.ACCEPTED
+    now = timezone.now()
+    with transaction.atomic():
+        applications = _lock_applications(
+            char_ids, [Applications.MembershipStates.APPLIED]
+        )
+        if not applications:
+            return []
+
+        characters_by_old_state = defaultdict(list)
+        history = []
+        for application in applications:
+            characters_by_old_state[application.member_state].append(
+                application.eve_character
+            )
+            history.append(
+                ApplicationHistory(
+                    application=application,
+                    old_state=application.member_state,
+                    new_state=new_state,
+                )
+            )
+            application.member_state = new_state
+            application.last_updated = now
+
+        Applications.objects.bulk_update(applications, ["member_state", "last_updated"])
+        ApplicationHistory.objects.bulk_create(history)
+        if Applications.MembershipStates.APPLIED in characters_by_old_state:
+            invalidate_open_applications_count()
+        for old_state, eve_characters in characters_by_old_state.items():
+            add_characters_to_acl(
+                acl_name,
+                eve_characters,
+                old_state,
+                new_state,
+                ACLHistory.ApplicationStateChangeReason.ACCEPTED,
+            )
+
+        queue_acl_side_effects(
+            acl_name,
+            [application.eve_character for application in applications],
+            [
+                AclSideEffect.Steps.DISCORD_WELCOME,
+                AclSideEffect.Steps.WELCOME_MAIL,
+            ],
+            token=token,
+        )
+
+    _notify_owners(
+        applications,
+        "success",
+        f"{acl_name} application: Approved",
+        f"Your application to the {acl_name} Community on {{names}} has been approved.",
+    )
+
+    logger.info(f"{officer} accepted {len(applications)} applications to {acl_name}")
+    return applications
+
+
+def reject_applications(char_ids, reason, acl_name, officer):
+    """
+    Reject the open applications of all given characters in one transaction.
+
+    reason is "skills" or "other", with the matching staff reject timer.
+    Returns the rejected applications.
+    """
+    if reason == "skills":
+        rejection_reason = Applications.RejectionStates.SKILLS
+        days = SHORT_REJECT
+    else:
+        rejection_reason = Applications.RejectionStates.OTHER
+        days = MEDIUM_REJECT
+
+    new_state = Applications.MembershipStates.REJECTED
+    now = timezone.now()
+    reject_timeout = now + datetime.timedelta(days=int(days))
+    with transaction.atomic():
+        applications = _lock_applications(
+            char_ids, [Applications.MembershipStates.APPLIED]
+        )
+        if not applications:
+            return []
+
+        characters_by_old_state = defaultdict(list)
+        history = []
+        for application in applications:
+            characters_by_old_state[application.member_state].append(
+                application.eve_character
+            )
+            history.append(
+                ApplicationHistory(
+                    application=application,
+                    old_state=application.member_state,
+                    new_state=new_state,
+                    reject_reason=rejection_reason,
+                )
+            )
+            application.member_state = new_state
+            application.reject_reason = rejection_reason
+            application.reject_timeout = reject_timeout
+            application.last_updated = now
+
+        Applications.objects.bulk_update(
+            applications,
+            ["member_state", "reject_reason", "reject_timeout", "last_updated"],
+        )
+        ApplicationHistory.objects.bulk_create(history)
+        invalidate_open_applications_count()
+        for old_state, eve_characters in characters_by_old_state.items():
+            remove_characters_from_acl(
+                acl_name, eve_characters, old_state, new_state, rejection_reason
+            )
+
+    _notify_owners(
+        applications,
+        "danger",
+        f"{acl_name} Community: Application Denied",
+        f"Your application to the {acl_name} Community on {{names}} has been rejected.\n\n\t* Reason: {Applications.RejectionStates(rejection_reason).label}"
+        + "\n\nIf you have any questions about this action, please contact WHC Community Coordinators on discord.",
+    )
+
+    logger.info(f"{officer} rejected {len(applications)} applications to {acl_name}")
+    return applications
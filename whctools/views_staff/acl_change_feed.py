@@ -0,0 +1,73 @@
+import base64
+import datetime
+import json
+import time
+
+from django.db.models import Max
+from django.utils import timezone
+
+from whctools.app_settings import (
+    CHANGE_FEED_MAX_WAIT,
+    CHANGE_FEED_POLL_INTERVAL,
+    CHANGE_FEED_SETTLE_SECONDS,
+)
+from whctools.models import ACLHistory
+
+from .acl_exports import history_row, history_values
+
+
+def encode_change_cursor(last_id):
+    """Opaque cursor pointing just after the ACLHistory entry with the given id"""
+    return base64.urlsafe_b64encode(json.dumps({"id": last_id}).encode()).decode()
+
+
+def decode_change_cursor(cursor):
+    """Returns the ACLHistory id of a cursor, 0 for none, raising ValueError if it is invalid"""
+    if not cursor:
+        return 0
+    try:
+        return int(json.loads(base64.urlsafe_b64decode(cursor.encode()))["id"])
+    except (KeyError, TypeError, ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid change feed cursor {cursor!r}") from e
+
+
+def latest_change_cursor(acl_name):
+    """Cursor pointing after the newest change to an acl, to re-sync from"""
+    latest = ACLHistory.objects.filter(acl_id=acl_name).aggregate(Max("id"))
+    return encode_change_cursor(latest["id__max"] or 0)
+
+
+def get_changes(acl_name, after_id, limit):
+    """
+    The changes to an acl recorded after the ACLHistory entry after_id, oldest
+    first. Returns (changes, has_more).
+
+    Ids are handed out before a transaction commits, so a change can show up
+    behind one with a higher id. The feed stops at the first change younger than
+    CHANGE_FEED_SETTLE_SECONDS, which gives such transactions time to commit.
+    """
+    settled_before = timezone.now() - datetime.timedelta(
+        seconds=CHANGE_FEED_SETTLE_SECONDS
+    )
+    entries = list(
+        history_values(
+            ACLHistory.objects.filter(acl_id=acl_name, id__gt=after_id).order_by("id")
+        )[: limit + 1]
+    )
+    for position, (_, date_of_change, *_) in enumerate(entries):
+        if date_of_change > settled_before:
+            return [history_row(values) for values in entries[:position]], False
+    return [history_row(values) for values in entries[:limit]], len(entries) > limit
+
+
+def wait_for_changes(acl_name, after_id, limit, wait):
+    """
+    Like get_changes, but when there are no changes yet keep looking for up to
+    wait seconds (at most CHANGE_FEED_MAX_WAIT), so consumers can long-poll.
+    """
+    deadline = time.monotonic() + min(max(wait, 0), CHANGE_FEED_MAX_WAIT)
+    while True:
+        changes, has_more = get_changes(acl_name, after_id, limit)
+        if changes or time.monotonic() + CHANGE_FEED_POLL_INTERVAL > deadline:
+            return changes, has_more
+        time.sleep(CHANGE_FEED_POLL_INTERVAL)
@@ -0,0 +1,156 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+from whctools.app_settings import EXPORT_CHUNK_SIZE
+from whctools.models import ACLHistory, Applications
+
+from .acl_roster import acl_roster
+
+ROSTER_FIELDS = [
+    "character_id",
+    "character_name",
+    "main_name",
+    "is_main",
+    "corporation_name",
+    "alliance_name",
+    "in_allowed_alliance",
+]
+
+HISTORY_FIELDS = [
+    "id",
+    "date_of_change",
+    "character_id",
+    "character_name",
+    "old_state",
+    "new_state",
+    "reason",
+    "changed_by",
+]
+
+# Older entries were logged with values outside these choices, such as a
+# rejection reason, and are exported with their raw value like the audit log does
+STATE_NAMES = {state.value: state.name for state in Applications.MembershipStates}
+REASON_LABELS = dict(ACLHistory.ApplicationStateChangeReason.choices)
+
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "txt": "text/plain",
+}
+
+
+def roster_rows(acl_name):
+    """
+    Members of an acl in roster order, read from the database in chunks so the
+    roster is never held in memory as a whole.
+    """
+    members = acl_roster(acl_name).values_list(
+        "character_id",
+        "character_name",
+        "main_name",
+        "is_main",
+        "corporation_name",
+        "alliance_name",
+        "in_allowed_alliance",
+    )
+    for values in members.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield dict(zip(ROSTER_FIELDS, values))
+
+
+def history_values(entries):
+    """ACLHistory queryset reduced to the values of a history row"""
+    return entries.values_list(
+        "id",
+        "date_of_change",
+        "character__character_id",
+        "character__character_name",
+        "old_state",
+        "new_state",
+        "reason_for_change",
+        "changed_by",
+    )
+
+
+def history_row(values):
+    """One history row, from a tuple of history_values"""
+    (
+        pk,
+        date_of_change,
+        character_id,
+        character_name,
+        old_state,
+        new_state,
+        reason,
+        changed_by,
+    ) = values
+    return {
+        "id": pk,
+        "date_of_change": date_of_change,
+        "character_id": character_id,
+        "character_name": character_name,
+        "old_state": STATE_NAMES.get(old_state, old_state),
+        "new_state": STATE_NAMES.get(new_state, new_state),
+        "reason": REASON_LABELS.get(reason, reason),
+        "changed_by": changed_by,
+    }
+
+
+def history_rows(acl_name, since=None, character_name=""):
+    """The audit log of an acl, oldest first, read from the database in chunks"""
+    entries = ACLHistory.objects.filter(acl_id=acl_name)
+    if since is not None:
+        entries = entries.filter(date_of_change__gte=since)
+    if character_name:
+        entries = entries.filter(character__character_name=character_name)
+    entries = history_values(entries.order_by("date_of_change", "id"))
+    for values in entries.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield history_row(values)
+
+
+class _Echo:
+    """File-like object handing back what is written, so csv can write to a stream"""
+
+    def write(self, value):
+        return value
+
+
+def _csv_lines(fields, rows):
+    writer = csv.DictWriter(_Echo(), fieldnames=fields)
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+
+
+def _roster_text_lines(rows):
+    """The plain text roster officers paste into other tools"""
+    for row in rows:
+        yield f"{'Main' if row['is_main'] else 'Alt'}: {row['character_name']}\n"
+
+
+def streaming_export(rows, fields, export_format, filename):
+    """
+    Stream rows as csv, ndjson or (for the roster) plain text.
+    Returns None for a format that is not supported.
+    """
+    if export_format == "csv":
+        lines = _csv_lines(fields, rows)
+    elif export_format == "ndjson":
+        lines = _ndjson_lines(rows)
+    elif export_format == "txt" and fields == ROSTER_FIELDS:
+        lines = _roster_text_lines(rows)
+    else:
+        return None
+
+    response = StreamingHttpResponse(lines, content_type=CONTENT_TYPES[export_format])
+    response["Content-Disposition"] = (
+        f'attachment; filename="{filename}.{export_format}"'
+    )
+    return response
@@ -0,0 +1,39 @@
+from django.db.models import Q
+
+from ..app_settings import ACL_HISTORY_MAX_PAGE_SIZE, ACL_HISTORY_PAGE_SIZE
+from ..models import ACLHistory
+from ..utils import decode_keyset_cursor, encode_keyset_cursor
+
+
+def get_acl_history_page(
+    acl_name, since, character_name="", cursor=None, page_size=ACL_HISTORY_PAGE_SIZE
+):
+    """
+    One page of the audit log of an acl, oldest first, from since onwards.
+
+    Pages are keyset paginated on (date_of_change, id), so every page is a range
+    scan of the acl's history index however deep into the log it is.
+    Returns (entries, next_cursor), next_cursor being None on the last page.
+    Raises ValueError for an invalid cursor.
+    """
+    page_size = min(page_size or ACL_HISTORY_PAGE_SIZE, ACL_HISTORY_MAX_PAGE_SIZE)
+    entries = (
+        ACLHistory.objects.filter(acl_id=acl_name, date_of_change__gte=since)
+        .select_related("character")
+        .order_by("date_of_change", "id")
+    )
+    if character_name:
+        entries = entries.filter(character__character_name=character_name)
+    if cursor:
+        date_of_change, pk = decode_keyset_cursor(cursor)
+        entries = entries.filter(
+            Q(date_of_change__gt=date_of_change)
+            | Q(date_of_change=date_of_change, id__gt=pk)
+        )
+
+    # Fetch one more than asked for to learn whether there is a next page
+    entries = list(entries[: page_size + 1])
+    if len(entries) > page_size:
+        last = entries[page_size - 1]
+        return entries[:page_size], encode_keyset_cursor(last.date_of_change, last.pk)
+    return entries, None
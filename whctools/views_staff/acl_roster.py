@@ -0,0 +1,141 @@
+from django.db.models import (
+    BooleanField,
+    Case,
+    CharField,
+    Count,
+    Exists,
+    F,
+    IntegerField,
+    OuterRef,
+    Q,
+    Value,
+    When,
+)
+
+from allianceauth.eveonline.models import EveCharacter
+
+from whctools.app_settings import ALLOWED_ALLIANCES
+from whctools.models import Acl
+
+MAIN_CHARACTER = "character_ownership__user__profile__main_character"
+
+ORPHANED = "Orphaned character"
+DISALLOWED_ALLIANCE = "Disallowed corp/alliance"
+MAIN_IN_DISALLOWED_ALLIANCE = "Main in disallowed corp/alliance"
+
+
+# Members with an error first, then every main followed by its alts. The pk
+# keeps the order stable between pages.
+ROSTER_ORDER = (
+    "error_rank",
+    F("main_name").asc(nulls_first=True),
+    F("is_main").desc(),
+    "character_name",
+    "pk",
+)
+
+
+def acl_roster(acl_name):
+    """
+    The members of an acl with everything the roster shows computed in SQL:
+    their main, whether that main is on the acl, alliance checks and an error.
+    Sorted in ROSTER_ORDER by the database.
+    """
+    is_allowed = Q(alliance_id__in=ALLOWED_ALLIANCES)
+    main_is_allowed = Q(**{f"{MAIN_CHARACTER}__alliance_id__in": ALLOWED_ALLIANCES})
+    has_main = Q(**{f"{MAIN_CHARACTER}__isnull": False})
+
+    return (
+        EveCharacter.objects.filter(acl__name=acl_name)
+        .annotate(
+            main_name=F(f"{MAIN_CHARACTER}__character_name"),
+            is_main=Case(
+                When(**{MAIN_CHARACTER: F("pk")}, then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField(),
+            ),
+            main_in_acl=Exists(
+                Acl.characters.through.objects.filter(
+                    acl_id=acl_name, evecharacter_id=OuterRef(MAIN_CHARACTER)
+                )
+            ),
+            in_allowed_alliance=Case(
+                When(is_allowed, then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField(),
+            ),
+            main_in_allowed_alliance=Case(
+                When(main_is_allowed, then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField(),
+            ),
+            # A main outside the alliances trumps the character's own alliance,
+            # which trumps having no main at all
+            error=Case(
+                When(
+                    has_main & ~main_is_allowed, then=Value(MAIN_IN_DISALLOWED_ALLIANCE)
+                ),
+                When(~is_allowed, then=Value(DISALLOWED_ALLIANCE)),
+                When(~has_main, then=Value(ORPHANED)),
+                default=None,
+                output_field=CharField(),
+            ),
+            error_rank=Case(
+                When(has_main & main_is_allowed & is_allowed, then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField(),
+            ),
+        )
+        .order_by(*ROSTER_ORDER)
+    )
+
+
+# Columns the roster can be sorted by instead
+ROSTER_SORT_FIELDS = {
+    "name": "character_name",
+    "main": "main_name",
+    "corp": "corporation_name",
+    "alliance": "alliance_name",
+}
+
+
+def filter_acl_roster(
+    roster, errors_only=False, mains_only=False, main="", corp="", alliance=""
+):
+    """Narrow an acl_roster down; name filters match case-insensitively on a part"""
+    if errors_only:
+        roster = roster.filter(error_rank=0)
+    if mains_only:
+        roster = roster.filter(is_main=True)
+    if main:
+        roster = roster.filter(main_name__icontains=main)
+    if corp:
+        roster = roster.filter(corporation_name__icontains=corp)
+    if alliance:
+        roster = roster.filter(alliance_name__icontains=alliance)
+    return roster
+
+
+def sort_acl_roster(roster, sort=""):
+    """
+    Order an acl_roster by one of ROSTER_SORT_FIELDS, descending with a leading
+    "-", or in roster order for anything else
+    """
+    field = ROSTER_SORT_FIELDS.get(sort.lstrip("-"))
+    if field is None:
+        return roster
+    ordering = (
+        F(field).desc(nulls_last=True)
+        if sort.startswith("-")
+        else F(field).asc(nulls_first=True)
+    )
+    return roster.order_by(ordering, "pk")
+
+
+def acl_roster_totals(acl_name):
+    """Characters, players and mains on an acl, counted in SQL"""
+    return EveCharacter.objects.filter(acl__name=acl_name).aggregate(
+        total_chars=Count("pk"),
+        total_players=Count(MAIN_CHARACTER, distinct=True),
+        total_mains=Count("pk", filter=Q(**{MAIN_CHARACTER: F("pk")})),
+    )
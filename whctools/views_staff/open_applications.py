@@ -1,40 +1,47 @@
-from memberaudit.models import Character
+from memberaudit.models import Character, CharacterUpdateStatus, SkillSet
 
-from allianceauth.eveonline.models import EveCharacter
-
-from whctools.app_settings import ESI_TASK_TIMEOUT_SECONDS
-
-try:
-    # Alliance auth 4.0 only
-    from allianceauth.framework.api.evecharacter import get_user_from_evecharacter
-    from allianceauth.framework.api.user import get_all_characters_from_user
-except Exception:
-    # Alliance 3.0 backwards compatibility
-    from ..aa3compat import bc_get_user_from_eve_character as get_user_from_evecharacter
-    from ..aa3compat import (
-        bc_get_all_characters_from_user as get_all_characters_from_user,
-    )
+from django.db.models import Exists, F, OuterRef, Subquery
+from django.utils import timezone
 
+from allianceauth.authentication.models import UserProfile
+from allianceauth.eveonline.models import EveCharacter
 from allianceauth.services.hooks import get_extension_logger
 from app_utils.logging import LoggerAddTag
 
 from whctools import __title__
-from whctools.models import Acl, Applications
-from whctools.utils import (
-    get_last_ma_update_time,
-    get_welcome_mail,
-    is_main_eve_character,
-    update_welcome_mail,
-)
+from whctools.app_settings import ESI_TASK_TIMEOUT_SECONDS, OUTBOX_DISPLAY_LIMIT
+from whctools.identity_map import get_user_from_evecharacter
+from whctools.models import AclSideEffect, Applications, CharacterSkillSetStatus
+from whctools.tasks import queue_skill_set_refresh
+from whctools.utils import get_welcome_mail, update_welcome_mail
 
 logger = LoggerAddTag(get_extension_logger(__name__), __title__)
 
 
 def all_characters_currently_with_open_apps():
 
+    ma_character = OuterRef("eve_character__memberaudit_character")
     chars_applied = (
         Applications.objects.filter(member_state=Applications.MembershipStates.APPLIED)
         .select_related("eve_character__memberaudit_character")
+        .annotate(
+            ma_skills_updated_at=Subquery(
+                CharacterUpdateStatus.objects.filter(
+                    character=ma_character, section=Character.UpdateSection.SKILLS
+                ).values("update_finished_at")[:1]
+            ),
+            ma_total_update_status=Subquery(
+                Character.objects.filter(pk=ma_character)
+                .annotate_total_update_status()
+                .values("total_update_status")[:1]
+            ),
+            is_main=Exists(
+                UserProfile.objects.filter(main_character=OuterRef("eve_character"))
+            ),
+            main_character_name=F(
+                "eve_character__character_ownership__user__profile__main_character__character_name"
+            ),
+        )
         .order_by("last_updated")
     )
 
@@ -46,68 +53,88 @@ def all_characters_currently_with_open_apps():
     #
     # Note that only the main character needs this. For alts, we allow
     # stale skill checks and rely on the 'Check Skills' panel in the UI.
-    ma_is_valid = []
-    is_main_char = []
+    applied_chars = []
     for app in chars_applied:
-        try:
-            eve_char = app.eve_character
-        except Exception as e:
-            logger.error(f"No character for {str(app)}: {e}")
-            ma_is_valid.append(False)
-            is_main_char.append(False)
-            continue
-        is_main = is_main_eve_character(eve_char)
-        is_main_char.append(is_main)
-
-        last_ma_update = get_last_ma_update_time(eve_char)  # returns 1970 if error
-        app_applied_at = app.last_updated
-        ma_age = (app_applied_at - last_ma_update).total_seconds()
-        ma_is_valid.append(ma_age < ESI_TASK_TIMEOUT_SECONDS)
-
-    return [
-        {
-            "application": application,
-            "ma_is_valid": valid,
-            "is_main_char": is_main,
-        }
-        for application, valid, is_main in zip(chars_applied, ma_is_valid, is_main_char)
-    ]
+        ma_is_valid = False
+        if (
+            app.ma_skills_updated_at is not None
+            and app.ma_total_update_status == Character.TotalUpdateStatus.OK
+        ):
+            ma_age = (app.last_updated - app.ma_skills_updated_at).total_seconds()
+            ma_is_valid = ma_age < ESI_TASK_TIMEOUT_SECONDS
+
+        applied_chars.append(
+            {
+                "application": app,
+                "ma_is_valid": ma_is_valid,
+                "is_main_char": app.is_main,
+                "main_character_name": app.main_character_name,
+            }
+        )
+
+    return applied_chars
+
+
+def outstanding_acl_side_effects(limit=OUTBOX_DISPLAY_LIMIT):
+    """
+    The newest side effects of ACL changes that are still pending or have
+    failed, and how many there are in total. Returns (side_effects, count).
+    """
+    outstanding = AclSideEffect.objects.filter(
+        status__in=[AclSideEffect.Status.PENDING, AclSideEffect.Status.FAILED]
+    )
+    newest = outstanding.select_related("eve_character").order_by("-created_at", "-pk")
+    return list(newest[:limit]), outstanding.count()
 
 
 def getSkills(eve_char_id):
 
     application = Applications.objects.filter(
         eve_character__character_id=eve_char_id
-    ).select_related("eve_character")[0]
+    ).select_related("eve_character__character_ownership__user__profile")[0]
 
-    existing_acls = Acl.objects.all()
     eve_char: EveCharacter = application.eve_character
     user = get_user_from_evecharacter(eve_char)
-    all_characters = get_all_characters_from_user(user)
-
-    alt_data = {}  # { alt : (last_updated, {skillset: can_fly}) }
-
-    for char in all_characters:
-        try:
-            ma_character: Character = char.memberaudit_character
-        except Exception as e:
-            logger.error(
-                f"Could not get MA Character for {char} belonging to {eve_char} - error: {e}"
-            )
-            continue
-        else:
-            last_update = get_last_ma_update_time(eve_char).strftime("%b %d, %Y")
-            skillset_status = {}
-
-            ma_character.update_skill_sets()
-            for acl in existing_acls:
-                for skillset in acl.skill_sets.all():
-                    skillset_status[skillset.name] = (
-                        ma_character.skill_set_checks.filter(skill_set=skillset)
-                        .first()
-                        .can_fly
-                    )
-            alt_data[char.character_name] = (last_update, skillset_status)
+
+    # Every skill set used by an ACL gets a column, even if it was never checked yet
+    skill_set_names = list(
+        SkillSet.objects.filter(acl__isnull=False)
+        .distinct()
+        .order_by("name")
+        .values_list("name", flat=True)
+    )
+    ma_characters = Character.objects.filter(
+        eve_character__character_ownership__user=user
+    ).values_list("pk", "eve_character__character_name")
+    statuses = CharacterSkillSetStatus.objects.filter(
+        eve_character__character_ownership__user=user,
+        skill_set__name__in=skill_set_names,
+    ).values_list(
+        "eve_character__character_name", "skill_set__name", "can_fly", "computed_at"
+    )
+
+    checked_at = {}  # { alt : oldest computed_at }
+    skillset_status = {}  # { alt : {skillset: can_fly} }
+    for char_name, skill_set_name, can_fly, computed_at in statuses:
+        skillset_status.setdefault(char_name, {})[skill_set_name] = can_fly
+        if char_name not in checked_at or computed_at < checked_at[char_name]:
+            checked_at[char_name] = computed_at
+
+    now = timezone.now()
+    alt_data = {}  # { alt : (last_checked, {skillset: can_fly}, stale_seconds) }
+    for ma_character_pk, char_name in ma_characters:
+        char_status = skillset_status.get(char_name, {})
+        if len(char_status) < len(skill_set_names):
+            # Never materialized, or an ACL gained a skill set since the last refresh
+            logger.debug(f"Queueing skill set refresh for {char_name}")
+            queue_skill_set_refresh(ma_character_pk, recompute=True)
+
+        last_checked = checked_at.get(char_name)
+        alt_data[char_name] = (
+            last_checked.strftime("%b %d, %Y %H:%M") if last_checked else "Pending",
+            {name: char_status.get(name) for name in skill_set_names},
+            int((now - last_checked).total_seconds()) if last_checked else None,
+        )
 
     return {
         "alt_data": alt_data,
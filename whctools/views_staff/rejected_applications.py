@@ -1,12 +1,70 @@
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from ..app_settings import REJECTED_APPS_PAGE_SIZE
 from ..models import Applications
+from ..utils import (
+    decode_keyset_cursor,
+    encode_keyset_cursor,
+    get_main_characters_from_evecharacters,
+)
+
 
+def get_rejected_apps(
+    reason=None,
+    expires_within_days=None,
+    cursor=None,
+    page_size=REJECTED_APPS_PAGE_SIZE,
+):
+    """
+    One page of rejected applications, most recently updated first, optionally
+    only those rejected for reason or whose timeout runs out within
+    expires_within_days.
 
-def get_rejected_apps():
+    Pages are keyset paginated on (last_updated, eve_character), a range scan
+    of the (member_state, last_updated) index however far back the page is.
+    Mains are only resolved for the applications on the page.
+    Returns (rows, next_cursor), next_cursor being None on the last page.
+    Raises ValueError for an invalid cursor.
+    """
     chars_rejected = (
         Applications.objects.filter(member_state=Applications.MembershipStates.REJECTED)
         .select_related("eve_character__memberaudit_character")
-        .order_by("last_updated")
-        .reverse()
+        .order_by("-last_updated", "-eve_character_id")
+    )
+    if reason is not None:
+        chars_rejected = chars_rejected.filter(reject_reason=reason)
+    if expires_within_days is not None:
+        chars_rejected = chars_rejected.filter(
+            reject_timeout__lte=timezone.now() + timedelta(days=expires_within_days)
+        )
+    if cursor:
+        last_updated, pk = decode_keyset_cursor(cursor)
+        chars_rejected = chars_rejected.filter(
+            Q(last_updated__lt=last_updated)
+            | Q(last_updated=last_updated, eve_character_id__lt=pk)
+        )
+
+    # Fetch one more than asked for to learn whether there is a next page
+    chars_rejected = list(chars_rejected[: page_size + 1])
+    next_cursor = None
+    if len(chars_rejected) > page_size:
+        chars_rejected = chars_rejected[:page_size]
+        last = chars_rejected[-1]
+        next_cursor = encode_keyset_cursor(last.last_updated, last.pk)
+
+    main_characters = get_main_characters_from_evecharacters(
+        [app.eve_character for app in chars_rejected]
     )
 
-    return chars_rejected
+    return [
+        {
+            "application": application,
+            "main_character": main_characters.get(
+                application.eve_character.character_id
+            ),
+        }
+        for application in chars_rejected
+    ], next_cursor
@@ -0,0 +1,176 @@
+"""Client for the Wanderer ACL API."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from allianceauth.services.hooks import get_extension_logger
+from app_utils.logging import LoggerAddTag
+
+from whctools import __title__
+from whctools.app_settings import (
+    WANDERER_ACL_ID,
+    WANDERER_ACL_TOKEN,
+    WANDERER_API_URL,
+    WANDERER_BACKOFF_FACTOR,
+    WANDERER_BACKOFF_MAX,
+    WANDERER_MAX_RETRIES,
+    WANDERER_MAX_WORKERS,
+    WANDERER_TIMEOUT_SECONDS,
+)
+
+logger = LoggerAddTag(get_extension_logger(__name__), __title__)
+
+# Responses worth another attempt. Retry-After is honoured on 429 and 503.
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Only idempotent calls are retried. A POST that timed out may still have added
+# the member, so a failed add is left to the outbox, which treats it as a step.
+RETRY_METHODS = frozenset(["GET", "DELETE"])
+
+
+class CappedRetry(Retry):
+    """Retry that never waits longer than WANDERER_BACKOFF_MAX, whatever Retry-After says"""
+
+    def get_backoff_time(self):
+        return min(super().get_backoff_time(), WANDERER_BACKOFF_MAX)
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, WANDERER_BACKOFF_MAX)
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def is_configured() -> bool:
+    if WANDERER_ACL_ID is None or WANDERER_ACL_TOKEN is None:
+        logger.error(
+            "No WANDERER_ACL_ID or WANDERER_ACL_TOKEN app_settings found. Unable to issue API commands."
+        )
+        return False
+    return True
+
+
+def get_session() -> requests.Session:
+    """
+    Return the process wide session, creating it on first use.
+
+    The connection pool is sized to the sync concurrency so parallel calls
+    reuse connections instead of opening new ones.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = CappedRetry(
+                total=WANDERER_MAX_RETRIES,
+                backoff_factor=WANDERER_BACKOFF_FACTOR,
+                status_forcelist=RETRY_STATUS_CODES,
+                allowed_methods=RETRY_METHODS,
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=WANDERER_MAX_WORKERS,
+                max_retries=retry,
+            )
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers["Authorization"] = f"Bearer {WANDERER_ACL_TOKEN}"
+            _session = session
+    return _session
+
+
+def _request(method, path, expected=(200,), **kwargs):
+    """
+    Issue a request against the Wanderer ACL, logging its latency.
+
+    Returns the response if its status is expected, None on any other outcome.
+    """
+    url = f"{WANDERER_API_URL}/acls/{WANDERER_ACL_ID}{path}"
+    start = time.monotonic()
+    try:
+        r = get_session().request(
+            method, url, timeout=WANDERER_TIMEOUT_SECONDS, **kwargs
+        )
+    except requests.RequestException as e:
+        logger.error(
+            f"Wanderer {method} {path or '/'} failed after {time.monotonic() - start:.3f}s: {e}"
+        )
+        return None
+
+    elapsed = time.monotonic() - start
+    if r.status_code not in expected:
+        logger.error(
+            f"Wanderer {method} {path or '/'} returned {r.status_code} after {elapsed:.3f}s"
+        )
+        return None
+
+    logger.debug(f"Wanderer {method} {path or '/'} took {elapsed:.3f}s")
+    return r
+
+
+def get_members():
+    """Return the members on the Wanderer ACL as a list of dicts, or None on failure"""
+    r = _request("GET", "")
+    if r is None:
+        return None
+    response = r.json()
+    try:
+        return response["data"]["members"]
+    except KeyError:
+        logger.error(f"Malformed response received from Wanderer server: {response}")
+        return None
+
+
+def add_member(eve_character_id) -> bool:
+    payload = {
+        "member": {
+            "eve_character_id": str(eve_character_id),
+            "role": "member",
+        }
+    }
+    return _request("POST", "/members", json=payload) is not None
+
+
+def remove_member(eve_character_id) -> bool:
+    # A character that is not a member is already where we want it
+    return (
+        _request("DELETE", f"/members/{eve_character_id}", expected=(200, 404))
+        is not None
+    )
+
+
+def apply_changes(ids_to_add, ids_to_remove):
+    """
+    Add and remove members with at most WANDERER_MAX_WORKERS calls in flight.
+
+    Returns (succeeded, failed) where failed lists the (action, character id)
+    pairs that did not go through.
+    """
+    calls = [(add_member, "add", char_id) for char_id in ids_to_add] + [
+        (remove_member, "remove", char_id) for char_id in ids_to_remove
+    ]
+    if not calls:
+        return 0, []
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=WANDERER_MAX_WORKERS) as executor:
+        results = list(executor.map(lambda call: call[0](call[2]), calls))
+
+    failed = [
+        (action, char_id) for (_, action, char_id), ok in zip(calls, results) if not ok
+    ]
+    logger.info(
+        f"Applied {len(calls)} Wanderer changes in {time.monotonic() - start:.3f}s, {len(failed)} failed"
+    )
+    return len(calls) - len(failed), failed
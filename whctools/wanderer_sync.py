@@ -0,0 +1,173 @@
+"""Reconciliation of the Wanderer ACL with the ACLs on Auth."""
+
+from django.db.models import Max
+
+from allianceauth.eveonline.models import EveCharacter
+from allianceauth.services.hooks import get_extension_logger
+from app_utils.logging import LoggerAddTag
+
+from whctools import __title__, wanderer
+from whctools.app_settings import WANDERER_ACL_ID
+from whctools.models import Acl, ACLHistory, AclSideEffect, WandererSyncCursor
+
+logger = LoggerAddTag(get_extension_logger(__name__), __title__)
+
+
+def sync_wanderer_with_acl_helper(acl_name):
+    acl_result = Acl.objects.filter(pk=acl_name)
+    if not acl_result:
+        logger.error(
+            f"Attempted to synchronize wanderer with nonexistent ACL '{acl_name}'"
+        )
+        return
+    logger.debug(f"Attempting to synchronize wanderer with ACL '{acl_name}'")
+    acl = acl_result[0]
+
+    if not wanderer.is_configured():
+        return
+
+    # Characters on wanderer may not by on auth and vice-versa. To make logging
+    # informative, we grab the names from both sources and unify them.
+    id_to_name = {}
+
+    # History up to here is covered by this sync
+    last_history_id = (
+        ACLHistory.objects.filter(acl=acl).aggregate(Max("id"))["id__max"] or 0
+    )
+
+    # Pull set of all characters on Auth ACL
+    auth_char_tuples = set(
+        [(int(char.character_id), char.character_name) for char in acl.characters.all()]
+    )
+    auth_char_ids = set([t[0] for t in auth_char_tuples])
+    id_to_name.update(dict(auth_char_tuples))
+
+    # Pull set of all characters on Wanderer ACL
+    members = wanderer.get_members()
+    if members is None:
+        logger.error(f"Unable to retrieve Wanderer ACL {WANDERER_ACL_ID}")
+        return
+    wanderer_char_tuples = [
+        (int(member["eve_character_id"]), member["name"]) for member in members
+    ]
+    if len(wanderer_char_tuples) == 0:
+        logger.warning(
+            "Zero members received from Wanderer ACL. This is almost certainly wrong. *Someone* should have access. Aborting sync."
+        )
+        return
+    wanderer_char_ids = set([t[0] for t in wanderer_char_tuples])
+    id_to_name.update(dict(wanderer_char_tuples))
+
+    # Add characters in the ACL that are missing on wanderer, and remove the
+    # ones that shouldn't be there, a few calls at a time.
+    chars_to_add = list(auth_char_ids - wanderer_char_ids)
+    chars_to_remove = list(wanderer_char_ids - auth_char_ids)
+    _, failed = wanderer.apply_changes(chars_to_add, chars_to_remove)
+    for action, char_id in failed:
+        logger.error(
+            f"Unable to {action} character {id_to_name[char_id]} on Wanderer ACL {WANDERER_ACL_ID}"
+        )
+
+    if not failed:
+        WandererSyncCursor.objects.update_or_create(
+            acl=acl, defaults={"last_history_id": last_history_id}
+        )
+
+
+def sync_wanderer_incremental_helper(acl_name):
+    """
+    Send Wanderer only the changes recorded in the acl's history since the last
+    sync, skipping characters whose change the outbox has delivered or still
+    will. Characters get the state they have on the acl now, so only their
+    latest change counts.
+
+    The cursor only moves past changes that went through. Returns the number of
+    characters sent to Wanderer, or None if the sync could not run.
+    """
+    acl = Acl.objects.filter(pk=acl_name).first()
+    if acl is None:
+        logger.error(
+            f"Attempted to synchronize wanderer with nonexistent ACL '{acl_name}'"
+        )
+        return None
+
+    if not wanderer.is_configured():
+        return None
+
+    cursor, created = WandererSyncCursor.objects.get_or_create(acl=acl)
+    if created:
+        # Nothing to replay on a fresh cursor, the full sync has the older history
+        cursor.last_history_id = (
+            ACLHistory.objects.filter(acl=acl).aggregate(Max("id"))["id__max"] or 0
+        )
+        cursor.save()
+        return 0
+
+    # Latest change per character since the cursor
+    changes = (
+        ACLHistory.objects.filter(
+            acl=acl, id__gt=cursor.last_history_id, character__isnull=False
+        )
+        .values("character_id")
+        .annotate(last_id=Max("id"), last_change=Max("date_of_change"))
+    )
+    changes = {change["character_id"]: change for change in changes}
+    if not changes:
+        return 0
+    new_cursor = max(change["last_id"] for change in changes.values())
+
+    delivered = dict(
+        AclSideEffect.objects.filter(
+            eve_character_id__in=changes.keys(),
+            step__in=[
+                AclSideEffect.Steps.WANDERER_ADD,
+                AclSideEffect.Steps.WANDERER_REMOVE,
+            ],
+            status__in=[AclSideEffect.Status.DONE, AclSideEffect.Status.PENDING],
+        )
+        .values("eve_character_id")
+        .annotate(last_queued=Max("created_at"))
+        .values_list("eve_character_id", "last_queued")
+    )
+    pending_pks = [
+        pk
+        for pk, change in changes.items()
+        if pk not in delivered or delivered[pk] < change["last_change"]
+    ]
+
+    members = set(
+        Acl.characters.through.objects.filter(
+            acl=acl, evecharacter_id__in=pending_pks
+        ).values_list("evecharacter_id", flat=True)
+    )
+    character_ids = dict(
+        EveCharacter.objects.filter(pk__in=pending_pks).values_list(
+            "pk", "character_id"
+        )
+    )
+    chars_to_add = [character_ids[pk] for pk in pending_pks if pk in members]
+    chars_to_remove = [character_ids[pk] for pk in pending_pks if pk not in members]
+    _, failed = wanderer.apply_changes(chars_to_add, chars_to_remove)
+
+    if failed:
+        # Replay from the first change that did not go through
+        pk_by_character_id = {
+            character_id: pk for pk, character_id in character_ids.items()
+        }
+        new_cursor = (
+            min(
+                changes[pk_by_character_id[char_id]]["last_id"] for _, char_id in failed
+            )
+            - 1
+        )
+        for action, char_id in failed:
+            logger.error(
+                f"Unable to {action} character {char_id} on Wanderer ACL {WANDERER_ACL_ID}"
+            )
+
+    cursor.last_history_id = new_cursor
+    cursor.save()
+    logger.debug(
+        f"Incremental Wanderer sync of '{acl_name}': sent {len(pending_pks)} of {len(changes)} changed characters"
+    )
+    return len(pending_pks)